@@ -10,7 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
-from datetime import timedelta
+import os
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,19 +47,164 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.TokenAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "moviesreview.authentication.ClaimsJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_PAGINATION_CLASS": "moviesreview.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+    # JSON con orjson, con la misma salida que los de DRF (ver fastjson.py).
+    "DEFAULT_RENDERER_CLASSES": [
+        "moviesreview.fastjson.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "moviesreview.fastjson.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+# Los listados de películas y directores se serializan desde
+# `values_list()` con `ValuesSerializer` en lugar de instancias y
+# `ModelSerializer` (misma salida). False vuelve a la ruta de DRF.
+MOVIES_FAST_SERIALIZERS = True
+
+# Tamaño máximo que un cliente puede pedir con ?page_size= en los listados.
+MOVIES_MAX_PAGE_SIZE = 500
+
+# Ranking de películas en memoria para /api/movies/top/<n>/. Cada proceso lo
+# recarga completo cada MOVIES_LEADERBOARD_TTL segundos para recoger cambios
+# de otros procesos; MOVIES_TOP_MAX limita el n que se puede pedir. Las
+# respuestas en caché y los ETag del top dependen de la versión del ranking
+# de cada proceso y de la de MOVIES, que con varios procesos exige una caché
+# por defecto compartida (ver CACHES).
+MOVIES_LEADERBOARD_ENABLED = True
+MOVIES_LEADERBOARD_TTL = 60
+MOVIES_TOP_MAX = 100
+
+# Rankings alternativos a la media simple (/api/movies/top/<n>/?ranking=):
+# "bayesian" amortigua la media con PRIOR_WEIGHT reseñas ficticias de valor
+# PRIOR_MEAN, y "trending" además da a cada reseña un peso que se reduce a la
+# mitad cada HALF_LIFE_DAYS días. Los pesos se expresan respecto a EPOCH, que
+# no debe cambiar sin ejecutar después `rebuild_movie_scores`.
+MOVIES_RANKING = {
+    "PRIOR_MEAN": 3.0,
+    "PRIOR_WEIGHT": 10,
+    "HALF_LIFE_DAYS": 90,
+    "EPOCH": datetime(2025, 1, 1, tzinfo=timezone.utc),
+}
+
+# Recomendaciones por similitud entre películas (build_recommendations). Se
+# guardan los NEIGHBORS vecinos más similares de cada película; la similitud
+# se amortigua con SHRINKAGE usuarios ficticios y se descarta si menos de
+# MIN_COMMON usuarios valoraron ambas películas. BLOCK_SIZE es el número de
+# películas cuya similitud se calcula a la vez (memoria: películas × bloque).
+MOVIES_RECOMMENDATIONS = {
+    "NEIGHBORS": 20,
+    "SHRINKAGE": 10,
+    "MIN_COMMON": 2,
+    "BLOCK_SIZE": 256,
+}
+
+# Segundos que se conserva en caché el top de películas de cada usuario; la
+# entrada se invalida antes si el usuario modifica sus reseñas.
+MOVIES_USER_TOP_CACHE_TTL = 300
+
+# Si es True, cada usuario solo puede tener una reseña por película.
+MOVIES_ONE_REVIEW_PER_USER = False
+
+# Motor de /api/search/: "mysql" (índices FULLTEXT), "memory" (índice invertido
+# en memoria, válido con SQLite) o "auto" para elegir según la base de datos.
+MOVIES_SEARCH_BACKEND = "auto"
+MOVIES_SEARCH_INDEX_TTL = 300
+
+# Caché de respuestas renderizadas de los listados de películas y directores y
+# del top de películas. SHARED_ALIAS es un alias de CACHES para compartir las
+# respuestas entre procesos (None: solo el LRU local de cada proceso).
+MOVIES_RESPONSE_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 1000,
+    "TTL": 300,
+    "SHARED_ALIAS": None,
+}
+
+# Caché de los permisos y grupos de cada usuario que consultan las vistas. Se
+# invalida al cambiar grupos, permisos o pertenencias; SHARED_ALIAS es un alias
+# de CACHES para compartir las entradas entre procesos.
+MOVIES_PERMISSION_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 10000,
+    "TTL": 300,
+    "SHARED_ALIAS": None,
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
+    "TOKEN_OBTAIN_SERIALIZER": "moviesreview.authentication.ClaimsTokenObtainPairSerializer",
+}
+
+# Si es True, los JWT emitidos con grupos y permisos se aceptan sin leer el
+# usuario de la base de datos. Los tokens revocados (cierre de sesión, usuario
+# desactivado o con otros permisos) y la versión de AUTHORIZATION se guardan en
+# la caché por defecto, que con varios procesos debe ser compartida. Con None
+# solo se activa si la caché por defecto no es local del proceso (LocMemCache
+# o DummyCache).
+MOVIES_JWT_STATELESS = None
+
+# Modo de escritura de calificaciones: "direct" actualiza la fila de la película
+# en cada reseña; "sharded" acumula deltas en MOVIES_RATING_SHARDS filas por
+# película que se consolidan como máximo cada MOVIES_RATING_MAX_STALENESS segundos;
+# "deferred" responde sin tocar la película y encola su recálculo (ver jobs.py).
+MOVIES_RATING_WRITE_MODE = "direct"
+MOVIES_RATING_SHARDS = 8
+MOVIES_RATING_MAX_STALENESS = 5
+
+# Los agregados de los directores (ver ratings.refresh_director_stats) se
+# recalculan en un hilo aparte, juntando las escrituras de
+# MOVIES_DIRECTOR_STATS_DELAY segundos en un solo UPDATE (0: al confirmar cada
+# escritura).
+MOVIES_DIRECTOR_STATS_DELAY = 1
+
+# Recálculos del modo "deferred": WORKERS hilos por proceso (0: solo con
+# drain_rating_jobs) que recalculan hasta BATCH_SIZE películas por transacción.
+MOVIES_RATING_JOBS = {
+    "WORKERS": 2,
+    "BATCH_SIZE": 100,
+}
+
+# Feed de cambios (/api/changes/ y /api/changes/stream/, ver changes.py): hasta
+# PAGE_SIZE eventos por respuesta; el long-poll espera como máximo MAX_WAIT
+# segundos y el stream dura STREAM_SECONDS (con un comentario cada HEARTBEAT
+# segundos sin eventos), consultando cada POLL_INTERVAL. Los eventos se numeran
+# en un hilo aparte, juntando las confirmaciones de SEQUENCE_DELAY segundos (0:
+# al confirmar cada escritura). compact_changes compacta los eventos de más de
+# RETENTION segundos.
+MOVIES_CHANGES = {
+    "PAGE_SIZE": 500,
+    "MAX_WAIT": 25,
+    "POLL_INTERVAL": 0.5,
+    "STREAM_SECONDS": 300,
+    "HEARTBEAT": 15,
+    "SEQUENCE_DELAY": 0.1,
+    "RETENTION": 7 * 24 * 3600,
+}
+
+# Presupuesto de consultas por petición: las que superen MAX_QUERIES consultas
+# o MAX_DB_TIME_MS milisegundos en la base de datos se registran en el log
+# "moviesreview.query_budget". Las métricas se consultan en /api/stats/queries/
+# y, con SERVER_TIMING, también en la cabecera Server-Timing de cada respuesta.
+MOVIES_QUERY_BUDGET = {
+    "ENABLED": True,
+    "MAX_QUERIES": 20,
+    "MAX_DB_TIME_MS": 200,
+    "SERVER_TIMING": True,
 }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'moviesreview.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -100,9 +246,82 @@ DATABASES = {
         "HOST": "172.19.0.2",
         # "HOST": "localhost",
         "PORT": "3306",
+        # Reutilización de conexiones: cada hilo conserva su conexión durante
+        # CONN_MAX_AGE segundos (0: una conexión por petición) y comprueba que
+        # sigue viva antes de reutilizarla. Con ASGI conviene usar 0 y un pool
+        # externo (p. ej. ProxySQL), porque cada petición corre en otro hilo.
+        "CONN_MAX_AGE": int(os.environ.get("MOVIES_DB_CONN_MAX_AGE", "300")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Réplicas de solo lectura: MOVIES_DB_REPLICAS="host1,host2" añade una réplica
+# por host con las mismas credenciales que "default".
+for index, host in enumerate(
+    host.strip() for host in os.environ.get("MOVIES_DB_REPLICAS", "").split(",")
+):
+    if host:
+        DATABASES[f"replica{index + 1}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "TEST": {"MIRROR": "default"},
+        }
+
+# Sin servidor MySQL (desarrollo y pruebas): MOVIES_DB_ENGINE=sqlite usa dos
+# archivos SQLite como primario y réplica; `sync_sqlite_replica` copia el
+# primero en el segundo. Las transacciones toman el bloqueo de escritura al
+# empezar, y las pruebas usan archivos para poder abrir conexiones desde hilos.
+if os.environ.get("MOVIES_DB_ENGINE") == "sqlite":
+    DATABASES = {
+        alias: {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / f"{alias}.sqlite3",
+            "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+            "TEST": {"NAME": BASE_DIR / f"test_{alias}.sqlite3"},
+        }
+        for alias in ("default", "replica")
+    }
+
+DATABASE_ROUTERS = ["moviesreview.routers.ReplicaRouter"]
+
+# Las vistas de solo lectura (listados de películas, directores y reseñas del
+# crítico, y top de películas) leen de una de las réplicas de ALIASES, salvo
+# que el usuario haya escrito una reseña hace menos de PIN_SECONDS segundos:
+# entonces leen del primario para ver sus propios cambios.
+MOVIES_READ_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "PIN_SECONDS": 10,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Guarda las versiones usadas en los ETag de los listados. Con varios procesos
+# debe apuntar a un backend compartido (Redis, Memcached) para que todos vean
+# las mismas versiones.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "moviesreview": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
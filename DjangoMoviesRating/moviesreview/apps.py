@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MoviesreviewConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moviesreview'
+
+    def ready(self):
+        from . import signals  # noqa: F401
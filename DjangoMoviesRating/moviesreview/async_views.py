@@ -0,0 +1,293 @@
+"""
+Variantes asíncronas (ASGI) de los endpoints de lectura más usados.
+
+DRF no admite vistas asíncronas, así que estas vistas son funciones `async`
+de Django que reutilizan la autenticación, la paginación y los serializadores
+de la API. Solo la autenticación sale del bucle de eventos (los autenticadores
+de DRF son síncronos); las consultas usan el ORM asíncrono. Las respuestas
+tienen el mismo formato que las de sus equivalentes síncronas.
+"""
+
+import asyncio
+import time
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .changes import KINDS, events_after
+from .leaderboard import atop_movies
+from .models import Director, Movie, Review
+from .pagination import (
+    CriticReviewKeysetPagination,
+    KeysetPagination,
+    MovieKeysetPagination,
+)
+from .ranking import DEFAULT_RANKING, RANKINGS
+from .serializers import (
+    ChangeEventSerializer,
+    DirectorSerializer,
+    MovieSerializer,
+    ReviewValuesSerializer,
+    UserRatedMovieSerializer,
+    ValuesSerializer,
+)
+from .views import user_top_cache_key, user_top_movies_queryset
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    # El primer renderizador configurado en DRF (FastJSONRenderer).
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(
+        renderer.render(data),
+        content_type="application/json",
+        status=status_code,
+    )
+
+
+def async_api_view(view):
+    """
+    Decorador para vistas asíncronas de solo lectura: acepta únicamente GET,
+    autentica con los autenticadores configurados en DRF y exige un usuario
+    autenticado (como `IsAuthenticated` y `DjangoModelPermissions` en GET).
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return render(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        request = Request(
+            request,
+            authenticators=[
+                authenticator()
+                for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ],
+        )
+        try:
+            user = await sync_to_async(lambda: request.user)()
+        except APIException as exc:
+            return render({"detail": exc.detail}, exc.status_code)
+        if not user or not user.is_authenticated:
+            return render(
+                {"detail": "Authentication credentials were not provided."},
+                status.HTTP_403_FORBIDDEN,
+            )
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return render({"detail": exc.detail}, exc.status_code)
+
+    return wrapper
+
+
+async def paginated(request, queryset, paginator, serialize):
+    page = await paginator.apaginate_queryset(queryset, request)
+    return render(
+        {
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": serialize(page),
+        }
+    )
+
+
+@async_api_view
+async def top_movies(request, top_number):
+    """
+    Devuelve las n películas mejor calificadas (ver `views.top_movies`).
+    """
+    ranking_name = request.query_params.get("ranking", DEFAULT_RANKING)
+    if ranking_name not in RANKINGS:
+        return render(
+            {"detail": f"Ranking no válido. Opciones: {', '.join(RANKINGS)}."},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    movies = await atop_movies(min(top_number, settings.MOVIES_TOP_MAX), ranking_name)
+    if not movies:
+        return render(
+            {"detail": "No hay películas disponibles en este momento."},
+            status.HTTP_404_NOT_FOUND,
+        )
+    return render(MovieSerializer(movies, many=True).data)
+
+
+@async_api_view
+async def top_movies_by_user(request, top_number):
+    """
+    Devuelve las N películas mejor calificadas por el usuario autenticado (ver
+    `views.top_movies_by_user`).
+    """
+    user = request.user
+    top_number = min(top_number, settings.MOVIES_TOP_MAX)
+    activity = await Review.objects.filter(user=user).aaggregate(
+        latest=Max("updated_at"), total=Count("pk")
+    )
+    if not activity["total"]:
+        return render(
+            {"detail": "No has calificado ninguna película."},
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    cache_key = user_top_cache_key(user, top_number, activity)
+    data = await cache.aget(cache_key)
+    if data is None:
+        movies = [movie async for movie in user_top_movies_queryset(user, top_number)]
+        data = UserRatedMovieSerializer(movies, many=True).data
+        await cache.aset(cache_key, data, settings.MOVIES_USER_TOP_CACHE_TTL)
+    return render(data)
+
+
+async def model_list(request, queryset, paginator, serializer_class):
+    if not settings.MOVIES_FAST_SERIALIZERS:
+        return await paginated(
+            request,
+            queryset,
+            paginator,
+            lambda page: serializer_class(page, many=True).data,
+        )
+    reader = ValuesSerializer.for_serializer(serializer_class)
+    return await paginated(
+        request, reader.prepare(queryset), paginator, reader.serialize
+    )
+
+
+@async_api_view
+async def movie_list(request):
+    return await model_list(
+        request, Movie.objects.all(), MovieKeysetPagination(), MovieSerializer
+    )
+
+
+@async_api_view
+async def director_list(request):
+    return await model_list(
+        request, Director.objects.all(), KeysetPagination(), DirectorSerializer
+    )
+
+
+async def critic_review_list(request, reviews):
+    reader = ReviewValuesSerializer(ReviewValuesSerializer.parse_expand(request))
+    return await paginated(
+        request,
+        reader.prepare(reviews),
+        CriticReviewKeysetPagination(),
+        reader.serialize,
+    )
+
+
+@async_api_view
+async def critic_reviews(request):
+    return await critic_review_list(request, Review.objects.filter(user=request.user))
+
+
+@async_api_view
+async def critic_movie_reviews(request, movie_id):
+    return await critic_review_list(
+        request, Review.objects.filter(user=request.user, movie_id=movie_id)
+    )
+
+
+def change_params(request):
+    """
+    Cursor (`?cursor=`, o la cabecera `Last-Event-ID` al reconectar un
+    `EventSource`), tipos de objeto (`?kinds=review,movie`) y número máximo de
+    eventos por respuesta (`?limit=`) del feed de cambios.
+    """
+    options = settings.MOVIES_CHANGES
+    cursor = request.query_params.get("cursor") or request.headers.get(
+        "Last-Event-ID", "0"
+    )
+    try:
+        cursor = int(cursor)
+        limit = int(request.query_params.get("limit", options["PAGE_SIZE"]))
+    except ValueError:
+        raise ParseError("cursor y limit deben ser números enteros.")
+    if cursor < 0:
+        raise ParseError("El cursor no puede ser negativo.")
+    kinds = [
+        kind.strip()
+        for kind in request.query_params.get("kinds", "").split(",")
+        if kind.strip()
+    ]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ParseError(f"Tipos no válidos. Opciones: {', '.join(KINDS)}.")
+    return cursor, kinds, max(1, min(limit, options["PAGE_SIZE"]))
+
+
+async def fetch_changes(cursor, kinds, limit):
+    reader = ValuesSerializer.for_serializer(ChangeEventSerializer)
+    queryset = reader.prepare(events_after(cursor, kinds, limit))
+    return reader.serialize([row async for row in queryset])
+
+
+@async_api_view
+async def changes(request):
+    """
+    Long-poll del feed de cambios: devuelve los eventos posteriores a
+    `?cursor=` y el cursor de la siguiente petición. Si no hay ninguno, espera
+    hasta `?wait=` segundos (como máximo `MAX_WAIT`) a que llegue alguno.
+    """
+    options = settings.MOVIES_CHANGES
+    cursor, kinds, limit = change_params(request)
+    try:
+        wait = float(request.query_params.get("wait", 0))
+    except ValueError:
+        raise ParseError("wait debe ser un número.")
+    deadline = time.monotonic() + max(0.0, min(wait, options["MAX_WAIT"]))
+    while True:
+        events = await fetch_changes(cursor, kinds, limit)
+        if events or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(options["POLL_INTERVAL"])
+    return render(
+        {"cursor": events[-1]["sequence"] if events else cursor, "events": events}
+    )
+
+
+@async_api_view
+async def change_stream(request):
+    """
+    Feed de cambios como Server-Sent Events: un mensaje por evento, con la
+    `sequence` del evento como `id` (el navegador lo reenvía en `Last-Event-ID`
+    al reconectar) y de tipo `<kind>.<action>`. El stream se cierra tras `STREAM_SECONDS` para
+    liberar la conexión; el cliente reconecta y continúa desde su cursor.
+    """
+    options = settings.MOVIES_CHANGES
+    cursor, kinds, limit = change_params(request)
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+    async def messages(cursor):
+        deadline = time.monotonic() + options["STREAM_SECONDS"]
+        last_message = time.monotonic()
+        yield b"retry: 1000\n\n"
+        while time.monotonic() < deadline:
+            events = await fetch_changes(cursor, kinds, limit)
+            for event in events:
+                header = (
+                    f"id: {event['sequence']}\nevent: {event['kind']}.{event['action']}"
+                )
+                yield header.encode() + b"\ndata: " + renderer.render(event) + b"\n\n"
+            if events:
+                cursor = events[-1]["sequence"]
+                last_message = time.monotonic()
+            elif time.monotonic() - last_message >= options["HEARTBEAT"]:
+                # Comentario SSE para que los proxies no cierren la conexión.
+                yield b": keepalive\n\n"
+                last_message = time.monotonic()
+            if len(events) < limit:
+                await asyncio.sleep(options["POLL_INTERVAL"])
+
+    response = StreamingHttpResponse(messages(cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Sin búfer en nginx, para que cada evento llegue al enviarse.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,142 @@
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .versions import AUTHORIZATION, get_version
+
+# Claims añadidos al emitir el token: con ellos se puede autenticar y autorizar
+# sin leer el usuario de la base de datos.
+USERNAME_CLAIM = "username"
+GROUPS_CLAIM = "groups"
+PERMISSIONS_CLAIM = "perms"
+STAFF_CLAIM = "staff"
+SUPERUSER_CLAIM = "superuser"
+AUTHORIZATION_VERSION_CLAIM = "authz"
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Emite tokens que incluyen el nombre de usuario, sus grupos, sus permisos y
+    la versión de `AUTHORIZATION` vigente al emitirlos.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[USERNAME_CLAIM] = user.get_username()
+        token[GROUPS_CLAIM] = sorted(user.groups.values_list("name", flat=True))
+        token[PERMISSIONS_CLAIM] = sorted(user.get_all_permissions())
+        token[STAFF_CLAIM] = user.is_staff
+        token[SUPERUSER_CLAIM] = user.is_superuser
+        token[AUTHORIZATION_VERSION_CLAIM] = get_version(AUTHORIZATION)
+        return token
+
+
+# Backends de caché que no comparten las revocaciones entre procesos.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def stateless_enabled():
+    """
+    Indica si se aceptan tokens sin leer el usuario (`MOVIES_JWT_STATELESS`).
+    Con None, solo si la caché por defecto es compartida: con una caché local,
+    otro proceso no vería las revocaciones.
+    """
+    stateless = settings.MOVIES_JWT_STATELESS
+    if stateless is None:
+        return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES
+    return stateless
+
+
+def _revoked_token_key(jti):
+    return f"moviesreview:revoked:token:{jti}"
+
+
+def _revoked_user_key(user_id):
+    return f"moviesreview:revoked:user:{user_id}"
+
+
+def revoke_token(token):
+    """
+    Revoca un token concreto (cierre de sesión) hasta que caduque.
+    """
+    remaining = token["exp"] - int(time.time())
+    if remaining > 0:
+        cache.set(_revoked_token_key(token[jwt_settings.JTI_CLAIM]), True, remaining)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Revoca todos los tokens emitidos hasta ahora para un usuario (baja,
+    bloqueo o cambio de los indicadores que llevan sus claims). Basta con recordarlo durante la vida máxima de un token de acceso.
+    """
+    lifetime = int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set(_revoked_user_key(user_id), int(time.time()), lifetime)
+
+
+def is_revoked(token):
+    keys = [
+        _revoked_token_key(token.get(jwt_settings.JTI_CLAIM)),
+        _revoked_user_key(token.get(jwt_settings.USER_ID_CLAIM)),
+    ]
+    revoked = cache.get_many(keys)
+    if revoked.get(keys[0]):
+        return True
+    revoked_at = revoked.get(keys[1])
+    # Los tokens emitidos en el mismo segundo que la revocación también se
+    # rechazan.
+    return revoked_at is not None and token.get("iat", 0) <= revoked_at
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    `JWTAuthentication` que, si `stateless_enabled()`, construye
+    el usuario a partir de los claims del token sin consultar la base de datos.
+
+    El usuario resultante es una instancia de `User` no leída de la base de
+    datos, válida para asignarla a claves foráneas y filtrar por ella, con los
+    permisos y grupos del token ya cargados. Si la configuración de grupos o
+    permisos cambió después de emitir el token (versión de `AUTHORIZATION`
+    distinta) o el token no tiene los claims, se lee el usuario como siempre.
+
+    En ambos casos se rechazan los tokens revocados con `revoke_token` o
+    `revoke_user_tokens`.
+    """
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise AuthenticationFailed("Token revocado.", code="token_revoked")
+        if not stateless_enabled() or not self.has_current_claims(validated_token):
+            return super().get_user(validated_token)
+        return self.build_user(validated_token)
+
+    @staticmethod
+    def has_current_claims(token):
+        return PERMISSIONS_CLAIM in token and token.get(
+            AUTHORIZATION_VERSION_CLAIM
+        ) == get_version(AUTHORIZATION)
+
+    def build_user(self, token):
+        User = get_user_model()
+        user = User(
+            **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]},
+            **{User.USERNAME_FIELD: token[USERNAME_CLAIM]},
+            is_active=True,
+            is_staff=token[STAFF_CLAIM],
+            is_superuser=token[SUPERUSER_CLAIM],
+        )
+        # Marca la instancia como existente en la base de datos.
+        user._state.adding = False
+        user._state.db = User.objects.db
+        permissions = frozenset(token[PERMISSIONS_CLAIM])
+        # ModelBackend reutiliza esta caché en has_perm/get_all_permissions.
+        user._perm_cache = set(permissions)
+        user.token_authorization = (permissions, frozenset(token[GROUPS_CLAIM]))
+        return user
@@ -0,0 +1,267 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import setup_databases, teardown_databases
+from .models import Director, Movie, Review
+
+# Vocabulario de los títulos sintéticos, para que la búsqueda tenga
+# coincidencias parciales y términos más y menos frecuentes.
+TITLE_WORDS = (
+    "amor guerra noche ciudad sombra viaje último silencio fuego tiempo "
+    "secreto camino río montaña estrella mar sangre hijo reino luz memoria "
+    "tormenta jardín espejo lobo invierno verano regreso puerta sueño"
+).split()
+
+# Fecha de referencia de los datos sintéticos: las fechas se generan hacia
+# atrás a partir de ella y no del día de la ejecución, así que la misma semilla
+# produce los mismos datos cualquier día.
+SEED_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@contextmanager
+def benchmark_database(verbosity=0, keepdb=False):
+    """
+    Crea una base de datos de pruebas aislada durante el benchmark, para no
+    escribir datos sintéticos en la base de datos real.
+    """
+    old_config = setup_databases(verbosity, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity, keepdb=keepdb)
+
+
+def percentile(values, percent):
+    """
+    Devuelve el percentil `percent` (0-100) de una lista de valores.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Timer:
+    """
+    Cronómetro de contexto: `elapsed` contiene los segundos transcurridos.
+    """
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def seed_reviews(count, movies=100, users=10, batch_size=5000):
+    """
+    Inserta `count` reseñas sintéticas repartidas entre `movies` películas
+    (de un director por cada diez) y `users` usuarios nuevos mediante
+    `bulk_create`.
+
+    :return: La lista de IDs de los usuarios creados.
+    """
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    Director.objects.bulk_create(
+        Director(name=prefix, last_name=str(index), birth_date=SEED_DATE.date())
+        for index in range(max(1, movies // 10))
+    )
+    director_ids = list(
+        Director.objects.filter(name=prefix).values_list("pk", flat=True)
+    )
+    Movie.objects.bulk_create(
+        Movie(
+            name=f"{prefix}-{index}",
+            director_id=director_ids[index % len(director_ids)],
+            release_date=SEED_DATE.date(),
+        )
+        for index in range(movies)
+    )
+    User.objects.bulk_create(
+        User(username=f"{prefix}-{index}") for index in range(users)
+    )
+    # MySQL no devuelve las claves primarias en bulk_create.
+    movie_ids = list(
+        Movie.objects.filter(name__startswith=prefix).values_list("pk", flat=True)
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith=prefix).values_list("pk", flat=True)
+    )
+
+    remaining = count
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        Review.objects.bulk_create(
+            Review(
+                movie_id=random.choice(movie_ids),
+                user_id=random.choice(user_ids),
+                rating=random.randint(1, 5),
+                comment="Reseña generada para benchmark.",
+            )
+            for _ in range(size)
+        )
+        remaining -= size
+    return user_ids
+
+
+def zipf_probabilities(count, exponent):
+    """
+    Probabilidades de una distribución de Zipf acotada a `count` elementos:
+    el elemento de rango k tiene peso 1 / k^exponent.
+    """
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _new_ids(model, after):
+    # MySQL no devuelve las claves primarias en bulk_create.
+    return np.fromiter(
+        model.objects.filter(pk__gt=after).order_by("pk").values_list("pk", flat=True),
+        dtype=np.int64,
+    )
+
+
+def _max_pk(model):
+    return model.objects.aggregate(last=Max("pk"))["last"] or 0
+
+
+def seed_dataset(
+    movies,
+    reviews,
+    users,
+    exponent=1.1,
+    seed=0,
+    batch_size=10_000,
+    progress=None,
+):
+    """
+    Genera un conjunto de datos sintético y reproducible (misma `seed`, mismos
+    datos) con la popularidad sesgada de un sitio real: las películas reciben
+    reseñas y los usuarios escriben reseñas según distribuciones de Zipf, de
+    modo que unas pocas películas y usuarios concentran la mayoría.
+
+    Cada película tiene una calidad de fondo y cada usuario un sesgo, y la
+    calificación es su suma más ruido, redondeada a 1-5. Las reseñas se
+    insertan con `executemany` (sin instancias de modelo) con fechas repartidas
+    en los dos años anteriores a `SEED_DATE`, y al final se recalculan los
+    contadores y agregados derivados.
+
+    :param progress: Función opcional a la que se pasa el número de reseñas
+        insertadas tras cada lote.
+    :return: Un diccionario con el número de filas creadas de cada tabla.
+    """
+    from .ratings import rebuild_movie_ratings
+
+    rng = np.random.default_rng(seed)
+    prefix = f"seed{seed}"
+    base_date = SEED_DATE.date()
+
+    first_director = _max_pk(Director)
+    Director.objects.bulk_create(
+        (
+            Director(
+                name=f"Director {index}",
+                last_name=prefix,
+                birth_date=base_date - timedelta(days=int(rng.integers(25, 90) * 365)),
+            )
+            for index in range(max(1, movies // 20))
+        ),
+        batch_size=batch_size,
+    )
+    director_ids = _new_ids(Director, first_director)
+
+    # Directores prolíficos: la filmografía también sigue una Zipf.
+    movie_directors = director_ids[
+        rng.choice(
+            len(director_ids), size=movies, p=zipf_probabilities(len(director_ids), 1.0)
+        )
+    ]
+    first_movie = _max_pk(Movie)
+    titles = rng.choice(TITLE_WORDS, size=(movies, 3))
+    lengths = rng.integers(1, 4, size=movies)
+    Movie.objects.bulk_create(
+        (
+            Movie(
+                name=f"{' '.join(titles[index][: lengths[index]]).capitalize()} {index}",
+                director_id=int(movie_directors[index]),
+                release_date=base_date - timedelta(days=int(rng.integers(0, 75 * 365))),
+                description=" ".join(rng.choice(TITLE_WORDS, size=12)),
+            )
+            for index in range(movies)
+        ),
+        batch_size=batch_size,
+    )
+    movie_ids = _new_ids(Movie, first_movie)
+
+    first_user = _max_pk(User)
+    User.objects.bulk_create(
+        (User(username=f"{prefix}-user-{index}") for index in range(users)),
+        batch_size=batch_size,
+    )
+    user_ids = _new_ids(User, first_user)
+
+    # El rango de popularidad no depende del ID.
+    movie_order = rng.permutation(len(movie_ids))
+    user_order = rng.permutation(len(user_ids))
+    movie_probabilities = zipf_probabilities(len(movie_ids), exponent)
+    user_probabilities = zipf_probabilities(len(user_ids), exponent * 0.8)
+    quality = np.clip(rng.normal(3.2, 0.7, size=len(movie_ids)), 1, 5)
+    bias = rng.normal(0, 0.4, size=len(user_ids))
+
+    table = connection.ops.quote_name(Review._meta.db_table)
+    columns = ", ".join(
+        connection.ops.quote_name(Review._meta.get_field(name).column)
+        for name in ("movie", "user", "rating", "comment", "created_at", "updated_at")
+    )
+    sql = f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s)"
+    inserted = 0
+    while inserted < reviews:
+        size = min(batch_size, reviews - inserted)
+        movie_index = movie_order[
+            rng.choice(len(movie_ids), size=size, p=movie_probabilities)
+        ]
+        user_index = user_order[
+            rng.choice(len(user_ids), size=size, p=user_probabilities)
+        ]
+        ratings = np.clip(
+            np.rint(quality[movie_index] + bias[user_index] + rng.normal(0, 0.9, size)),
+            1,
+            5,
+        )
+        ages = rng.uniform(0, 730 * 86400, size)
+        rows = []
+        for movie_id, user_id, rating, age in zip(
+            movie_ids[movie_index].tolist(),
+            user_ids[user_index].tolist(),
+            ratings.tolist(),
+            ages.tolist(),
+        ):
+            created = connection.ops.adapt_datetimefield_value(
+                SEED_DATE - timedelta(seconds=age)
+            )
+            rows.append(
+                (movie_id, user_id, rating, "Reseña sintética.", created, created)
+            )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        inserted += size
+        if progress is not None:
+            progress(inserted)
+
+    # Todas: una lista de 100k IDs superaría el límite de parámetros de SQLite.
+    rebuild_movie_ratings()
+    return {
+        "directors": len(director_ids),
+        "movies": len(movie_ids),
+        "users": len(user_ids),
+        "reviews": inserted,
+    }
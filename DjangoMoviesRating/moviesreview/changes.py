@@ -0,0 +1,261 @@
+"""
+Feed de cambios de reseñas, películas y directores para consumidores externos.
+
+Cada alta, edición o baja añade un `ChangeEvent` en la misma transacción que
+el cambio (señales de `signals.py`), y cada cambio de la calificación de una
+película un evento "rated" con su nueva `average_rating`. Los consumidores
+leen los eventos posteriores a su cursor (la `sequence` del último evento
+recibido) en `/api/changes/` (long-poll) o `/api/changes/stream/` (Server-Sent
+Events), en lugar de recorrer de nuevo los listados.
+
+El cursor no puede ser el `id`: se asigna al insertar, y una transacción larga
+puede confirmar sus eventos después de otros con un `id` mayor que ya se
+entregaron. Los eventos se insertan sin `sequence` y, al confirmarse, quien
+los escribió programa su numeración (`schedule_sequencing`): un hilo aparte
+numera los que ya ve confirmados (`assign_sequences`) con el contador de
+`ChangeSequence` bloqueado, así que la numeración sigue el orden de
+confirmación y un evento nunca recibe un número menor que otro ya entregado.
+Las consultas de los consumidores solo leen.
+`compact_changes` borra los eventos antiguos de los que hay otro posterior del
+mismo objeto, así que un consumidor con un cursor antiguo recibe al menos el
+último evento de cada objeto que cambió.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from .models import ChangeEvent, ChangeSequence, Movie
+
+logger = logging.getLogger(__name__)
+
+KINDS = (ChangeEvent.REVIEW, ChangeEvent.MOVIE, ChangeEvent.DIRECTOR)
+
+# Numeración programada (ver schedule_sequencing).
+_sequence_lock = threading.Lock()
+_sequence_timer = None
+
+
+def object_changed(kind, instance, action):
+    """
+    Registra el alta, la edición o la baja de una reseña, película o director.
+    """
+    movie_id = None
+    average_rating = None
+    if kind == ChangeEvent.REVIEW:
+        movie_id = instance.movie_id
+    elif kind == ChangeEvent.MOVIE:
+        movie_id = instance.pk
+        if action != ChangeEvent.DELETED:
+            average_rating = instance.average_rating
+    ChangeEvent.objects.create(
+        kind=kind,
+        action=action,
+        object_id=instance.pk,
+        movie_id=movie_id,
+        average_rating=average_rating,
+    )
+    schedule_sequencing()
+
+
+def reviews_created(reviews, batch_size=1000):
+    """
+    Registra el alta de las reseñas `[(id, película)]` insertadas con
+    `bulk_create`, que no emite las señales de `object_changed`.
+    """
+    ChangeEvent.objects.bulk_create(
+        (
+            ChangeEvent(
+                kind=ChangeEvent.REVIEW,
+                action=ChangeEvent.CREATED,
+                object_id=review_id,
+                movie_id=movie_id,
+            )
+            for review_id, movie_id in reviews
+        ),
+        batch_size=batch_size,
+    )
+    schedule_sequencing()
+
+
+def ratings_changed(movie_ids=None, batch_size=1000):
+    """
+    Registra un evento "rated" con la `average_rating` actual de cada película
+    de `movie_ids` (None: de todas), copiándola con un INSERT ... SELECT por
+    cada `batch_size` películas, sin leer las filas en Python.
+    """
+    if movie_ids is None:
+        batches = [None]
+    else:
+        movie_ids = sorted(movie_ids)
+        batches = [
+            movie_ids[start : start + batch_size]
+            for start in range(0, len(movie_ids), batch_size)
+        ]
+
+    quote = connection.ops.quote_name
+    events, movies = ChangeEvent._meta, Movie._meta
+    columns = ", ".join(
+        quote(events.get_field(name).column)
+        for name in (
+            "kind",
+            "action",
+            "object_id",
+            "movie_id",
+            "average_rating",
+            "created_at",
+        )
+    )
+    pk = quote(movies.pk.column)
+    rating = quote(movies.get_field("average_rating").column)
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        for batch in batches:
+            sql = (
+                f"INSERT INTO {quote(events.db_table)} ({columns}) "
+                f"SELECT %s, %s, {pk}, {pk}, {rating}, %s "
+                f"FROM {quote(movies.db_table)}"
+            )
+            params = [ChangeEvent.MOVIE, ChangeEvent.RATED, created_at]
+            if batch is not None:
+                sql += f" WHERE {pk} IN ({', '.join(['%s'] * len(batch))})"
+                params.extend(batch)
+            cursor.execute(f"{sql} ORDER BY {pk}", params)
+    schedule_sequencing()
+
+
+def locked_counter():
+    """
+    Fila de `ChangeSequence` bloqueada hasta el final de la transacción. Si no
+    existe (p. ej. tras vaciar las tablas) se crea con la mayor `sequence`.
+    """
+    counters = ChangeSequence.objects.select_for_update()
+    try:
+        return counters.get(pk=1)
+    except ChangeSequence.DoesNotExist:
+        last = ChangeEvent.objects.aggregate(last=Max("sequence"))["last"]
+        counter, _ = counters.get_or_create(pk=1, defaults={"value": last or 0})
+        return counter
+
+
+def schedule_sequencing():
+    """
+    Programa la numeración de los eventos de la transacción actual cuando se
+    confirme.
+
+    Las confirmaciones de los siguientes `SEQUENCE_DELAY` segundos se numeran
+    juntas en un hilo aparte, así que las escrituras no esperan ni compiten
+    por el contador. Con 0 se numeran al confirmar, en el mismo hilo.
+    """
+    transaction.on_commit(_events_committed)
+
+
+def _events_committed():
+    global _sequence_timer
+    delay = settings.MOVIES_CHANGES["SEQUENCE_DELAY"]
+    if not delay:
+        assign_sequences()
+        return
+    with _sequence_lock:
+        if _sequence_timer is not None:
+            return
+        _sequence_timer = threading.Timer(delay, _sequence_in_background)
+        _sequence_timer.daemon = True
+        _sequence_timer.start()
+
+
+def _sequence_in_background():
+    global _sequence_timer
+    # Antes de numerar: lo que se confirme mientras tanto programa otra vuelta.
+    with _sequence_lock:
+        _sequence_timer = None
+    try:
+        assign_sequences()
+    except Exception:
+        # Los numera la próxima escritura o compact_changes.
+        logger.exception("Error al numerar los eventos del feed de cambios.")
+    finally:
+        connections.close_all()
+
+
+def assign_sequences(batch_size=1000):
+    """
+    Numera, por orden de `id`, los eventos confirmados que aún no tienen
+    `sequence`, a continuación del último número asignado.
+
+    :return: El número de eventos numerados.
+    """
+    pending = ChangeEvent.objects.filter(sequence__isnull=True)
+    assigned = 0
+    # Sin transacción ni bloqueo cuando no hay nada que numerar (otra vuelta
+    # ya numeró los eventos de esta confirmación).
+    while pending.exists():
+        with transaction.atomic():
+            # Quien espera el bloqueo lee después los eventos pendientes, así
+            # que no vuelve a numerar los que acaba de numerar otro lector.
+            counter = locked_counter()
+            # Lectura sin bloqueo: los eventos de transacciones abiertas no se
+            # ven y se numeran cuando se confirmen, detrás de estos.
+            events = list(pending.order_by("pk").only("pk")[:batch_size])
+            if not events:
+                break
+            for event in events:
+                counter.value += 1
+                event.sequence = counter.value
+            ChangeEvent.objects.bulk_update(events, ["sequence"])
+            counter.save(update_fields=["value"])
+        assigned += len(events)
+        if len(events) < batch_size:
+            break
+    return assigned
+
+
+def events_after(cursor, kinds=None, limit=None):
+    """
+    Queryset con los eventos numerados después de `cursor`, en orden, hasta
+    `limit` (`PAGE_SIZE` por defecto).
+    """
+    events = ChangeEvent.objects.filter(sequence__gt=cursor)
+    if kinds:
+        events = events.filter(kind__in=kinds)
+    return events.order_by("sequence")[: limit or settings.MOVIES_CHANGES["PAGE_SIZE"]]
+
+
+def compact(retention=None, drop_deleted=False, batch_size=1000):
+    """
+    Borra los eventos de hace más de `retention` segundos (`RETENTION` por
+    defecto) de los que hay otro posterior del mismo objeto. Con
+    `drop_deleted` también borra los de objetos eliminados, que ya no tienen
+    estado que sincronizar.
+
+    :return: El número de eventos borrados.
+    """
+    if retention is None:
+        retention = settings.MOVIES_CHANGES["RETENTION"]
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    assign_sequences()
+    later = ChangeEvent.objects.filter(
+        kind=OuterRef("kind"),
+        object_id=OuterRef("object_id"),
+        sequence__gt=OuterRef("sequence"),
+    )
+    # Los eventos sin numerar son de transacciones que aún no se ven.
+    old = ChangeEvent.objects.filter(created_at__lt=cutoff, sequence__isnull=False)
+    targets = [old.filter(Exists(later))]
+    if drop_deleted:
+        targets.append(old.filter(action=ChangeEvent.DELETED))
+
+    deleted = 0
+    for events in targets:
+        # En dos pasos: MySQL no admite un DELETE con una subconsulta sobre
+        # la misma tabla.
+        ids = events.order_by("pk").values_list("pk", flat=True)
+        while True:
+            batch = list(ids[:batch_size])
+            if not batch:
+                break
+            deleted += ChangeEvent.objects.filter(pk__in=batch).delete()[0]
+    return deleted
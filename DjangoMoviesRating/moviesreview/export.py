@@ -0,0 +1,112 @@
+import csv
+import json
+from django.db.models import Q
+from .models import Movie, Review
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Columnas exportadas de cada modelo: (nombre en la exportación, campo ORM).
+# Los nombres coinciden con los de la API.
+EXPORTS = {
+    "reviews": (
+        Review,
+        (
+            ("id", "id"),
+            ("movie", "movie_id"),
+            ("user", "user_id"),
+            ("rating", "rating"),
+            ("comment", "comment"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ),
+    ),
+    "movies": (
+        Movie,
+        (
+            ("id", "id"),
+            ("name", "name"),
+            ("director", "director_id"),
+            ("release_date", "release_date"),
+            ("description", "description"),
+            ("average_rating", "average_rating"),
+            ("rating_count", "rating_count"),
+            ("updated_at", "updated_at"),
+        ),
+    ),
+}
+
+
+def export_rows(name, since=None, chunk_size=2000):
+    """
+    Recorre las filas de una exportación como tuplas, en orden de
+    `(updated_at, id)` y sin cargar la tabla entera en memoria.
+
+    Las filas se leen en bloques de `chunk_size` con paginación keyset sobre
+    el índice de `(updated_at, id)`: cada bloque es una consulta corta que
+    empieza tras la última fila del anterior. `.iterator()` no basta, porque
+    con MySQL el driver descarga el resultado completo antes de devolver la
+    primera fila. Una fila modificada durante la exportación puede aparecer
+    otra vez al final, con su nuevo `updated_at`.
+
+    :param name: "reviews" o "movies".
+    :param since: Si se indica, solo filas modificadas desde esa fecha, para
+    exportaciones incrementales.
+    """
+    model, columns = EXPORTS[name]
+    fields = [field for _, field in columns]
+    updated_at, pk = fields.index("updated_at"), fields.index("id")
+    queryset = model.objects.order_by("updated_at", "id").values_list(*fields)
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+
+    chunk = queryset
+    while True:
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_updated_at, last_pk = rows[-1][updated_at], rows[-1][pk]
+        chunk = queryset.filter(
+            Q(updated_at__gt=last_updated_at)
+            | Q(updated_at=last_updated_at, id__gt=last_pk)
+        )
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def ndjson_lines(name, rows):
+    keys = [key for key, _ in EXPORTS[name][1]]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, map(_plain, row))), ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """
+    Objeto con `write()` que devuelve la línea en lugar de guardarla, para que
+    `csv.writer` pueda generar la salida fila a fila.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(name, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([key for key, _ in EXPORTS[name][1]])
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def export_lines(name, fmt, since=None, chunk_size=2000):
+    """
+    Genera las líneas de la exportación `name` en formato NDJSON o CSV.
+    """
+    rows = export_rows(name, since=since, chunk_size=chunk_size)
+    if fmt == "csv":
+        return csv_lines(name, rows)
+    return ndjson_lines(name, rows)
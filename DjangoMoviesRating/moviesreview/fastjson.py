@@ -0,0 +1,72 @@
+"""
+Renderizador y parser JSON basados en orjson, con la misma salida byte a byte
+que `JSONRenderer` y `JSONParser` de DRF.
+
+orjson escribe directamente los bytes de la respuesta en C, sin pasar por el
+codificador de Python ni por una cadena intermedia. En los pocos casos en los
+que su formato difiere del de `json` (números en notación exponencial,
+sangrado, claves no textuales o tipos que no admite) se usa la clase de DRF.
+Si orjson no está instalado, ambas clases se comportan como las de DRF.
+"""
+
+import io
+import re
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Números que `json` escribe en notación exponencial (|x| >= 1e16 o < 1e-4) y
+# orjson no: `1e+16` frente a `1e16`, `1e-05` frente a `0.00001`.
+EXPONENT_FLOAT = re.compile(rb"[\[:,]-?(?:\d+(?:\.\d+)?e|0\.0000)")
+# Enteros que no caben en 64 bits, que orjson lee como float y `json` como int.
+LONG_INTEGER = re.compile(rb"\d{19}")
+# DRF escapa los separadores de línea y párrafo de Unicode para JavaScript.
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if EXPONENT_FLOAT.search(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"\xe2\x80" in content:
+            for raw, escaped in LINE_SEPARATORS:
+                content = content.replace(raw, escaped)
+        return content
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        if orjson is None or encoding.lower().replace("_", "-") != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_INTEGER.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Surrogates sueltos, constantes como NaN o JSON inválido: `json`
+            # decide, con el mismo mensaje de error que DRF.
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,177 @@
+import codecs
+import csv
+import io
+import json
+import time
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from . import changes
+from .models import Movie, Review
+from .ratings import rebuild_movie_ratings
+from .search import memory_index
+from .serializers import ReviewBulkSerializer, lock_reviewers
+from .versions import REVIEWS, bump_version
+
+FORMATS = ("jsonl", "csv")
+
+# Número máximo de errores de fila que se incluyen en el informe.
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_records(stream, fmt):
+    """
+    Recorre un flujo JSONL o CSV registro a registro, sin cargarlo entero en
+    memoria. Acepta flujos binarios o de texto.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    if not isinstance(stream, io.TextIOBase):
+        stream = codecs.iterdecode(stream, "utf-8")
+
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _prefetch(rows, key, queryset):
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get(key)))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return queryset.in_bulk(ids)
+
+
+def _drop_duplicates(reviews):
+    """
+    Descarta las reseñas cuyo par (usuario, película) ya existe en la base de
+    datos o se repite dentro del lote, con una sola consulta por lote.
+
+    :return: Las reseñas conservadas y el número de descartadas.
+    """
+    pairs = {(review.user_id, review.movie_id) for review in reviews if review.user_id}
+    existing = set(
+        Review.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            movie_id__in={movie_id for _, movie_id in pairs},
+        ).values_list("user_id", "movie_id")
+    )
+    kept = []
+    for review in reviews:
+        pair = (review.user_id, review.movie_id)
+        if review.user_id and pair in existing:
+            continue
+        existing.add(pair)
+        kept.append(review)
+    return kept, len(reviews) - len(kept)
+
+
+def _created_ids(reviews, last_id):
+    """
+    IDs y películas de las reseñas que acaba de insertar `bulk_create`.
+
+    MySQL no devuelve las claves primarias: se leen las reseñas con un ID
+    mayor que el último anterior al lote y con los mismos pares (usuario,
+    película). Una reseña de esos pares que otra transacción confirme a la vez
+    solo añadiría un evento "created" repetido de esa reseña.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [(review.pk, review.movie_id) for review in reviews]
+    pairs = {(review.user_id, review.movie_id) for review in reviews}
+    rows = Review.objects.filter(
+        pk__gt=last_id, movie_id__in={movie_id for _, movie_id in pairs}
+    ).values_list("pk", "movie_id", "user_id")
+    return [
+        (pk, movie_id) for pk, movie_id, user_id in rows if (user_id, movie_id) in pairs
+    ]
+
+
+def import_reviews(records, user=None, chunk_size=1000):
+    """
+    Importa reseñas en lotes de `chunk_size`: valida cada lote con
+    `ReviewBulkSerializer(many=True)`, inserta las filas válidas con
+    `bulk_create` en su propia transacción, junto con sus eventos "created"
+    del feed de cambios, y, al terminar, recalcula una sola vez la
+    calificación de cada película afectada.
+
+    :param records: Iterable de diccionarios con los campos de `Review`.
+    :param user: Si se indica, autor de todas las reseñas importadas.
+    :return: Un diccionario con el informe de la importación.
+    """
+    started = time.perf_counter()
+    records = iter(records)
+    created = 0
+    invalid = 0
+    errors = []
+    affected_movies = set()
+    offset = 0
+
+    # Si la importación se interrumpe, las películas de los lotes ya
+    # confirmados se recalculan igualmente.
+    try:
+        while True:
+            rows = list(islice(records, chunk_size))
+            if not rows:
+                break
+
+            context = {
+                "prefetched": {
+                    "movie": _prefetch(rows, "movie", Movie.objects.all()),
+                    "user": _prefetch(rows, "user", User.objects.all()),
+                }
+            }
+            serializer = ReviewBulkSerializer(data=rows, many=True, context=context)
+            serializer.is_valid()
+            for index, detail in serializer.row_errors.items():
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": offset + index + 1, "errors": detail})
+
+            reviews = []
+            for data in serializer.validated_data:
+                if user is not None:
+                    data["user"] = user
+                reviews.append(Review(**data))
+
+            with transaction.atomic():
+                if settings.MOVIES_ONE_REVIEW_PER_USER:
+                    lock_reviewers(review.user_id for review in reviews)
+                    reviews, duplicates = _drop_duplicates(reviews)
+                    invalid += duplicates
+                last_id = None
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    last_id = Review.objects.aggregate(last=Max("pk"))["last"] or 0
+                Review.objects.bulk_create(reviews, batch_size=chunk_size)
+                if reviews:
+                    changes.reviews_created(_created_ids(reviews, last_id))
+            affected_movies.update(review.movie_id for review in reviews)
+            created += len(reviews)
+            offset += len(rows)
+    finally:
+        if affected_movies:
+            rebuild_movie_ratings(affected_movies)
+        if created:
+            bump_version(REVIEWS)
+            # bulk_create no emite señales: el índice de búsqueda en memoria se
+            # reconstruye en la próxima consulta.
+            transaction.on_commit(memory_index.invalidate)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": offset,
+        "created": created,
+        "invalid": invalid,
+        "movies": len(affected_movies),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(offset / elapsed, 1) if elapsed else None,
+        "errors": errors,
+    }
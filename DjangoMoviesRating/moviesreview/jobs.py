@@ -0,0 +1,161 @@
+"""
+Cola de recálculo de calificaciones del modo de escritura "deferred".
+
+En ese modo las escrituras de reseñas no tocan la fila de la película: cada
+reseña creada, editada o eliminada inserta en su misma transacción un
+`RatingJob` por película afectada y responde en cuanto se confirma. Tras el
+commit, las películas pasan a un conjunto de pendientes que atiende un pool de
+`WORKERS` hilos del proceso; varias escrituras sobre una película antes de que
+un hilo la recoja se resuelven con un solo recálculo desde sus reseñas
+(`ratings.rebuild_movie_ratings`), que además es idempotente.
+
+Los trabajos se borran en la misma transacción que el recálculo, así que los
+que no llegaron a ejecutarse (reinicio, error) siguen en la tabla y los recoge
+`drain_rating_jobs`. Con `WORKERS` a 0 no se arranca ningún hilo y la cola
+solo se procesa con `drain()`, de forma determinista (p. ej. en pruebas).
+
+Cada recálculo bloquea las filas de sus películas antes de leer las reseñas,
+así que dos trabajadores con trabajos de la misma película la recalculan uno
+detrás de otro.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, connections, transaction
+from .models import Movie, RatingJob
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Películas con trabajos confirmados que ningún hilo ha recogido aún.
+_pending = set()
+_executor = None
+
+
+def enqueue(movie_ids):
+    """
+    Registra el recálculo de `movie_ids` dentro de la transacción actual y lo
+    programa en el pool de trabajadores cuando se confirme.
+    """
+    movie_ids = sorted({movie_id for movie_id in movie_ids if movie_id})
+    RatingJob.objects.bulk_create(
+        RatingJob(movie_id=movie_id) for movie_id in movie_ids
+    )
+    transaction.on_commit(lambda: schedule(movie_ids))
+
+
+def schedule(movie_ids):
+    """
+    Añade películas al conjunto de pendientes y despierta a un trabajador si
+    alguna no estaba ya pendiente.
+    """
+    workers = settings.MOVIES_RATING_JOBS["WORKERS"]
+    if not workers:
+        return
+    global _executor
+    with _lock:
+        new = set(movie_ids) - _pending
+        if not new:
+            return
+        _pending.update(new)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers, thread_name_prefix="rating-jobs")
+        executor = _executor
+    executor.submit(_work)
+
+
+def _work():
+    batch_size = settings.MOVIES_RATING_JOBS["BATCH_SIZE"]
+    try:
+        while True:
+            with _lock:
+                if not _pending:
+                    return
+                batch = [_pending.pop() for _ in range(min(batch_size, len(_pending)))]
+            try:
+                process(batch)
+            except Exception:
+                # Los trabajos siguen en la tabla hasta el próximo intento.
+                logger.exception("Error al recalcular las películas %s.", batch)
+    finally:
+        connections.close_all()
+
+
+def process(movie_ids=None, limit=None, skip_locked=True):
+    """
+    Recalcula las películas con trabajos pendientes y borra sus trabajos, en
+    una sola transacción.
+
+    :param movie_ids: Películas a procesar. Si es None, las primeras `limit`
+        (`BATCH_SIZE` por defecto) con trabajos, por ID.
+    :param skip_locked: Deja los trabajos que tenga bloqueados otro
+        trabajador en lugar de esperar a que termine.
+    :return: El número de películas recalculadas.
+    """
+    from .ratings import rebuild_movie_ratings
+
+    jobs = RatingJob.objects.order_by()
+    if movie_ids is None:
+        limit = limit or settings.MOVIES_RATING_JOBS["BATCH_SIZE"]
+        movie_ids = list(
+            jobs.order_by("movie_id")
+            .values_list("movie_id", flat=True)
+            .distinct()[:limit]
+        )
+    if not movie_ids:
+        return 0
+
+    skip_locked = skip_locked and connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        # Las filas que tenga bloqueadas otro trabajador se dejan para él.
+        claimed = list(
+            jobs.select_for_update(skip_locked=skip_locked)
+            .filter(movie_id__in=movie_ids)
+            .values_list("pk", "movie_id")
+        )
+        if not claimed:
+            return 0
+        movies = sorted({movie_id for _, movie_id in claimed})
+        # Otro trabajador puede estar recalculando las mismas películas por
+        # trabajos posteriores. Se bloquean sus filas (por ID, siempre en el
+        # mismo orden) antes de leer las reseñas, para que el recálculo que
+        # confirme el último no se haya hecho con una lectura anterior.
+        list(
+            Movie.objects.select_for_update()
+            .filter(pk__in=movies)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        rebuild_movie_ratings(movies)
+        RatingJob.objects.filter(pk__in=[pk for pk, _ in claimed]).delete()
+    return len(movies)
+
+
+def drain(batch_size=None):
+    """
+    Procesa en el hilo actual todos los trabajos de la tabla, incluidos los
+    que quedaron de ejecuciones anteriores. Espera a los que tenga bloqueados
+    otro trabajador y no termina mientras quede alguno.
+
+    :return: El número de recálculos de película hechos.
+    """
+    total = 0
+    # Un lote sin trabajos reclamados no significa que la cola esté vacía:
+    # sus trabajos pudo borrarlos otro trabajador mientras se esperaba.
+    while RatingJob.objects.exists():
+        total += process(limit=batch_size, skip_locked=False)
+    return total
+
+
+def wait():
+    """
+    Espera a que el pool termine los recálculos programados y lo detiene (se
+    vuelve a crear con la próxima escritura).
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
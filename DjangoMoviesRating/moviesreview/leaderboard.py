@@ -0,0 +1,231 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from .models import Movie
+from .ranking import DEFAULT_RANKING, RANKINGS
+
+# Orden del ranking por defecto: mayor calificación, después más reseñas y,
+# ante empate, la película más antigua. Coincide con el índice
+# `movie_ranking_idx`.
+RANKING_ORDER = RANKINGS[DEFAULT_RANKING]
+
+# Distingue los rankings de este proceso de los de otros en `version`.
+_process_token = uuid.uuid4().hex
+
+
+class Leaderboard:
+    """
+    Ranking de películas mantenido en memoria como una lista ordenada de
+    claves derivadas de `ordering`, p. ej. `(-average_rating, -rating_count, id)`.
+
+    Se carga una sola vez desde la base de datos (usando el índice del ranking)
+    y después se actualiza de forma incremental cada vez que cambia la
+    calificación de una película en este proceso. Para recoger los cambios
+    hechos por otros procesos se recarga completo cada `MOVIES_LEADERBOARD_TTL`
+    segundos.
+    """
+
+    def __init__(self, ordering=RANKING_ORDER):
+        self.ordering = ordering
+        self.fields = [field.lstrip("-") for field in ordering]
+        self._lock = threading.Lock()
+        self._keys = []
+        self._by_id = {}
+        self._loaded_at = None
+        # Aumenta con cada cambio del ranking (ver `version`).
+        self.revision = 0
+
+    def _key(self, values):
+        # La última columna de la ordenación es el ID de la película.
+        return tuple(
+            -value if field.startswith("-") else value
+            for field, value in zip(self.ordering, values)
+        )
+
+    def _is_fresh(self):
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < settings.MOVIES_LEADERBOARD_TTL
+        )
+
+    def load(self):
+        """
+        Recarga el ranking completo desde la base de datos primaria: el
+        ranking lo comparten todas las peticiones del proceso y no debe
+        cargarse desde una réplica con retraso.
+        """
+        rows = (
+            Movie.objects.using(DEFAULT_DB_ALIAS)
+            .order_by(*self.ordering)
+            .values_list(*self.fields)
+            .iterator(chunk_size=5000)
+        )
+        keys = [self._key(row) for row in rows]
+        with self._lock:
+            self._keys = keys
+            self._by_id = {key[-1]: key for key in keys}
+            self._loaded_at = time.monotonic()
+            self.revision += 1
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def refresh(self):
+        """
+        Recarga el ranking si no se ha cargado o ha caducado.
+        """
+        if not self._is_fresh():
+            self.load()
+
+    def top(self, number):
+        """
+        Devuelve los IDs de las `number` películas mejor clasificadas.
+        """
+        self.refresh()
+        with self._lock:
+            return [key[-1] for key in self._keys[:number]]
+
+    async def atop(self, number):
+        """
+        Variante asíncrona de `top`: solo sale del bucle de eventos si hay que
+        recargar el ranking desde la base de datos.
+        """
+        if not self._is_fresh():
+            await sync_to_async(self.load)()
+        with self._lock:
+            return [key[-1] for key in self._keys[:number]]
+
+    def update(self, movie_id, values):
+        """
+        Reubica una película en el ranking tras cambiar su calificación.
+
+        :param values: Diccionario con los valores de las columnas del ranking.
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._remove(movie_id)
+            key = self._key([values[field] for field in self.fields])
+            insort(self._keys, key)
+            self._by_id[movie_id] = key
+            self.revision += 1
+
+    def discard(self, movie_id):
+        """
+        Quita una película del ranking.
+        """
+        with self._lock:
+            self._remove(movie_id)
+
+    def invalidate(self):
+        """
+        Fuerza una recarga completa en la próxima consulta.
+        """
+        with self._lock:
+            self._loaded_at = None
+            self.revision += 1
+
+    def _remove(self, movie_id):
+        key = self._by_id.pop(movie_id, None)
+        if key is None:
+            return
+        self.revision += 1
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+
+
+leaderboards = {name: Leaderboard(ordering) for name, ordering in RANKINGS.items()}
+leaderboard = leaderboards[DEFAULT_RANKING]
+
+
+def top_movies(number, ranking=DEFAULT_RANKING):
+    """
+    Devuelve las `number` películas mejor clasificadas según `ranking`, en
+    orden.
+
+    Si el ranking en memoria está desactivado (`MOVIES_LEADERBOARD_ENABLED`),
+    se consulta la base de datos a través del índice del ranking.
+    """
+    if not settings.MOVIES_LEADERBOARD_ENABLED:
+        return list(Movie.objects.order_by(*RANKINGS[ranking])[:number])
+
+    movie_ids = leaderboards[ranking].top(number)
+    movies = Movie.objects.in_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+async def atop_movies(number, ranking=DEFAULT_RANKING):
+    """
+    Variante asíncrona de `top_movies` con el ORM asíncrono de Django.
+    """
+    if not settings.MOVIES_LEADERBOARD_ENABLED:
+        ordered = Movie.objects.order_by(*RANKINGS[ranking])
+        return [movie async for movie in ordered[:number]]
+
+    movie_ids = await leaderboards[ranking].atop(number)
+    movies = await Movie.objects.ain_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+def version(ranking=DEFAULT_RANKING):
+    """
+    Versión del ranking `ranking` de este proceso, ya recargado si había
+    caducado, para las claves de caché y los ETag de las respuestas que se
+    construyen con él. Cambia con cada actualización del ranking y es
+    distinta en cada proceso, así que una respuesta nunca se reutiliza con
+    un ranking distinto del que la generó.
+    """
+    board = leaderboards.get(ranking)
+    if not settings.MOVIES_LEADERBOARD_ENABLED or board is None:
+        return ""
+    board.refresh()
+    return f"{_process_token}:{board.revision}"
+
+
+def rating_changed(movie_id):
+    """
+    Gancho para las rutas de escritura: reubica la película en los rankings
+    cargados con sus puntuaciones actuales.
+    """
+    ratings_changed([movie_id])
+
+
+def ratings_changed(movie_ids):
+    """
+    Como `rating_changed`, para varias películas con una sola consulta.
+    """
+    loaded = [board for board in leaderboards.values() if board.loaded]
+    if not loaded:
+        return
+    fields = {"id"} | {field for board in loaded for field in board.fields}
+    rows = Movie.objects.filter(pk__in=movie_ids).values(*fields)
+    current = {values["id"]: values for values in rows}
+    for movie_id in movie_ids:
+        values = current.get(movie_id)
+        for board in loaded:
+            if values is None:
+                board.discard(movie_id)
+            else:
+                board.update(movie_id, values)
+
+
+def discard(movie_id):
+    """
+    Quita una película eliminada de todos los rankings.
+    """
+    for board in leaderboards.values():
+        board.discard(movie_id)
+
+
+def invalidate():
+    """
+    Fuerza la recarga de todos los rankings en su próxima consulta.
+    """
+    for board in leaderboards.values():
+        board.invalidate()
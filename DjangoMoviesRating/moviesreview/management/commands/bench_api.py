@@ -0,0 +1,552 @@
+import json
+import random
+import subprocess
+from contextlib import ExitStack
+from datetime import timedelta
+from urllib.parse import quote
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from moviesreview import recommendations
+from moviesreview.benchmarks import Timer, benchmark_database, percentile, seed_dataset
+from moviesreview.models import Director, Movie, Review
+from moviesreview.permissions import ADMINISTRATORS_GROUP
+
+
+def review_body(context):
+    return {
+        "movie": context.movie_id(),
+        "rating": context.random.randint(1, 5),
+        "comment": "Reseña del benchmark.",
+    }
+
+
+def movie_body(context):
+    return {
+        "name": f"Benchmark {context.random.random()}",
+        "director": context.random.choice(context.director_ids),
+        "release_date": "2020-01-01",
+    }
+
+
+def director_body(context):
+    return {"name": "Benchmark", "last_name": "API", "birth_date": "1970-01-01"}
+
+
+# Cada escenario es una ruta de moviesreview/urls.py (o de la API de tokens).
+# `request` devuelve `(ruta, cuerpo)` para cada petición; `prepare` crea sin
+# medir los objetos que consumirá el escenario (p. ej. los que se eliminan).
+SCENARIOS = {
+    # Lecturas
+    "api-root": {"route": "", "request": lambda c: ("/api/", None)},
+    "reviews-list": {
+        "route": "^reviews/$",
+        "request": lambda c: ("/api/reviews/", None),
+    },
+    "reviews-detail": {
+        "route": "^reviews/(?P<pk>[^/.]+)/$",
+        "request": lambda c: (f"/api/reviews/{c.random.choice(c.review_ids)}/", None),
+    },
+    "reviews-export": {
+        "route": "reviews/export/",
+        "request": lambda c: (f"/api/reviews/export/?since={c.since}", None),
+    },
+    "critic-reviews": {
+        "route": "reviews/critic/",
+        "request": lambda c: ("/api/reviews/critic/", None),
+    },
+    "critic-reviews-movie": {
+        "route": "reviews/critic/<int:movie_id>/",
+        "request": lambda c: (f"/api/reviews/critic/{c.user_movie_id()}/", None),
+    },
+    "movies-list": {"route": "movies/", "request": lambda c: ("/api/movies/", None)},
+    "movies-list ?order=rating": {
+        "route": "movies/",
+        "request": lambda c: ("/api/movies/?order=rating", None),
+    },
+    "movies-export": {
+        "route": "movies/export/",
+        "request": lambda c: (f"/api/movies/export/?since={c.since}", None),
+    },
+    "movies-stats": {
+        "route": "movies/<int:pk>/stats/",
+        "request": lambda c: (f"/api/movies/{c.movie_id()}/stats/", None),
+    },
+    "movies-similar": {
+        "route": "movies/<int:pk>/similar/",
+        "request": lambda c: (f"/api/movies/{c.movie_id()}/similar/", None),
+    },
+    "movies-recommended": {
+        "route": "movies/recommended/",
+        "request": lambda c: ("/api/movies/recommended/", None),
+    },
+    "top-movies": {
+        "route": "movies/top/<int:top_number>/",
+        "request": lambda c: ("/api/movies/top/10/", None),
+    },
+    "top-movies ?ranking=bayesian": {
+        "route": "movies/top/<int:top_number>/",
+        "request": lambda c: ("/api/movies/top/10/?ranking=bayesian", None),
+    },
+    "top-movies-by-user": {
+        "route": "movies/user/<int:top_number>/",
+        "request": lambda c: ("/api/movies/user/10/", None),
+    },
+    "directors-list": {
+        "route": "directors/",
+        "request": lambda c: ("/api/directors/", None),
+    },
+    "directors-detail": {
+        "route": "directors/<int:pk>/",
+        "request": lambda c: (
+            f"/api/directors/{c.random.choice(c.director_ids)}/",
+            None,
+        ),
+    },
+    "top-directors": {
+        "route": "directors/top/<int:top_number>/",
+        "request": lambda c: ("/api/directors/top/10/", None),
+    },
+    "search": {
+        "route": "search/",
+        "request": lambda c: (f"/api/search/?q={c.search_term()}", None),
+    },
+    "search-autocomplete": {
+        "route": "search/autocomplete/",
+        "request": lambda c: (
+            f"/api/search/autocomplete/?q={c.search_term()[:3]}",
+            None,
+        ),
+    },
+    "query-stats": {
+        "route": "stats/queries/",
+        "request": lambda c: ("/api/stats/queries/", None),
+    },
+    "async-movies-list": {
+        "route": "async/movies/",
+        "request": lambda c: ("/api/async/movies/", None),
+    },
+    "async-top-movies": {
+        "route": "async/movies/top/<int:top_number>/",
+        "request": lambda c: ("/api/async/movies/top/10/", None),
+    },
+    "async-top-movies-by-user": {
+        "route": "async/movies/user/<int:top_number>/",
+        "request": lambda c: ("/api/async/movies/user/10/", None),
+    },
+    "async-directors-list": {
+        "route": "async/directors/",
+        "request": lambda c: ("/api/async/directors/", None),
+    },
+    "async-critic-reviews": {
+        "route": "async/reviews/critic/",
+        "request": lambda c: ("/api/async/reviews/critic/", None),
+    },
+    "async-critic-reviews-movie": {
+        "route": "async/reviews/critic/<int:movie_id>/",
+        "request": lambda c: (f"/api/async/reviews/critic/{c.user_movie_id()}/", None),
+    },
+    "changes": {
+        "route": "changes/",
+        "request": lambda c: ("/api/changes/?cursor=0&limit=100", None),
+    },
+    # El stream dura STREAM_SECONDS: su latencia es esa duración; sirve para
+    # comparar las consultas por petición.
+    "changes-stream": {
+        "route": "changes/stream/",
+        "settings": {
+            "MOVIES_CHANGES": {
+                **settings.MOVIES_CHANGES,
+                "STREAM_SECONDS": 0.05,
+                "POLL_INTERVAL": 0.05,
+            }
+        },
+        "request": lambda c: ("/api/changes/stream/?limit=100", None),
+    },
+    # Escrituras de reseñas (incluyen el recálculo de la calificación)
+    "reviews-create": {
+        "route": "^reviews/$",
+        "method": "post",
+        "request": lambda c: ("/api/reviews/", review_body(c)),
+    },
+    "reviews-update": {
+        "route": "^reviews/(?P<pk>[^/.]+)/$",
+        "method": "patch",
+        "prepare": lambda c, count: c.create("reviews", count),
+        "request": lambda c: (
+            f"/api/reviews/{c.next('reviews')}/",
+            {"rating": c.random.randint(1, 5)},
+        ),
+    },
+    "reviews-delete": {
+        "route": "^reviews/(?P<pk>[^/.]+)/$",
+        "method": "delete",
+        "prepare": lambda c, count: c.create("reviews", count),
+        "request": lambda c: (f"/api/reviews/{c.pop('reviews')}/", None),
+    },
+    "reviews-bulk": {
+        "route": "^reviews/bulk/$",
+        "method": "post",
+        "request": lambda c: (
+            "/api/reviews/bulk/",
+            [review_body(c) for _ in range(50)],
+        ),
+    },
+    "critic-reviews-update": {
+        "route": "reviews/critic/update/<int:pk>/",
+        "method": "patch",
+        "prepare": lambda c, count: c.create("reviews", count),
+        "request": lambda c: (
+            f"/api/reviews/critic/update/{c.next('reviews')}/",
+            {"rating": c.random.randint(1, 5)},
+        ),
+    },
+    "critic-reviews-delete": {
+        "route": "reviews/critic/delete/<int:pk>/",
+        "method": "delete",
+        "prepare": lambda c, count: c.create("reviews", count),
+        "request": lambda c: (f"/api/reviews/critic/delete/{c.pop('reviews')}/", None),
+    },
+    # Escrituras de películas y directores
+    "movies-create": {
+        "route": "movies/create/",
+        "method": "post",
+        "request": lambda c: ("/api/movies/create/", movie_body(c)),
+    },
+    "movies-update": {
+        "route": "movies/update/<int:pk>/",
+        "method": "patch",
+        "prepare": lambda c, count: c.create("movies", count),
+        "request": lambda c: (
+            f"/api/movies/update/{c.next('movies')}/",
+            {"description": "Actualizada por el benchmark."},
+        ),
+    },
+    "movies-delete": {
+        "route": "movies/delete/<int:pk>/",
+        "method": "delete",
+        "prepare": lambda c, count: c.create("movies", count),
+        "request": lambda c: (f"/api/movies/delete/{c.pop('movies')}/", None),
+    },
+    "directors-create": {
+        "route": "directors/create/",
+        "method": "post",
+        "request": lambda c: ("/api/directors/create/", director_body(c)),
+    },
+    "directors-update": {
+        "route": "directors/update/<int:pk>/",
+        "method": "patch",
+        "prepare": lambda c, count: c.create("directors", count),
+        "request": lambda c: (
+            f"/api/directors/update/{c.next('directors')}/",
+            {"name": "Actualizado"},
+        ),
+    },
+    "directors-delete": {
+        "route": "directors/delete/<int:pk>/",
+        "method": "delete",
+        "prepare": lambda c, count: c.create("directors", count),
+        "request": lambda c: (f"/api/directors/delete/{c.pop('directors')}/", None),
+    },
+    # Autenticación
+    "token-obtain": {
+        "route": "api/token/",
+        "method": "post",
+        "anonymous": True,
+        "request": lambda c: (
+            "/api/token/",
+            {"username": c.user.username, "password": c.password},
+        ),
+    },
+    "token-logout": {
+        "route": "token/logout/",
+        "method": "post",
+        "fresh_token": True,
+        "request": lambda c: ("/api/token/logout/", None),
+    },
+}
+
+CREATE_ENDPOINTS = {
+    "reviews": ("/api/reviews/", review_body),
+    "movies": ("/api/movies/create/", movie_body),
+    "directors": ("/api/directors/create/", director_body),
+}
+
+
+class Context:
+    """
+    Datos que comparten los escenarios: el usuario del benchmark, IDs de los
+    que elegir al azar (con una semilla fija) y colas de objetos creados.
+    """
+
+    password = "benchmark-password"
+
+    def __init__(self, client, user, seed):
+        self.client = client
+        self.user = user
+        self.random = random.Random(seed)
+        # Las películas más reseñadas, que son las más pedidas.
+        self.movie_ids = list(
+            Movie.objects.order_by("-rating_count", "id").values_list("pk", flat=True)[
+                :1000
+            ]
+        )
+        self.director_ids = list(
+            Director.objects.order_by("-review_count", "id").values_list(
+                "pk", flat=True
+            )[:1000]
+        )
+        self.review_ids = list(
+            Review.objects.order_by("-id").values_list("pk", flat=True)[:1000]
+        )
+        self.user_movie_ids = list(
+            Review.objects.filter(user=user)
+            .values_list("movie_id", flat=True)
+            .distinct()[:1000]
+        )
+        self.search_terms = [
+            word
+            for name in Movie.objects.order_by("-rating_count").values_list(
+                "name", flat=True
+            )[:100]
+            for word in name.split()
+            if not word.isdigit()
+        ]
+        # El último día de reseñas: los datos sintéticos terminan en SEED_DATE.
+        latest = Review.objects.aggregate(last=Max("updated_at"))["last"]
+        self.since = quote(((latest or timezone.now()) - timedelta(days=1)).isoformat())
+        self.pools = {}
+
+    def movie_id(self):
+        return self.random.choice(self.movie_ids)
+
+    def user_movie_id(self):
+        return self.random.choice(self.user_movie_ids or self.movie_ids)
+
+    def search_term(self):
+        return self.random.choice(self.search_terms or ["a"])
+
+    def create(self, kind, count):
+        path, body = CREATE_ENDPOINTS[kind]
+        pool = self.pools.setdefault(kind, [])
+        for _ in range(count):
+            response = self.client.post(
+                path, body(self), content_type="application/json"
+            )
+            if response.status_code != 201:
+                raise CommandError(f"No se pudo crear {kind}: {response.content!r}")
+            pool.append(response.json()["id"])
+
+    def pop(self, kind):
+        return self.pools[kind].pop()
+
+    def next(self, kind):
+        pool = self.pools[kind]
+        pool.append(pool.pop(0))
+        return pool[-1]
+
+    def token_headers(self):
+        return {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+
+def covered_routes(resolver=None, prefix=""):
+    """
+    Rutas (patrón relativo a /api/) de las vistas de la API, sin las
+    variantes con sufijo de formato.
+    """
+    resolver = resolver or get_resolver()
+    routes = set()
+    for pattern in resolver.url_patterns:
+        text = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            if text.startswith("admin/"):
+                continue
+            routes |= covered_routes(pattern, "" if text == "api/" else text)
+        elif isinstance(pattern, URLPattern) and "format" not in text:
+            routes.add(text)
+    return routes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de todas las rutas de la API sobre un conjunto de datos "
+        "sintético: peticiones/s, latencia p50/p99 y consultas por petición. "
+        "Con --output guarda los resultados en JSON y con --compare los "
+        "compara con los de otra ejecución (p. ej. de otro commit)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=2_000)
+        parser.add_argument("--reviews", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=5_000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--only",
+            nargs="*",
+            default=None,
+            help="Escenarios a ejecutar (prefijos de sus nombres).",
+        )
+        parser.add_argument("--output", help="Archivo JSON de resultados.")
+        parser.add_argument("--compare", help="JSON de una ejecución anterior.")
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        scenarios = {
+            name: scenario
+            for name, scenario in SCENARIOS.items()
+            if options["only"] is None
+            or any(name.startswith(prefix) for prefix in options["only"])
+        }
+        missing = covered_routes() - {s["route"] for s in SCENARIOS.values()}
+        if missing:
+            self.stderr.write(f"Rutas sin escenario: {', '.join(sorted(missing))}")
+
+        # El cliente de pruebas envía las peticiones a "testserver".
+        with benchmark_database(keepdb=options["keepdb"]), override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            if not Review.objects.exists():
+                self.stdout.write("Generando datos...")
+                seed_dataset(
+                    options["movies"],
+                    options["reviews"],
+                    options["users"],
+                    seed=options["seed"],
+                )
+            if "movies-similar" in scenarios or "movies-recommended" in scenarios:
+                recommendations.build()
+            context = self.setup_context(options["seed"])
+            results = {}
+            for name, scenario in scenarios.items():
+                results[name] = self.run(context, scenario, options)
+                self.report(name, results[name])
+
+        data = {
+            "commit": self.commit(),
+            "date": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {
+                key: options[key]
+                for key in ("movies", "reviews", "users", "seed", "requests")
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(data, output, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['output']}.")
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def setup_context(self, seed):
+        # El usuario más activo, con permisos de administrador.
+        user_id = (
+            Review.objects.filter(user__isnull=False)
+            .values("user")
+            .annotate(total=Count("pk"))
+            .order_by("-total")
+            .values_list("user", flat=True)[0]
+        )
+        user = User.objects.get(pk=user_id)
+        user.is_superuser = user.is_staff = True
+        user.set_password(Context.password)
+        user.save()
+        group, _ = Group.objects.get_or_create(name=ADMINISTRATORS_GROUP)
+        user.groups.add(group)
+
+        client = Client()
+        context = Context(client, user, seed)
+        client.defaults.update(
+            {"HTTP_AUTHORIZATION": context.token_headers()["Authorization"]}
+        )
+        return context
+
+    def run(self, context, scenario, options):
+        method = scenario.get("method", "get")
+        total = options["warmup"] + options["requests"]
+        if "prepare" in scenario:
+            scenario["prepare"](context, total)
+        client = Client() if scenario.get("anonymous") else context.client
+
+        timings, queries, errors = [], [], 0
+        with override_settings(**scenario.get("settings", {})):
+            for index in range(total):
+                path, body = scenario["request"](context)
+                headers = context.token_headers() if scenario.get("fresh_token") else {}
+                with ExitStack() as stack, Timer() as timer:
+                    captured = [
+                        stack.enter_context(CaptureQueriesContext(alias))
+                        for alias in connections.all()
+                    ]
+                    response = getattr(client, method)(
+                        path,
+                        json.dumps(body) if body is not None else None,
+                        content_type="application/json",
+                        headers=headers,
+                    )
+                    if response.streaming:
+                        # Iterar la respuesta admite también los streams asíncronos.
+                        b"".join(response)
+                if index < options["warmup"]:
+                    continue
+                if response.status_code >= 400:
+                    errors += 1
+                timings.append(timer.elapsed * 1000)
+                queries.append(sum(len(capture) for capture in captured))
+        measured = sum(timings) / 1000
+        return {
+            "requests": len(timings),
+            "throughput": round(len(timings) / measured, 1) if measured else None,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "queries_avg": round(sum(queries) / len(queries), 2),
+            "queries_max": max(queries),
+            "errors": errors,
+        }
+
+    def report(self, name, result):
+        line = (
+            f"{name:<30} {result['throughput']:>8} pet/s "
+            f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+            f"consultas={result['queries_avg']}"
+        )
+        if result["errors"]:
+            line += f" errores={result['errors']}"
+            self.stdout.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(f"\nComparación con {previous.get('commit') or path}:")
+        for name, result in results.items():
+            before = previous["results"].get(name)
+            if before is None:
+                continue
+            changes = []
+            for key in ("throughput", "p50_ms", "p99_ms", "queries_avg"):
+                if before[key]:
+                    change = (result[key] - before[key]) / before[key] * 100
+                    changes.append(f"{key} {change:+.1f}%")
+            self.stdout.write(f"{name:<30} {'  '.join(changes)}")
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from moviesreview.benchmarks import Timer, benchmark_database, percentile, seed_reviews
+from moviesreview.models import Review
+
+ENDPOINTS = {
+    "top-movies": ("/api/movies/top/10/", "/api/async/movies/top/10/"),
+    "top-movies-by-user": ("/api/movies/user/10/", "/api/async/movies/user/10/"),
+    "movies-list": ("/api/movies/", "/api/async/movies/"),
+    "critic-reviews": ("/api/reviews/critic/", "/api/async/reviews/critic/"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento (peticiones/s y p99) de los endpoints de "
+        "lectura síncronos (WSGI, un hilo por petición) frente a sus variantes "
+        "asíncronas (ASGI, corrutinas concurrentes) con la misma concurrencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        # Los clientes de prueba envían las peticiones a "testserver".
+        with benchmark_database(keepdb=options["keepdb"]), override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            if not Review.objects.exists():
+                self.stdout.write(f"Generando {options['rows']} reseñas...")
+                seed_reviews(options["rows"])
+            user = User.objects.filter(review__isnull=False).first()
+            token = str(AccessToken.for_user(user))
+            headers = {"Authorization": f"Bearer {token}"}
+            for name, (sync_url, async_url) in ENDPOINTS.items():
+                sync = self.run_sync(
+                    sync_url, headers, options["requests"], options["concurrency"]
+                )
+                asynchronous = asyncio.run(
+                    self.run_async(
+                        async_url, headers, options["requests"], options["concurrency"]
+                    )
+                )
+                for mode, (elapsed, timings) in (
+                    ("sync", sync),
+                    ("async", asynchronous),
+                ):
+                    self.stdout.write(
+                        f"{name:<20} {mode:<6} "
+                        f"{len(timings) / elapsed:8.1f} pet/s "
+                        f"p50={percentile(timings, 50):.2f}ms "
+                        f"p99={percentile(timings, 99):.2f}ms"
+                    )
+
+    def run_sync(self, url, headers, total, concurrency):
+        client = Client()
+
+        def fetch(_):
+            with Timer() as timer:
+                response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.content
+            return timer.elapsed * 1000
+
+        with Timer() as timer:
+            with ThreadPoolExecutor(concurrency) as pool:
+                timings = list(pool.map(fetch, range(total)))
+        return timer.elapsed, timings
+
+    async def run_async(self, url, headers, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with semaphore:
+                with Timer() as timer:
+                    response = await client.get(url, headers=headers)
+            assert response.status_code == 200, response.content
+            return timer.elapsed * 1000
+
+        with Timer() as timer:
+            timings = await asyncio.gather(*(fetch() for _ in range(total)))
+        return timer.elapsed, list(timings)
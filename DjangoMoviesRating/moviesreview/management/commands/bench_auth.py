@@ -0,0 +1,84 @@
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.models import Permission, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from moviesreview.authentication import (
+    ClaimsJWTAuthentication,
+    ClaimsTokenObtainPairSerializer,
+)
+from moviesreview.benchmarks import Timer, benchmark_database, percentile
+from moviesreview.permissions import CachedDjangoModelPermissions
+from moviesreview.views import MovieListView
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el coste por petición de autenticar y autorizar con sesión, con "
+        "JWT leyendo el usuario de la base de datos y con JWT sin estado "
+        "(claims), en tiempo y en número de consultas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        with benchmark_database(keepdb=options["keepdb"]):
+            user = User.objects.create_user("bench-auth", password="bench-auth")
+            user.user_permissions.set(
+                Permission.objects.filter(content_type__app_label="moviesreview")
+            )
+            user = User.objects.get(pk=user.pk)
+            token = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+
+            factory = APIRequestFactory(SERVER_NAME="localhost")
+
+            def session_request():
+                request = factory.get("/api/movies/")
+                request.session = SessionStore(session.session_key)
+                request.user = SimpleLazyObject(lambda: get_user(request))
+                return request
+
+            def jwt_request():
+                return factory.get("/api/movies/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+            schemes = {
+                "session": (SessionAuthentication, session_request),
+                "jwt": (JWTAuthentication, jwt_request),
+                "jwt-claims": (ClaimsJWTAuthentication, jwt_request),
+            }
+            for name, (authentication, make_request) in schemes.items():
+                self.run(name, authentication, make_request, options["requests"])
+
+    def run(self, name, authentication, make_request, total):
+        view = MovieListView()
+        permission = CachedDjangoModelPermissions()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(total):
+                request = Request(make_request(), authenticators=[authentication()])
+                with Timer() as timer:
+                    request.user
+                    allowed = permission.has_permission(request, view)
+                timings.append(timer.elapsed * 1_000_000)
+                assert allowed, name
+        self.stdout.write(
+            f"{name:<12} media={sum(timings) / total:8.1f}µs "
+            f"p50={percentile(timings, 50):8.1f}µs "
+            f"p99={percentile(timings, 99):8.1f}µs "
+            f"consultas/petición={len(queries) / total:.2f}"
+        )
@@ -0,0 +1,102 @@
+import io
+import json
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from moviesreview.benchmarks import Timer, benchmark_database, seed_dataset
+from moviesreview.fastjson import FastJSONParser, FastJSONRenderer, orjson
+from moviesreview.models import Director, Movie, Review
+from moviesreview.serializers import (
+    DirectorSerializer,
+    MovieSerializer,
+    ReviewSerializer,
+    ReviewValuesSerializer,
+    ValuesSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la serialización de listados con ModelSerializer y "
+        "JSONRenderer de DRF frente a ValuesSerializer (o "
+        "ReviewValuesSerializer) y FastJSONRenderer, desde el queryset hasta "
+        "los bytes de la respuesta, y el parseo de un cuerpo JSON grande con "
+        "JSONParser frente a FastJSONParser. Comprueba que la salida es "
+        "idéntica byte a byte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson no está instalado: se compara DRF consigo mismo.")
+        with benchmark_database(keepdb=options["keepdb"]):
+            if not Review.objects.exists():
+                rows = options["rows"]
+                self.stdout.write(f"Generando {rows} películas y reseñas...")
+                seed_dataset(movies=rows, reviews=rows, users=max(1, rows // 50))
+            self.run(options["rows"], options["repeat"])
+
+    def run(self, rows, repeat):
+        review_reader = ReviewValuesSerializer()
+        cases = {
+            "películas": (
+                Movie.objects.order_by("id")[:rows],
+                MovieSerializer,
+                ValuesSerializer.for_serializer(MovieSerializer),
+            ),
+            "directores": (
+                Director.objects.order_by("id")[:rows],
+                DirectorSerializer,
+                ValuesSerializer.for_serializer(DirectorSerializer),
+            ),
+            "reseñas": (
+                Review.objects.order_by("id")[:rows],
+                ReviewSerializer,
+                review_reader,
+            ),
+        }
+        for name, (queryset, serializer_class, reader) in cases.items():
+
+            def drf():
+                data = serializer_class(queryset, many=True).data
+                return JSONRenderer().render(data)
+
+            def fast():
+                data = reader.serialize(reader.prepare(queryset))
+                return FastJSONRenderer().render(data)
+
+            self.compare(name, drf, fast, repeat)
+
+        body = JSONRenderer().render(
+            ReviewSerializer(Review.objects.order_by("id")[:rows], many=True).data
+        )
+
+        def parse(parser):
+            return lambda: json.dumps(
+                parser().parse(io.BytesIO(body)), separators=(",", ":")
+            ).encode()
+
+        self.compare("parseo reseñas", parse(JSONParser), parse(FastJSONParser), repeat)
+
+    def compare(self, name, drf, fast, repeat):
+        expected, result = drf(), fast()
+        if expected != result:
+            raise CommandError(f"{name}: la salida rápida difiere de la de DRF.")
+        timings = {}
+        for label, case in (("drf", drf), ("rápida", fast)):
+            best = float("inf")
+            for _ in range(repeat):
+                with Timer() as timer:
+                    case()
+                best = min(best, timer.elapsed)
+            timings[label] = best
+        self.stdout.write(
+            f"{name:<16} {len(expected) / 1024:>8.0f}KiB "
+            f"drf={timings['drf'] * 1000:.1f}ms "
+            f"rápida={timings['rápida'] * 1000:.1f}ms "
+            f"x{timings['drf'] / timings['rápida']:.1f}"
+        )
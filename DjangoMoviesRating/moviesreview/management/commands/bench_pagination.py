@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from moviesreview.benchmarks import Timer, benchmark_database, seed_reviews
+from moviesreview.models import Review
+from moviesreview.pagination import ReviewKeysetPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de la primera página y de una página profunda con "
+        "paginación por cursor (keyset) frente a OFFSET sobre la tabla Review."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--page", type=int, default=10_000)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        with benchmark_database(keepdb=options["keepdb"]):
+            if not Review.objects.exists():
+                self.stdout.write(f"Generando {options['rows']} reseñas...")
+                seed_reviews(options["rows"])
+            self.run(options["page"], options["page_size"], options["repeat"])
+
+    def run(self, page, page_size, repeat):
+        queryset = Review.objects.all()
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+        offset = (page - 1) * page_size
+
+        def keyset(cursor_url=None):
+            url = cursor_url or "/api/reviews/"
+            request = Request(factory.get(url, {"page_size": page_size}))
+            paginator = ReviewKeysetPagination()
+            paginator.paginate_queryset(queryset, request)
+            return paginator
+
+        # El cursor de la página profunda se obtiene fuera de la medición, como
+        # lo tendría un cliente que ya recorrió las páginas anteriores.
+        deep_cursor = None
+        if offset:
+            last_row = queryset.order_by("id").values("id")[offset - 1 : offset].get()
+            deep_cursor = keyset().encode_cursor(last_row, reverse=False)
+
+        cases = {
+            "keyset primera": lambda: keyset(),
+            f"keyset página {page}": lambda: keyset(deep_cursor),
+            "offset primera": lambda: list(queryset.order_by("id")[:page_size]),
+            f"offset página {page}": lambda: list(
+                queryset.order_by("id")[offset : offset + page_size]
+            ),
+        }
+        for name, case in cases.items():
+            timings = []
+            for _ in range(repeat):
+                with Timer() as timer:
+                    case()
+                timings.append(timer.elapsed * 1000)
+            self.stdout.write(
+                f"{name:<22} mejor={min(timings):.2f}ms "
+                f"media={sum(timings) / repeat:.2f}ms"
+            )
@@ -0,0 +1,74 @@
+import threading
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from moviesreview.benchmarks import Timer, benchmark_database
+from moviesreview.models import Movie
+from moviesreview.ratings import flush_all_rating_shards, record_rating_delta
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el rendimiento de escritura de calificaciones concurrentes sobre una "
+        "misma película según el número de shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument(
+            "--writes", type=int, default=200, help="Escrituras por hilo."
+        )
+        parser.add_argument(
+            "--shards",
+            default="1,2,4,8,16",
+            help='Lista separada por comas; 0 equivale al modo "direct".',
+        )
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        shard_counts = [int(value) for value in options["shards"].split(",")]
+        with benchmark_database(keepdb=options["keepdb"]):
+            for shards in shard_counts:
+                self.run(shards, options["writers"], options["writes"])
+
+    def run(self, shards, writers, writes):
+        movie = Movie.objects.create(name=f"bench-{shards}", release_date=date.today())
+        mode = "sharded" if shards else "direct"
+        completed = []
+        errors = []
+
+        def writer():
+            done = 0
+            try:
+                for _ in range(writes):
+                    with transaction.atomic():
+                        record_rating_delta(movie.pk, 4.0, 1)
+                    done += 1
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                completed.append(done)
+                connection.close()
+
+        with override_settings(
+            MOVIES_RATING_WRITE_MODE=mode,
+            MOVIES_RATING_SHARDS=max(shards, 1),
+            MOVIES_RATING_MAX_STALENESS=3600,
+        ):
+            threads = [threading.Thread(target=writer) for _ in range(writers)]
+            with Timer() as timer:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            flush_all_rating_shards()
+
+        movie.refresh_from_db()
+        total = sum(completed)
+        self.stdout.write(
+            f"shards={shards:<3} modo={mode:<8} escrituras={total} "
+            f"errores={len(errors)} tiempo={timer.elapsed:.2f}s "
+            f"throughput={total / timer.elapsed:.0f}/s "
+            f"consistente={movie.rating_count == total}"
+        )
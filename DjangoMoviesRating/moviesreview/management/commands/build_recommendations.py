@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from moviesreview.benchmarks import Timer
+from moviesreview.models import Movie
+from moviesreview.recommendations import build, stale_movie_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula con SciPy la similitud entre películas a partir de la matriz "
+        "usuario × película de reseñas y guarda los vecinos de cada una. Por "
+        "defecto solo recalcula las películas cuyas reseñas cambiaron desde la "
+        "última ejecución; con --full, todas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true")
+
+    def handle(self, *args, **options):
+        with Timer() as timer:
+            movie_ids = None if options["full"] else stale_movie_ids()
+            if movie_ids is not None and len(movie_ids) == Movie.objects.count():
+                movie_ids = None
+            if movie_ids == []:
+                built = 0
+            else:
+                built = build(movie_ids)
+        mode = "completo" if movie_ids is None else "incremental"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{built} listas de vecinos guardadas ({mode}) en "
+                f"{timer.elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from moviesreview.benchmarks import Timer
+from moviesreview.changes import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacta el registro de cambios: de los eventos más antiguos que el "
+        "periodo de retención solo conserva el último de cada objeto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention",
+            type=float,
+            default=settings.MOVIES_CHANGES["RETENTION"],
+            help="Segundos durante los que se conservan todos los eventos.",
+        )
+        parser.add_argument(
+            "--drop-deleted",
+            action="store_true",
+            help="Borra también el último evento de los objetos eliminados.",
+        )
+
+    def handle(self, *args, **options):
+        with Timer() as timer:
+            deleted = compact(options["retention"], options["drop_deleted"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{deleted} eventos borrados en {timer.elapsed:.2f}s.")
+        )
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from moviesreview import jobs
+from moviesreview.models import RatingJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los recálculos de calificaciones pendientes en RatingJob "
+        '(modo de escritura "deferred"), incluidos los que quedaron sin '
+        "ejecutar tras reiniciar o al fallar un trabajador."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Procesa la cola periódicamente hasta interrumpir el proceso.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Segundos entre pasadas en modo --loop.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Películas recalculadas por transacción.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = jobs.drain(options["batch_size"])
+            if options["verbosity"] > 1 or not options["loop"]:
+                remaining = RatingJob.objects.count()
+                self.stdout.write(
+                    f"{processed} películas recalculadas, {remaining} trabajos "
+                    "pendientes."
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
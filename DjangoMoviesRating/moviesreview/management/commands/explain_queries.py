@@ -0,0 +1,178 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Avg, Count, Max
+from moviesreview.benchmarks import benchmark_database, seed_reviews
+from moviesreview.changes import events_after
+from moviesreview.leaderboard import RANKING_ORDER
+from moviesreview.ranking import DIRECTOR_RANKING_ORDER, RANKINGS
+from moviesreview.models import ChangeEvent, Director, Movie, Review
+
+
+def full_scans(plan):
+    """
+    Devuelve las líneas del plan que recorren una tabla completa sin índice
+    y si el plan necesita ordenar en memoria, según el motor de base de datos.
+    """
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        lines = plan.splitlines()
+        scans = [line for line in lines if "SCAN" in line and "INDEX" not in line]
+        sorts = any("TEMP B-TREE" in line for line in lines)
+    elif vendor == "mysql":
+        tables = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                if "table_name" in node:
+                    tables.append(node)
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(plan))
+        scans = [
+            table["table_name"] for table in tables if table.get("access_type") == "ALL"
+        ]
+        sorts = '"using_filesort": true' in plan
+    else:
+        lines = plan.splitlines()
+        scans = [line for line in lines if "Seq Scan" in line]
+        sorts = any(line.strip().startswith("Sort") for line in lines)
+    return scans, sorts
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético y comprueba con EXPLAIN que las "
+        "consultas de cada endpoint usan un índice en lugar de recorrer tablas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--movies", type=int, default=2_000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--verbose-plans", action="store_true")
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        with benchmark_database(keepdb=options["keepdb"]):
+            if not Review.objects.exists():
+                self.stdout.write(f"Generando {options['rows']} reseñas...")
+                seed_reviews(
+                    options["rows"], movies=options["movies"], users=options["users"]
+                )
+            self.analyze()
+            failures = self.check_queries(options["verbose_plans"])
+        if failures:
+            raise CommandError(f"{failures} consultas no usan índice.")
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                for model in (ChangeEvent, Director, Movie, Review):
+                    cursor.execute(f"ANALYZE TABLE {model._meta.db_table}")
+            else:
+                cursor.execute("ANALYZE")
+
+    def queries(self):
+        """
+        Consultas de cada endpoint, construidas igual que en las vistas. El
+        segundo elemento indica si el índice también debe dar el orden.
+        """
+        review = Review.objects.order_by("id").first()
+        user_id, movie_id = review.user_id, review.movie_id
+        user_reviews = Review.objects.filter(user_id=user_id)
+        return {
+            "movies-list": (Movie.objects.order_by("id")[:50], True),
+            "movies-list ?order=rating": (
+                Movie.objects.order_by(*RANKING_ORDER)[:50],
+                True,
+            ),
+            "top-movies": (Movie.objects.order_by(*RANKING_ORDER)[:10], True),
+            "top-movies ?ranking=bayesian": (
+                Movie.objects.order_by(*RANKINGS["bayesian"])[:10],
+                True,
+            ),
+            "top-movies ?ranking=trending": (
+                Movie.objects.order_by(*RANKINGS["trending"])[:10],
+                True,
+            ),
+            "top-directors": (
+                Director.objects.filter(review_count__gt=0).order_by(
+                    *DIRECTOR_RANKING_ORDER
+                )[:10],
+                True,
+            ),
+            "director-filmography": (
+                Movie.objects.filter(director_id=review.movie.director_id),
+                False,
+            ),
+            "movies-export ?since": (
+                Movie.objects.filter(updated_at__gte=review.created_at).order_by(
+                    "updated_at", "id"
+                ),
+                True,
+            ),
+            "reviews-list": (Review.objects.order_by("id")[:50], True),
+            "reviews-list ?order=updated": (
+                Review.objects.order_by("-updated_at", "-id")[:50],
+                True,
+            ),
+            "reviews-export ?since": (
+                Review.objects.filter(updated_at__gte=review.updated_at).order_by(
+                    "updated_at", "id"
+                ),
+                True,
+            ),
+            "critic-reviews": (user_reviews.order_by("-updated_at", "-id")[:50], True),
+            "critic-reviews ETag": (
+                user_reviews.values("user").annotate(
+                    latest=Max("updated_at"), total=Count("pk")
+                ),
+                False,
+            ),
+            "critic-reviews-movie": (
+                user_reviews.filter(movie_id=movie_id).order_by("-updated_at", "-id")[
+                    :50
+                ],
+                True,
+            ),
+            "top-movies-by-user": (
+                Movie.objects.filter(review__user_id=user_id)
+                .annotate(user_avg_rating=Avg("review__rating"))
+                .order_by("-user_avg_rating", "id")[:10],
+                False,
+            ),
+            "changes ?kinds=review": (events_after(0, ["review"]), True),
+            "rebuild-movie-ratings": (
+                Review.objects.filter(movie_id__in=[movie_id]).values_list(
+                    "movie_id", "rating", "created_at"
+                ),
+                False,
+            ),
+        }
+
+    def check_queries(self, verbose_plans):
+        options = {"format": "json"} if connection.vendor == "mysql" else {}
+        failures = 0
+        for name, (queryset, ordered) in self.queries().items():
+            plan = queryset.explain(**options)
+            scans, sorts = full_scans(plan)
+            # Recorrer la tabla en el orden de la clave primaria con LIMIT y
+            # sin ordenar (SQLite lo muestra como SCAN) se detiene al completar
+            # la página, así que no es un recorrido completo.
+            limited = queryset.query.high_mark is not None and ordered and not sorts
+            problems = []
+            if scans and not limited:
+                problems.append("recorrido completo")
+            if ordered and sorts:
+                problems.append("ordenación sin índice")
+            status = "FALLO (" + ", ".join(problems) + ")" if problems else "OK"
+            failures += bool(problems)
+            self.stdout.write(f"{name:<30} {status}")
+            if verbose_plans or problems:
+                self.stdout.write(f"    {plan}".replace("\n", "\n    "))
+        return failures
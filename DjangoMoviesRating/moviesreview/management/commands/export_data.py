@@ -0,0 +1,41 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from moviesreview.export import EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta reseñas o películas en NDJSON o CSV, fila a fila y con memoria "
+        "constante, de forma completa o incremental (--since)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--output-format", choices=sorted(FORMATS), default="ndjson"
+        )
+        parser.add_argument(
+            "--since", help="Fecha ISO 8601: solo filas con updated_at posterior."
+        )
+        parser.add_argument("--output", help="Archivo de salida. Por defecto, stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError("--since debe ser una fecha ISO 8601.")
+
+        lines = export_lines(
+            options["name"],
+            options["output_format"],
+            since=since,
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
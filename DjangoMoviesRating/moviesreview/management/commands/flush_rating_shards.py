@@ -0,0 +1,33 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from moviesreview.ratings import flush_all_rating_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida en Movie los deltas de calificación acumulados en "
+        'MovieRatingShard (modo de escritura "sharded").'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Ejecuta la consolidación periódicamente hasta interrumpir el proceso.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.MOVIES_RATING_MAX_STALENESS,
+            help="Segundos entre consolidaciones en modo --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_all_rating_shards()
+            if options["verbosity"] > 1 or not options["loop"]:
+                self.stdout.write(f"{flushed} películas consolidadas.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
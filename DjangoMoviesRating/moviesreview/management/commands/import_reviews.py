@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from moviesreview.ingest import FORMATS, import_reviews, iter_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa reseñas desde un archivo JSONL o CSV en lotes, recalculando la "
+        "calificación de cada película afectada una sola vez al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Ruta del archivo a importar.")
+        parser.add_argument(
+            "--format",
+            dest="fmt",
+            choices=FORMATS,
+            help="Formato del archivo. Por defecto, según su extensión.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Nombre del usuario autor de las reseñas. Si no se indica, se "
+            "usa la columna `user` de cada fila.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = options["fmt"] or options["path"].rsplit(".", 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError("Indica --format jsonl o --format csv.")
+
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"El usuario {options['user']} no existe.")
+
+        with open(options["path"], "rb") as stream:
+            try:
+                report = import_reviews(
+                    iter_records(stream, fmt),
+                    user=user,
+                    chunk_size=options["chunk_size"],
+                )
+            except (ValueError, UnicodeDecodeError) as exc:
+                raise CommandError(f"No se pudo leer el archivo: {exc}")
+
+        for error in report["errors"]:
+            self.stderr.write(f"Fila {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['created']} reseñas importadas ({report['invalid']} "
+                f"inválidas) en {report['seconds']}s, {report['rows_per_second']} "
+                f"filas/s; {report['movies']} películas recalculadas."
+            )
+        )
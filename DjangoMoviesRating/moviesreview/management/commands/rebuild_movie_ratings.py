@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from moviesreview.ratings import rebuild_movie_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los contadores de calificación (rating_sum, rating_count) y "
+        "el average_rating de las películas a partir de sus reseñas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "movie_ids",
+            nargs="*",
+            type=int,
+            help="IDs de las películas a reconstruir. Por defecto, todas.",
+        )
+
+    def handle(self, *args, **options):
+        movie_ids = options["movie_ids"] or None
+        updated = rebuild_movie_ratings(movie_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"{updated} películas reconstruidas correctamente.")
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from moviesreview import leaderboard
+from moviesreview.benchmarks import Timer
+from moviesreview.ranking import rebuild_scores, refresh_trending
+from moviesreview.ratings import refresh_director_stats
+from moviesreview.versions import MOVIES, bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula con NumPy los contadores y las puntuaciones de ranking "
+        "(bayesian_rating, trending_rating) de las películas a partir de todas "
+        "sus reseñas, y los agregados de sus directores. Con --refresh solo "
+        "actualiza trending_rating al instante actual a partir de los "
+        "contadores, sin leer las reseñas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "movie_ids",
+            nargs="*",
+            type=int,
+            help="IDs de las películas a recalcular. Por defecto, todas.",
+        )
+        parser.add_argument("--refresh", action="store_true")
+
+    def handle(self, *args, **options):
+        with Timer() as timer, transaction.atomic():
+            if options["refresh"]:
+                updated = refresh_trending()
+            else:
+                movie_ids = options["movie_ids"] or None
+                updated = rebuild_scores(movie_ids)
+                refresh_director_stats(movie_ids=movie_ids)
+            transaction.on_commit(leaderboard.invalidate)
+            bump_version(MOVIES)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated} películas recalculadas en {timer.elapsed:.2f}s."
+            )
+        )
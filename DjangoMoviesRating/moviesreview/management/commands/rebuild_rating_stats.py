@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from moviesreview.ratings import rebuild_rating_stats
+from moviesreview.versions import MOVIES, bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la distribución de calificaciones (MovieRatingStats) de las "
+        "películas a partir de sus reseñas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "movie_ids",
+            nargs="*",
+            type=int,
+            help="IDs de las películas a reconstruir. Por defecto, todas.",
+        )
+
+    def handle(self, *args, **options):
+        movie_ids = options["movie_ids"] or None
+        rebuilt = rebuild_rating_stats(movie_ids)
+        bump_version(MOVIES)
+        self.stdout.write(
+            self.style.SUCCESS(f"{rebuilt} películas reconstruidas correctamente.")
+        )
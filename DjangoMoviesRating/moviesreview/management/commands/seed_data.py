@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from moviesreview.benchmarks import Timer, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera en la base de datos configurada un conjunto de datos sintético "
+        "y reproducible (directores, películas, usuarios y reseñas) con la "
+        "popularidad de películas y usuarios distribuida según Zipf."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=10_000)
+        parser.add_argument("--reviews", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=20_000)
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.1,
+            help="Exponente de la Zipf de popularidad de las películas.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        def progress(inserted):
+            self.stdout.write(f"  {inserted}/{options['reviews']} reseñas", ending="\r")
+            self.stdout.flush()
+
+        with Timer() as timer:
+            created = seed_dataset(
+                options["movies"],
+                options["reviews"],
+                options["users"],
+                exponent=options["exponent"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+        self.stdout.write("")
+        summary = ", ".join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(
+            self.style.SUCCESS(f"Creados {summary} en {timer.elapsed:.1f}s.")
+        )
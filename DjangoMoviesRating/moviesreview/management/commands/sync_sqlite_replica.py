@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from moviesreview.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base de datos SQLite primaria en sus réplicas (MOVIES_READ_"
+        "REPLICAS) para simular la replicación en local. Entre dos ejecuciones "
+        "las réplicas se quedan atrás, como una réplica con retraso."
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError("No hay réplicas configuradas.")
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if connections[alias].vendor != "sqlite":
+                raise CommandError(f"La base de datos '{alias}' no es SQLite.")
+
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"{DEFAULT_DB_ALIAS} -> {alias}")
+        self.stdout.write(self.style.SUCCESS("Réplicas sincronizadas."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_counters(apps, schema_editor):
+    Movie = apps.get_model('moviesreview', 'Movie')
+    Review = apps.get_model('moviesreview', 'Review')
+    totals = (
+        Review.objects.values('movie')
+        .annotate(total=Sum('rating'), count=Count('pk'))
+        .order_by()
+    )
+    for entry in totals:
+        Movie.objects.filter(pk=entry['movie']).update(
+            rating_sum=entry['total'],
+            rating_count=entry['count'],
+            average_rating=round(entry['total'] / entry['count'], 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0005_review_created_at_review_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0006_movie_rating_sum_movie_rating_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('sum_delta', models.FloatField(default=0)),
+                ('count_delta', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_shards', to='moviesreview.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('movie', 'shard'), name='unique_movie_rating_shard')],
+            },
+        ),
+    ]
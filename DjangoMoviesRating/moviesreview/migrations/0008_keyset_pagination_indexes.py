@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0007_movieratingshard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-average_rating', '-id'], name='movie_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-updated_at', '-id'], name='review_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='review_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movie_rating_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-average_rating', '-rating_count', 'id'], name='movie_ranking_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0009_movie_ranking_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['updated_at', 'id'], name='movie_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0010_movie_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'movie', '-updated_at', '-id'], name='review_user_movie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'movie', 'rating'], name='review_user_movie_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'rating'], name='review_movie_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:00
+
+from django.db import migrations
+
+FULLTEXT_INDEXES = [
+    ('moviesreview_movie', 'movie_fulltext_idx', 'name, description'),
+    ('moviesreview_director', 'director_fulltext_idx', 'name, last_name'),
+    ('moviesreview_review', 'review_fulltext_idx', 'comment'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    # Solo MySQL tiene índices FULLTEXT; con otros motores la búsqueda usa el
+    # índice en memoria de moviesreview.search.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {name} ON {table} ({columns})')
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, _ in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX {name} ON {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0011_review_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
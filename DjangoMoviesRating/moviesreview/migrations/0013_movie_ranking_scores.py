@@ -0,0 +1,93 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:44
+
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_ranking_scores(apps, schema_editor):
+    Movie = apps.get_model('moviesreview', 'Movie')
+    Review = apps.get_model('moviesreview', 'Review')
+    options = settings.MOVIES_RANKING
+    prior = options['PRIOR_MEAN'] * options['PRIOR_WEIGHT']
+    half_life = options['HALF_LIFE_DAYS'] * 86400
+
+    def weight(moment):
+        return 2.0 ** ((moment - options['EPOCH']).total_seconds() / half_life)
+
+    decayed = defaultdict(lambda: [0.0, 0.0])
+    rows = Review.objects.values_list('movie_id', 'rating', 'created_at')
+    for movie_id, rating, created_at in rows.iterator(chunk_size=5000):
+        review_weight = weight(created_at)
+        decayed[movie_id][0] += rating * review_weight
+        decayed[movie_id][1] += review_weight
+
+    now_weight = weight(timezone.now())
+    movies = list(Movie.objects.only('rating_sum', 'rating_count'))
+    for movie in movies:
+        decayed_sum, decayed_weight = decayed.get(movie.pk, (0.0, 0.0))
+        movie.decayed_sum = decayed_sum
+        movie.decayed_weight = decayed_weight
+        movie.bayesian_rating = round(
+            (prior + movie.rating_sum) / (options['PRIOR_WEIGHT'] + movie.rating_count), 4
+        )
+        movie.trending_rating = round(
+            (prior + decayed_sum / now_weight)
+            / (options['PRIOR_WEIGHT'] + decayed_weight / now_weight),
+            4,
+        )
+    Movie.objects.bulk_update(
+        movies,
+        ['decayed_sum', 'decayed_weight', 'bayesian_rating', 'trending_rating'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0012_fulltext_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='bayesian_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='decayed_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='decayed_weight',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='trending_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='decayed_sum_delta',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='decayed_weight_delta',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-bayesian_rating', '-rating_count', 'id'], name='movie_bayesian_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-trending_rating', '-rating_count', 'id'], name='movie_trending_idx'),
+        ),
+        migrations.RunPython(backfill_ranking_scores, migrations.RunPython.noop),
+    ]
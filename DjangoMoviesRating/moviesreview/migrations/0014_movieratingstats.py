@@ -0,0 +1,48 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:46
+
+import math
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Review = apps.get_model('moviesreview', 'Review')
+    MovieRatingStats = apps.get_model('moviesreview', 'MovieRatingStats')
+    stats = {}
+    rows = Review.objects.values_list('movie_id', 'rating').order_by()
+    for movie_id, rating in rows.iterator(chunk_size=5000):
+        entry = stats.get(movie_id)
+        if entry is None:
+            entry = stats[movie_id] = MovieRatingStats(movie_id=movie_id)
+        bucket = min(5, max(0, math.floor(rating + 0.5)))
+        entry.count += 1
+        entry.rating_sum += rating
+        entry.rating_sum_sq += rating * rating
+        setattr(entry, f'bucket_{bucket}', getattr(entry, f'bucket_{bucket}') + 1)
+    MovieRatingStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0013_movie_ranking_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='moviesreview.movie')),
+                ('count', models.IntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0)),
+                ('rating_sum_sq', models.FloatField(default=0)),
+                ('bucket_0', models.IntegerField(default=0)),
+                ('bucket_1', models.IntegerField(default=0)),
+                ('bucket_2', models.IntegerField(default=0)),
+                ('bucket_3', models.IntegerField(default=0)),
+                ('bucket_4', models.IntegerField(default=0)),
+                ('bucket_5', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
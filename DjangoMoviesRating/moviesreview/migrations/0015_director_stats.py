@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def backfill_director_stats(apps, schema_editor):
+    Director = apps.get_model('moviesreview', 'Director')
+    Movie = apps.get_model('moviesreview', 'Movie')
+    movies = Movie.objects.filter(director=OuterRef('pk')).order_by()
+    rated = movies.filter(rating_count__gt=0)
+    per_director = movies.values('director')
+    Director.objects.update(
+        movie_count=Coalesce(
+            Subquery(per_director.annotate(total=Count('pk')).values('total')), Value(0)
+        ),
+        review_count=Coalesce(
+            Subquery(per_director.annotate(total=Sum('rating_count')).values('total')),
+            Value(0),
+        ),
+        average_rating=Coalesce(
+            Subquery(
+                rated.values('director')
+                .annotate(mean=Round(Avg('average_rating'), 2))
+                .values('mean')
+            ),
+            Value(0.0),
+        ),
+        best_movie=Subquery(
+            rated.order_by('-average_rating', '-rating_count', 'id').values('pk')[:1]
+        ),
+        worst_movie=Subquery(
+            rated.order_by('average_rating', '-rating_count', 'id').values('pk')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0014_movieratingstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='director',
+            name='average_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='director',
+            name='best_movie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='moviesreview.movie'),
+        ),
+        migrations.AddField(
+            model_name='director',
+            name='movie_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='director',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='director',
+            name='worst_movie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='moviesreview.movie'),
+        ),
+        migrations.AddIndex(
+            model_name='director',
+            index=models.Index(fields=['-average_rating', '-review_count', 'id'], name='director_ranking_idx'),
+        ),
+        migrations.RunPython(backfill_director_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0015_director_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieNeighbors',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='neighbors', serialize=False, to='moviesreview.movie')),
+                ('neighbor_ids', models.BinaryField(default=bytes)),
+                ('scores', models.BinaryField(default=bytes)),
+                ('built_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0016_movie_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='moviesreview.movie')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0017_ratingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('action', models.CharField(max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('movie_id', models.BigIntegerField(null=True)),
+                ('average_rating', models.FloatField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'id'], name='change_kind_idx'), models.Index(fields=['kind', 'object_id', 'id'], name='change_object_idx')],
+            },
+        ),
+    ]
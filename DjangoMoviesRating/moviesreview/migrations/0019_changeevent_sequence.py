@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+def number_existing_events(apps, schema_editor):
+    # Los eventos anteriores conservan su id como número de secuencia, así
+    # que los cursores que ya tengan los consumidores siguen siendo válidos.
+    ChangeEvent = apps.get_model('moviesreview', 'ChangeEvent')
+    ChangeSequence = apps.get_model('moviesreview', 'ChangeSequence')
+    ChangeEvent.objects.update(sequence=models.F('id'))
+    last = ChangeEvent.objects.aggregate(last=models.Max('id'))['last'] or 0
+    ChangeSequence.objects.update_or_create(pk=1, defaults={'value': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0018_changeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='changeevent',
+            name='sequence',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='changeevent',
+            name='change_kind_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='changeevent',
+            name='change_object_idx',
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['kind', 'sequence'], name='change_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['kind', 'object_id', 'sequence'], name='change_object_idx'),
+        ),
+        migrations.RunPython(number_existing_events, migrations.RunPython.noop),
+    ]
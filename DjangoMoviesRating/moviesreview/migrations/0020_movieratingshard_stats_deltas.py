@@ -0,0 +1,48 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesreview', '0019_changeevent_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_0_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_1_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_2_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_3_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_4_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='bucket_5_delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movieratingshard',
+            name='rating_sum_sq_delta',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import math
 from datetime import date
 from django.db import models
 from django.contrib.auth.models import User
@@ -7,6 +8,25 @@ class Director(models.Model):
     name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     birth_date = models.DateField(date.today)
+    # Agregados de su filmografía, derivados de los contadores de sus películas
+    # (ver ratings.refresh_director_stats).
+    movie_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+    best_movie = models.ForeignKey(
+        "Movie", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    worst_movie = models.ForeignKey(
+        "Movie", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-average_rating", "-review_count", "id"],
+                name="director_ranking_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} {self.last_name}"
@@ -18,6 +38,31 @@ class Movie(models.Model):
     release_date = models.DateField(date.today)
     description = models.TextField(blank=True)
     average_rating = models.FloatField(default=0)
+    rating_sum = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Puntuaciones precalculadas de los rankings (ver ranking.py).
+    bayesian_rating = models.FloatField(default=0)
+    trending_rating = models.FloatField(default=0)
+    decayed_sum = models.FloatField(default=0)
+    decayed_weight = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-average_rating", "-rating_count", "id"],
+                name="movie_ranking_idx",
+            ),
+            models.Index(
+                fields=["-bayesian_rating", "-rating_count", "id"],
+                name="movie_bayesian_idx",
+            ),
+            models.Index(
+                fields=["-trending_rating", "-rating_count", "id"],
+                name="movie_trending_idx",
+            ),
+            models.Index(fields=["updated_at", "id"], name="movie_updated_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -31,5 +76,197 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-updated_at", "-id"], name="review_updated_idx"),
+            models.Index(
+                fields=["user", "-updated_at", "-id"], name="review_user_updated_idx"
+            ),
+            # Reseñas de un usuario para una película, de la más reciente a la
+            # más antigua (CriticReviewMovieListView).
+            models.Index(
+                fields=["user", "movie", "-updated_at", "-id"],
+                name="review_user_movie_idx",
+            ),
+            # Índices de cobertura para los agregados de calificación por
+            # usuario y película (top_movies_by_user) y por película
+            # (reconstrucción de contadores).
+            models.Index(
+                fields=["user", "movie", "rating"], name="review_user_movie_rating_idx"
+            ),
+            models.Index(fields=["movie", "rating"], name="review_movie_rating_idx"),
+        ]
+
+    def __str__(self):
+        return f"[{self.rating}/5] - {self.comment}"
+
+class MovieRatingShard(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="rating_shards")
+    shard = models.PositiveSmallIntegerField()
+    sum_delta = models.FloatField(default=0)
+    count_delta = models.IntegerField(default=0)
+    decayed_sum_delta = models.FloatField(default=0)
+    decayed_weight_delta = models.FloatField(default=0)
+    # Deltas de la distribución (MovieRatingStats); su número y su suma son
+    # los de count_delta y sum_delta.
+    rating_sum_sq_delta = models.FloatField(default=0)
+    bucket_0_delta = models.IntegerField(default=0)
+    bucket_1_delta = models.IntegerField(default=0)
+    bucket_2_delta = models.IntegerField(default=0)
+    bucket_3_delta = models.IntegerField(default=0)
+    bucket_4_delta = models.IntegerField(default=0)
+    bucket_5_delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["movie", "shard"], name="unique_movie_rating_shard")
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id}#{self.shard} ({self.sum_delta}/{self.count_delta})"
+
+
+class MovieRatingStats(models.Model):
+    """
+    Distribución de las calificaciones de una película, mantenida de forma
+    incremental con cada reseña (en modo "sharded", al consolidar los deltas
+    de `MovieRatingShard`): la media, la varianza y el histograma se leen sin
+    recorrer las reseñas. Cada calificación cuenta en el cubo de la estrella
+    más cercana (0 a 5).
+    """
+    BUCKETS = range(6)
+
+    movie = models.OneToOneField(
+        Movie, on_delete=models.CASCADE, primary_key=True, related_name="rating_stats"
+    )
+    count = models.IntegerField(default=0)
+    rating_sum = models.FloatField(default=0)
+    rating_sum_sq = models.FloatField(default=0)
+    bucket_0 = models.IntegerField(default=0)
+    bucket_1 = models.IntegerField(default=0)
+    bucket_2 = models.IntegerField(default=0)
+    bucket_3 = models.IntegerField(default=0)
+    bucket_4 = models.IntegerField(default=0)
+    bucket_5 = models.IntegerField(default=0)
+
+    @staticmethod
+    def bucket_for(rating):
+        return min(5, max(0, math.floor(rating + 0.5)))
+
+    @property
+    def histogram(self):
+        return {str(bucket): getattr(self, f"bucket_{bucket}") for bucket in self.BUCKETS}
+
+    @property
+    def mean(self):
+        return round(self.rating_sum / self.count, 4) if self.count else None
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        mean = self.rating_sum / self.count
+        # Los errores de redondeo pueden dar un valor negativo muy pequeño.
+        return round(max(0.0, self.rating_sum_sq / self.count - mean * mean), 4)
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return round(math.sqrt(variance), 4) if variance is not None else None
+
+    @property
+    def median(self):
+        """
+        Mediana con la resolución del histograma (la estrella del cubo que
+        contiene la reseña central).
+        """
+        if not self.count:
+            return None
+        middle = (self.count + 1) / 2
+        seen = 0
+        for bucket in self.BUCKETS:
+            seen += getattr(self, f"bucket_{bucket}")
+            if seen >= middle:
+                return bucket
+        return self.BUCKETS[-1]
+
+    def __str__(self):
+        return f"{self.movie_id} ({self.count} reseñas)"
+
+
+class MovieNeighbors(models.Model):
+    """
+    Películas más similares a una película, de mayor a menor similitud,
+    empaquetadas como arrays binarios (IDs int32 y similitudes float32) para
+    leer toda la lista con una sola fila (ver recommendations.py).
+    """
+    movie = models.OneToOneField(
+        Movie, on_delete=models.CASCADE, primary_key=True, related_name="neighbors"
+    )
+    neighbor_ids = models.BinaryField(default=bytes)
+    scores = models.BinaryField(default=bytes)
+    built_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.movie_id} ({len(self.neighbor_ids) // 4} vecinos)"
+
+
+class RatingJob(models.Model):
+    """
+    Recálculo pendiente de las calificaciones de una película en el modo de
+    escritura "deferred". Se inserta en la misma transacción que la reseña,
+    así que sobrevive a un reinicio del proceso aunque el trabajador no haya
+    llegado a ejecutarlo (ver jobs.py).
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.movie_id} ({self.created_at:%Y-%m-%d %H:%M:%S})"
+
+
+class ChangeEvent(models.Model):
+    """
+    Registro de cambios de solo inserción para consumidores externos: cada
+    alta, edición o baja de una reseña, película o director, y cada cambio de
+    la calificación de una película, añade una fila en la misma transacción
+    que el cambio. El cursor del feed es `sequence`, que se numera en orden
+    de confirmación (ver changes.py).
+    """
+    REVIEW, MOVIE, DIRECTOR = "review", "movie", "director"
+    CREATED, UPDATED, DELETED, RATED = "created", "updated", "deleted", "rated"
+
+    kind = models.CharField(max_length=10)
+    action = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    # Película de la reseña, o la propia película. Sin clave foránea: el
+    # registro conserva los eventos de los objetos eliminados.
+    movie_id = models.BigIntegerField(null=True)
+    average_rating = models.FloatField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # NULL hasta que un lector ve el evento ya confirmado y lo numera.
+    sequence = models.BigIntegerField(null=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # Feed filtrado por tipo (?kinds=), en orden de cursor.
+            models.Index(fields=["kind", "sequence"], name="change_kind_idx"),
+            # Compactación: último evento de cada objeto.
+            models.Index(
+                fields=["kind", "object_id", "sequence"], name="change_object_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind}:{self.object_id} {self.action}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Fila única (pk=1) con el último `ChangeEvent.sequence` asignado. Su
+    bloqueo serializa la numeración de los eventos (ver changes.py).
+    """
+    value = models.BigIntegerField(default=0)
+
     def __str__(self):
-        return f"[{self.rating}/5] - {self.comment}"
\ No newline at end of file
+        return str(self.value)
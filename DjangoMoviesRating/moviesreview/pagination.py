@@ -0,0 +1,205 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre columnas indexadas.
+
+    En lugar de `OFFSET`, cada página filtra por los valores de la última fila
+    de la página anterior (`WHERE (a, id) < (:a, :id)`), por lo que el coste de
+    cualquier página es proporcional al tamaño de página y no a su posición.
+
+    `orderings` asocia cada valor del parámetro `order` con las columnas de
+    ordenación; la primera entrada es la ordenación por defecto. La última
+    columna de cada ordenación debe ser única para que el orden sea estable.
+    """
+
+    orderings = {"id": ("id",)}
+    cursor_query_param = "cursor"
+    ordering_query_param = "order"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Cursor inválido."
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.max_page_size = settings.MOVIES_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.build_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Variante asíncrona de `paginate_queryset` para vistas ASGI.
+        """
+        queryset = self.page_queryset(queryset, request)
+        return self.build_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        """
+        Devuelve la consulta de la página solicitada: ordenada, filtrada por el
+        cursor y limitada a `page_size + 1` filas para saber si hay más.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.model = queryset.model
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor["reverse"])
+        ordering = (
+            [self._flip(field) for field in self.ordering]
+            if self.reverse
+            else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, self.cursor["keys"])
+            )
+        return queryset[: self.page_size + 1]
+
+    def build_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        """
+        Devuelve el tamaño de página solicitado, limitado a `MOVIES_MAX_PAGE_SIZE`.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        if name not in self.orderings:
+            name = next(iter(self.orderings))
+        return self.orderings[name]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def keyset_filter(self, ordering, keys):
+        """
+        Construye la condición "fila posterior al cursor" para una ordenación
+        compuesta: (a > x) OR (a = x AND b > y) OR ...
+        """
+        conditions = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equals = {
+                previous.lstrip("-"): keys[index]
+                for index, previous in enumerate(ordering[:position])
+            }
+            conditions.append(Q(**equals, **{f"{name}__{lookup}": keys[position]}))
+        return reduce(or_, conditions)
+
+    def encode_cursor(self, row, reverse):
+        keys = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            keys.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        payload = json.dumps({"k": keys, "r": reverse}, separators=(",", ":"))
+        token = urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            raw_keys = payload["k"]
+            if len(raw_keys) != len(self.ordering):
+                raise ValueError
+            keys = []
+            for field, value in zip(self.ordering, raw_keys):
+                model_field = self.model._meta.get_field(field.lstrip("-"))
+                value = model_field.to_python(value)
+                # Las columnas de ordenación no admiten NULL, y un valor fuera
+                # del rango de la columna no puede venir de una fila.
+                if value is None:
+                    raise ValueError
+                model_field.run_validators(value)
+                keys.append(value)
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return {"keys": keys, "reverse": bool(payload.get("r"))}
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+
+class MovieKeysetPagination(KeysetPagination):
+    orderings = {
+        "id": ("id",),
+        "rating": ("-average_rating", "-rating_count", "id"),
+        "bayesian": ("-bayesian_rating", "-rating_count", "id"),
+        "trending": ("-trending_rating", "-rating_count", "id"),
+    }
+
+
+class ReviewKeysetPagination(KeysetPagination):
+    orderings = {
+        "id": ("id",),
+        "updated": ("-updated_at", "-id"),
+    }
+
+
+class CriticReviewKeysetPagination(KeysetPagination):
+    orderings = {
+        "updated": ("-updated_at", "-id"),
+        "id": ("id",),
+    }
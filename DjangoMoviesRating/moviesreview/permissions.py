@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import DjangoModelPermissions
+from .response_cache import LocalLRUCache
+from .versions import AUTHORIZATION, get_version
+
+ADMINISTRATORS_GROUP = "Movies Administrators"
+
+
+class AuthorizationCache:
+    """
+    Caché por usuario de sus permisos y de los nombres de sus grupos, en un LRU
+    local y, opcionalmente, en una caché compartida de Django (`SHARED_ALIAS`).
+
+    Las claves incluyen la versión del espacio de nombres `AUTHORIZATION`, que
+    se incrementa al cambiar grupos, permisos o la pertenencia de un usuario a
+    ellos (ver `signals.py`). Así, la comprobación de permisos de cada
+    petición no hace consultas mientras no cambie la configuración.
+    """
+
+    def __init__(self, options):
+        self.enabled = options["ENABLED"]
+        self.ttl = options["TTL"]
+        self.shared_alias = options["SHARED_ALIAS"]
+        self.local = LocalLRUCache(options["MAX_ENTRIES"], self.ttl)
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _key(self, user):
+        # is_active y is_superuser forman parte de la clave: al cambiar,
+        # también cambian los permisos efectivos.
+        return (
+            f"moviesreview:authorization:{get_version(AUTHORIZATION)}:"
+            f"{user.pk}:{int(user.is_active)}:{int(user.is_superuser)}"
+        )
+
+    def get(self, user):
+        """
+        Devuelve `(permisos, grupos)` del usuario como conjuntos inmutables.
+        """
+        # Usuarios construidos a partir de los claims de un JWT.
+        from_token = getattr(user, "token_authorization", None)
+        if from_token is not None:
+            return from_token
+        if not self.enabled:
+            return self._load(user)
+        key = self._key(user)
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        if entry is None:
+            entry = self._load(user)
+            self.local.set(key, entry)
+            if self.shared is not None:
+                self.shared.set(key, entry, self.ttl)
+        return entry
+
+    @staticmethod
+    def _load(user):
+        permissions = frozenset(user.get_all_permissions())
+        groups = frozenset(user.groups.values_list("name", flat=True))
+        return permissions, groups
+
+    def has_perms(self, user, perms):
+        if not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
+        return set(perms) <= self.get(user)[0]
+
+    def in_group(self, user, name):
+        return name in self.get(user)[1]
+
+    def clear(self):
+        self.local.clear()
+
+
+authorization_cache = AuthorizationCache(settings.MOVIES_PERMISSION_CACHE)
+
+
+class CachedDjangoModelPermissions(DjangoModelPermissions):
+    """
+    `DjangoModelPermissions` que consulta los permisos en `authorization_cache`
+    en lugar de cargarlos de la base de datos en cada petición.
+    """
+
+    def has_permission(self, request, view):
+        if not request.user or (
+            not request.user.is_authenticated and self.authenticated_users_only
+        ):
+            return False
+
+        if getattr(view, "_ignore_model_permissions", False):
+            return True
+
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return authorization_cache.has_perms(request.user, perms)
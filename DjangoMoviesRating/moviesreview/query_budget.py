@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class RequestQueries:
+    """
+    Registra las consultas SQL de una petición a través de
+    `connection.execute_wrapper`: número de consultas, tiempo total en la base
+    de datos y la consulta más lenta.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest_duration:
+                self.slowest_duration = elapsed
+                self.slowest_sql = sql
+
+
+class QueryStats:
+    """
+    Acumula por endpoint las métricas de las peticiones de este proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, queries, duration, over_budget):
+        with self._lock:
+            stats = self._endpoints.setdefault(
+                endpoint,
+                {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_time_ms": 0.0,
+                    "max_db_time_ms": 0.0,
+                    "request_time_ms": 0.0,
+                    "over_budget": 0,
+                    "slowest_sql": None,
+                    "slowest_sql_ms": 0.0,
+                },
+            )
+            stats["requests"] += 1
+            stats["queries"] += queries.count
+            stats["max_queries"] = max(stats["max_queries"], queries.count)
+            db_time = queries.duration * 1000
+            stats["db_time_ms"] += db_time
+            stats["max_db_time_ms"] = max(stats["max_db_time_ms"], db_time)
+            stats["request_time_ms"] += duration * 1000
+            stats["over_budget"] += over_budget
+            if queries.slowest_duration * 1000 > stats["slowest_sql_ms"]:
+                stats["slowest_sql_ms"] = queries.slowest_duration * 1000
+                stats["slowest_sql"] = queries.slowest_sql
+
+    def snapshot(self):
+        """
+        Devuelve las métricas por endpoint con sus promedios.
+        """
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._endpoints.items():
+                requests = stats["requests"]
+                result[endpoint] = {
+                    **stats,
+                    "avg_queries": round(stats["queries"] / requests, 2),
+                    "avg_db_time_ms": round(stats["db_time_ms"] / requests, 3),
+                    "avg_request_time_ms": round(
+                        stats["request_time_ms"] / requests, 3
+                    ),
+                }
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+query_stats = QueryStats()
+
+
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return f"{request.method} {match.route}"
+
+
+class QueryBudgetMiddleware:
+    """
+    Mide las consultas de cada petición y las expone en la cabecera
+    `Server-Timing` (`db` y `app`) y en `query_stats`. Las peticiones que
+    superan `MAX_QUERIES` o `MAX_DB_TIME_MS` de `MOVIES_QUERY_BUDGET` se
+    registran como advertencia con su consulta más lenta.
+
+    Admite peticiones síncronas (WSGI) y asíncronas (ASGI), para que las
+    vistas de /api/async/ no se adapten a hilos solo por este middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = settings.MOVIES_QUERY_BUDGET
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.options["ENABLED"]:
+            return self.get_response(request)
+
+        queries = RequestQueries()
+        start = time.perf_counter()
+        with self.measure(queries):
+            response = self.get_response(request)
+        return self.process_response(request, response, queries, start)
+
+    async def __acall__(self, request):
+        if not self.options["ENABLED"]:
+            return await self.get_response(request)
+
+        queries = RequestQueries()
+        start = time.perf_counter()
+        # Las conexiones son locales al hilo: los envoltorios se instalan en
+        # el hilo en el que sync_to_async ejecuta las consultas del ORM
+        # asíncrono de esta petición.
+        stack = await sync_to_async(self.measure)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.process_response(request, response, queries, start)
+
+    def measure(self, queries):
+        stack = ExitStack()
+        # Obtener el envoltorio de cada alias no abre la conexión.
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+        return stack
+
+    def process_response(self, request, response, queries, start):
+        # En las respuestas en streaming no se cuentan las consultas que se
+        # hacen al recorrer el cuerpo.
+        duration = time.perf_counter() - start
+
+        endpoint = endpoint_name(request)
+        over_budget = (
+            queries.count > self.options["MAX_QUERIES"]
+            or queries.duration * 1000 > self.options["MAX_DB_TIME_MS"]
+        )
+        query_stats.record(endpoint, queries, duration, over_budget)
+        if over_budget:
+            logger.warning(
+                "%s superó el presupuesto de consultas: %d consultas, %.1fms en "
+                "la base de datos. Consulta más lenta (%.1fms): %s",
+                endpoint,
+                queries.count,
+                queries.duration * 1000,
+                queries.slowest_duration * 1000,
+                queries.slowest_sql,
+            )
+        if self.options["SERVER_TIMING"]:
+            timings = [
+                f'db;dur={queries.duration * 1000:.2f};desc="{queries.count} queries"',
+                f"app;dur={duration * 1000:.2f}",
+            ]
+            if response.has_header("Server-Timing"):
+                timings.insert(0, response["Server-Timing"])
+            response["Server-Timing"] = ", ".join(timings)
+        return response
@@ -0,0 +1,219 @@
+"""
+Puntuaciones de los rankings de películas.
+
+- "average": la media simple (`average_rating`).
+- "bayesian": la media amortiguada con `PRIOR_WEIGHT` reseñas ficticias de
+  valor `PRIOR_MEAN`, de modo que pocas reseñas no bastan para encabezar el
+  ranking: `(C·m + suma) / (C + n)`.
+- "trending": la misma media amortiguada, pero con cada reseña ponderada por
+  `2^((creada - EPOCH) / vida media)`. Como los pesos se expresan respecto a
+  una época fija, `decayed_sum` y `decayed_weight` se actualizan sumando el
+  peso de cada reseña sin tener que reescalar las demás; la puntuación se
+  obtiene dividiéndolos por el peso del instante en que se calcula.
+
+Las puntuaciones se guardan en la película y se actualizan con cada escritura
+(ver `ratings.py`). La de "trending" envejece con el tiempo aunque la película
+no reciba reseñas, por lo que conviene ejecutar periódicamente
+`rebuild_movie_scores --refresh`.
+"""
+
+from itertools import islice
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+from .models import Movie, Review
+
+# Ordenación de cada ranking; todas tienen un índice en `Movie`.
+RANKINGS = {
+    "average": ("-average_rating", "-rating_count", "id"),
+    "bayesian": ("-bayesian_rating", "-rating_count", "id"),
+    "trending": ("-trending_rating", "-rating_count", "id"),
+}
+DEFAULT_RANKING = "average"
+
+# Ranking de directores por la media de sus películas (`director_ranking_idx`).
+DIRECTOR_RANKING_ORDER = ("-average_rating", "-review_count", "id")
+
+
+def decay_weight(moment):
+    """
+    Peso de una reseña creada en `moment`, relativo a `EPOCH`.
+    """
+    options = settings.MOVIES_RANKING
+    half_life = options["HALF_LIFE_DAYS"] * 86400
+    return 2.0 ** ((moment - options["EPOCH"]).total_seconds() / half_life)
+
+
+def review_decay(review):
+    """
+    Devuelve `(calificación ponderada, peso)` con los que una reseña
+    contribuye a `decayed_sum` y `decayed_weight`.
+    """
+    weight = decay_weight(review.created_at)
+    return review.rating * weight, weight
+
+
+def bayesian_expression(rating_sum=None, rating_count=None):
+    options = settings.MOVIES_RANKING
+    prior_weight = options["PRIOR_WEIGHT"]
+    return Round(
+        ((rating_sum or F("rating_sum")) + Value(options["PRIOR_MEAN"] * prior_weight))
+        / ((rating_count or F("rating_count")) + Value(float(prior_weight))),
+        4,
+    )
+
+
+def trending_expression(now=None, decayed_sum=None, decayed_weight=None):
+    options = settings.MOVIES_RANKING
+    prior_weight = options["PRIOR_WEIGHT"]
+    now_weight = decay_weight(now or timezone.now())
+    return Round(
+        (
+            Value(options["PRIOR_MEAN"] * prior_weight)
+            + (decayed_sum or F("decayed_sum")) / Value(now_weight)
+        )
+        / (
+            Value(float(prior_weight))
+            + (decayed_weight or F("decayed_weight")) / Value(now_weight)
+        ),
+        4,
+    )
+
+
+def score_fields(
+    rating_sum=None, rating_count=None, decayed_sum=None, decayed_weight=None
+):
+    """
+    Actualizaciones de las puntuaciones derivadas de los contadores de la
+    película, para usar en `QuerySet.update()`. Los argumentos sustituyen a
+    las columnas de los contadores por otras expresiones (p. ej. el valor
+    anterior más un delta).
+    """
+    return {
+        "bayesian_rating": bayesian_expression(rating_sum, rating_count),
+        "trending_rating": trending_expression(None, decayed_sum, decayed_weight),
+    }
+
+
+# Campos de `Movie` que se acumulan reseña a reseña en `rebuild_scores`.
+TOTALS = ("rating_count", "rating_sum", "decayed_sum", "decayed_weight")
+
+
+def accumulate_reviews(totals, movie_index, ratings, created):
+    """
+    Suma a `totals` (un array por campo de `TOTALS`, con una posición por
+    película) la contribución de un lote de reseñas.
+
+    :param movie_index: Posición de la película de cada reseña.
+    :param ratings: Calificación de cada reseña.
+    :param created: Fecha de creación de cada reseña, en segundos desde EPOCH.
+    """
+    half_life = settings.MOVIES_RANKING["HALF_LIFE_DAYS"] * 86400
+    movies = len(totals["rating_count"])
+    weights = np.exp2(created / half_life)
+    totals["rating_count"] += np.bincount(movie_index, minlength=movies)
+    totals["rating_sum"] += np.bincount(movie_index, weights=ratings, minlength=movies)
+    totals["decayed_sum"] += np.bincount(
+        movie_index, weights=ratings * weights, minlength=movies
+    )
+    totals["decayed_weight"] += np.bincount(
+        movie_index, weights=weights, minlength=movies
+    )
+
+
+def compute_scores(totals, now):
+    """
+    Calcula de forma vectorizada las puntuaciones a partir de los contadores
+    acumulados con `accumulate_reviews`.
+
+    :param now: Instante del cálculo, en segundos desde EPOCH.
+    :return: Un diccionario de arrays, uno por campo de `Movie`.
+    """
+    options = settings.MOVIES_RANKING
+    prior_mean, prior_weight = options["PRIOR_MEAN"], options["PRIOR_WEIGHT"]
+    half_life = options["HALF_LIFE_DAYS"] * 86400
+    counts, sums = totals["rating_count"], totals["rating_sum"]
+    decayed_sum, decayed_weight = totals["decayed_sum"], totals["decayed_weight"]
+
+    now_weight = np.exp2(now / half_life)
+    prior = prior_mean * prior_weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = np.where(counts > 0, np.round(sums / counts, 2), 0.0)
+    return {
+        "rating_sum": sums,
+        "rating_count": counts,
+        "average_rating": average,
+        "bayesian_rating": np.round((prior + sums) / (prior_weight + counts), 4),
+        "trending_rating": np.round(
+            (prior + decayed_sum / now_weight)
+            / (prior_weight + decayed_weight / now_weight),
+            4,
+        ),
+        "decayed_sum": decayed_sum,
+        "decayed_weight": decayed_weight,
+    }
+
+
+def rebuild_scores(movie_ids=None, batch_size=1000, chunk_size=10000):
+    """
+    Recalcula contadores y puntuaciones de las películas leyendo una sola vez
+    la calificación y la fecha de sus reseñas.
+
+    Las reseñas se leen en bloques de `chunk_size` filas, que se convierten a
+    arrays y se acumulan por película, así que la memoria depende del número
+    de películas y no del de reseñas.
+
+    :param movie_ids: Películas a recalcular. Si es None, todas.
+    :return: El número de películas actualizadas.
+    """
+    movies = Movie.objects.order_by("pk")
+    reviews = Review.objects.order_by()
+    if movie_ids is not None:
+        movies = movies.filter(pk__in=movie_ids)
+        reviews = reviews.filter(movie_id__in=movie_ids)
+    ids = np.fromiter(movies.values_list("pk", flat=True), dtype=np.int64)
+
+    totals = {field: np.zeros(len(ids)) for field in TOTALS}
+    totals["rating_count"] = np.zeros(len(ids), dtype=np.int64)
+    epoch = settings.MOVIES_RANKING["EPOCH"]
+    rows = reviews.values_list("movie_id", "rating", "created_at").iterator(
+        chunk_size=chunk_size
+    )
+    while chunk := list(islice(rows, chunk_size)):
+        count = len(chunk)
+        movie_column = np.fromiter((row[0] for row in chunk), np.int64, count)
+        accumulate_reviews(
+            totals,
+            np.searchsorted(ids, movie_column),
+            np.fromiter((row[1] for row in chunk), np.float64, count),
+            np.fromiter(
+                ((row[2] - epoch).total_seconds() for row in chunk), np.float64, count
+            ),
+        )
+
+    scores = compute_scores(totals, (timezone.now() - epoch).total_seconds())
+    fields = list(scores)
+    columns = {field: scores[field].tolist() for field in fields}
+    with transaction.atomic():
+        for start in range(0, len(ids), batch_size):
+            objects = []
+            for position in range(start, min(start + batch_size, len(ids))):
+                movie = Movie(pk=int(ids[position]))
+                for field in fields:
+                    setattr(movie, field, columns[field][position])
+                objects.append(movie)
+            Movie.objects.bulk_update(objects, fields)
+    return len(ids)
+
+
+def refresh_trending(now=None):
+    """
+    Recalcula `trending_rating` de todas las películas para el instante actual
+    a partir de sus contadores, sin leer las reseñas.
+
+    :return: El número de películas actualizadas.
+    """
+    return Movie.objects.update(trending_rating=trending_expression(now))
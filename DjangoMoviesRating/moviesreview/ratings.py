@@ -0,0 +1,590 @@
+import logging
+import random
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Now, NullIf, Round
+from .models import Director, Movie, MovieRatingShard, MovieRatingStats, Review
+from . import changes, jobs, leaderboard, ranking
+from .versions import DIRECTORS, MOVIES, bump_version
+
+logger = logging.getLogger(__name__)
+
+# Películas cuyos directores hay que recalcular (ver schedule_director_refresh).
+_director_lock = threading.Lock()
+_stale_director_movies = set()
+_director_timer = None
+
+
+def average_rating_expression(rating_sum=None, rating_count=None):
+    """
+    Expresión que deriva `average_rating` de los contadores `rating_sum` y
+    `rating_count` de la película (o de las expresiones que los sustituyan),
+    redondeada a 2 decimales.
+    """
+    return Coalesce(
+        Round(
+            (rating_sum or F("rating_sum"))
+            / NullIf(rating_count or F("rating_count"), 0),
+            2,
+        ),
+        Value(0.0),
+    )
+
+
+def float_counter(name, delta, emptied):
+    """
+    Incremento de un acumulado en coma flotante que vuelve exactamente a 0
+    cuando se cumple `emptied` (la fila se queda sin calificaciones): sumar y
+    restar las mismas calificaciones deja un residuo de redondeo (p. ej.
+    -2.8e-14) que, si no, se arrastraría a las siguientes.
+    """
+    return Case(When(emptied, then=Value(0.0)), default=F(name) + delta)
+
+
+def apply_rating_delta(
+    movie_id, sum_delta, count_delta, decayed_sum_delta=0.0, decayed_weight_delta=0.0
+):
+    """
+    Aplica un delta a los contadores de calificación de una película y
+    recalcula su `average_rating` y sus puntuaciones de ranking sin volver a
+    recorrer sus reseñas.
+    """
+    apply_rating_deltas(
+        {movie_id: (sum_delta, count_delta, decayed_sum_delta, decayed_weight_delta)}
+    )
+
+
+def apply_rating_deltas(deltas):
+    """
+    Aplica los deltas `{película: (suma, número, suma ponderada, peso)}` con un
+    UPDATE por película y registra con un solo INSERT el evento "rated" de
+    todas ellas.
+
+    Los contadores y las columnas derivadas se actualizan en la misma
+    sentencia con expresiones `F()`, por lo que la operación es atómica aunque
+    haya escrituras concurrentes sobre la misma película.
+    """
+    movie_ids = []
+    # En orden de ID, para que dos escrituras sobre las mismas películas las
+    # bloqueen en el mismo orden.
+    for movie_id, values in sorted(deltas.items()):
+        sum_delta, count_delta, decayed_sum_delta, decayed_weight_delta = values
+        if not any(values):
+            continue
+        emptied = Q(rating_count=-count_delta)
+        counters = {
+            "rating_sum": float_counter("rating_sum", sum_delta, emptied),
+            "decayed_sum": float_counter("decayed_sum", decayed_sum_delta, emptied),
+            "decayed_weight": float_counter(
+                "decayed_weight", decayed_weight_delta, emptied
+            ),
+            "rating_count": F("rating_count") + count_delta,
+        }
+        # Las columnas derivadas se asignan antes que los contadores, y
+        # `rating_count` la última: MySQL evalúa las asignaciones en orden y
+        # ya usaría los valores nuevos.
+        Movie.objects.filter(pk=movie_id).update(
+            average_rating=average_rating_expression(
+                counters["rating_sum"], counters["rating_count"]
+            ),
+            **ranking.score_fields(**counters),
+            updated_at=Now(),
+            **counters,
+        )
+        movie_ids.append(movie_id)
+    if not movie_ids:
+        return
+
+    changes.ratings_changed(movie_ids)
+    transaction.on_commit(lambda: leaderboard.ratings_changed(movie_ids))
+    schedule_director_refresh(movie_ids)
+    bump_version(MOVIES)
+
+
+def record_rating_delta(
+    movie_id, sum_delta, count_delta, decayed_sum_delta=0.0, decayed_weight_delta=0.0
+):
+    """
+    Registra un delta de calificación según `MOVIES_RATING_WRITE_MODE`.
+
+    En modo "direct" el delta se aplica inmediatamente sobre la película. En
+    modo "sharded" se acumula en una de las filas de `MovieRatingShard`, de modo
+    que las escrituras concurrentes sobre una película popular no compitan por
+    el mismo bloqueo de fila.
+    """
+    record_rating_deltas(
+        {movie_id: (sum_delta, count_delta, decayed_sum_delta, decayed_weight_delta)}
+    )
+
+
+def record_rating_deltas(deltas, ratings=None):
+    """
+    Como `record_rating_delta`, para los deltas `{película: (suma, número,
+    suma ponderada, peso)}` de una misma escritura. `ratings` indica las
+    calificaciones `{película: (añadidas, quitadas)}` de su distribución en
+    `MovieRatingStats`, que sigue el mismo camino que los contadores.
+    """
+    ratings = ratings or {}
+    if settings.MOVIES_RATING_WRITE_MODE == "sharded":
+        for movie_id, values in sorted(deltas.items()):
+            stats = rating_stats_deltas(*ratings.get(movie_id, ((), ())))
+            if any(values) or any(stats.values()):
+                add_to_shard(movie_id, *values, stats=stats)
+    else:
+        apply_rating_deltas(deltas)
+        for movie_id, (added, removed) in sorted(ratings.items()):
+            update_rating_stats(movie_id, added, removed)
+
+
+# Fila de `MovieRatingShard` sin deltas pendientes. No basta con mirar la suma
+# y el número: pueden anularse (una reseña creada y otra eliminada con la
+# misma calificación) sin que lo hagan los deltas ponderados, que dependen de
+# la fecha de cada reseña.
+EMPTY_SHARD = {
+    "sum_delta": 0,
+    "count_delta": 0,
+    "decayed_sum_delta": 0,
+    "decayed_weight_delta": 0,
+    "rating_sum_sq_delta": 0,
+    **{f"bucket_{bucket}_delta": 0 for bucket in MovieRatingStats.BUCKETS},
+}
+
+# Campos de `MovieRatingStats` con columna propia en `MovieRatingShard`.
+SHARD_STATS = ["rating_sum_sq"] + [
+    f"bucket_{bucket}" for bucket in MovieRatingStats.BUCKETS
+]
+
+
+def add_to_shard(
+    movie_id,
+    sum_delta,
+    count_delta,
+    decayed_sum_delta=0.0,
+    decayed_weight_delta=0.0,
+    stats=None,
+):
+    """
+    Suma el delta (y el de la distribución, `stats`, de
+    `rating_stats_deltas`) a una fila de `MovieRatingShard` elegida al azar y
+    programa la consolidación de la película si superó el tiempo máximo de
+    desfase.
+    """
+    shard = random.randrange(settings.MOVIES_RATING_SHARDS)
+    shards = MovieRatingShard.objects.filter(movie_id=movie_id, shard=shard)
+    deltas = {
+        "sum_delta": sum_delta,
+        "count_delta": count_delta,
+        "decayed_sum_delta": decayed_sum_delta,
+        "decayed_weight_delta": decayed_weight_delta,
+        **{
+            f"{name}_delta": value
+            for name, value in (stats or {}).items()
+            if name in SHARD_STATS and value
+        },
+    }
+    increments = {name: F(name) + value for name, value in deltas.items()}
+    updated = shards.update(**increments)
+    if not updated:
+        try:
+            with transaction.atomic():
+                MovieRatingShard.objects.create(
+                    movie_id=movie_id, shard=shard, **deltas
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT.
+            shards.update(**increments)
+
+    # El primer escritor tras cumplirse el plazo se encarga de consolidar.
+    staleness = settings.MOVIES_RATING_MAX_STALENESS
+    if cache.add(f"moviesreview:rating-flush:{movie_id}", True, timeout=staleness):
+        transaction.on_commit(lambda: flush_rating_shards(movie_id))
+
+
+def flush_rating_shards(movie_id):
+    """
+    Consolida los deltas pendientes de una película en sus contadores.
+
+    :return: El número de reseñas consolidadas.
+    """
+    with transaction.atomic():
+        pending = list(
+            MovieRatingShard.objects.select_for_update()
+            .filter(movie_id=movie_id)
+            .exclude(**EMPTY_SHARD)
+            .values("pk", *EMPTY_SHARD)
+        )
+        if not pending:
+            return 0
+        MovieRatingShard.objects.filter(pk__in=[row["pk"] for row in pending]).update(
+            **EMPTY_SHARD
+        )
+        totals = {name: sum(row[name] for row in pending) for name in EMPTY_SHARD}
+        apply_rating_delta(
+            movie_id,
+            totals["sum_delta"],
+            totals["count_delta"],
+            totals["decayed_sum_delta"],
+            totals["decayed_weight_delta"],
+        )
+        apply_rating_stats_deltas(
+            movie_id,
+            {
+                "count": totals["count_delta"],
+                "rating_sum": totals["sum_delta"],
+                **{name: totals[f"{name}_delta"] for name in SHARD_STATS},
+            },
+        )
+    return totals["count_delta"]
+
+
+def flush_all_rating_shards():
+    """
+    Consolida los deltas pendientes de todas las películas.
+
+    :return: El número de películas consolidadas.
+    """
+    movie_ids = (
+        MovieRatingShard.objects.exclude(**EMPTY_SHARD)
+        .values_list("movie_id", flat=True)
+        .distinct()
+    )
+    flushed = 0
+    for movie_id in list(movie_ids):
+        flush_rating_shards(movie_id)
+        flushed += 1
+    return flushed
+
+
+def rating_stats_deltas(added=(), removed=()):
+    """
+    Deltas de los campos de `MovieRatingStats` al sumar las calificaciones
+    `added` y restar las `removed`.
+    """
+    values = defaultdict(int)
+    for ratings, sign in ((added, 1), (removed, -1)):
+        for rating in ratings:
+            values["count"] += sign
+            values["rating_sum"] += rating * sign
+            values["rating_sum_sq"] += rating * rating * sign
+            values[f"bucket_{MovieRatingStats.bucket_for(rating)}"] += sign
+    return dict(values)
+
+
+def update_rating_stats(movie_id, added=(), removed=()):
+    """
+    Suma las calificaciones `added` y resta las `removed` de la distribución
+    de la película en `MovieRatingStats`, con una sola actualización.
+    """
+    apply_rating_stats_deltas(movie_id, rating_stats_deltas(added, removed))
+
+
+def apply_rating_stats_deltas(movie_id, values):
+    """
+    Aplica los deltas de `rating_stats_deltas` a la fila de la película en
+    `MovieRatingStats`, con una sola actualización.
+    """
+    values = {name: value for name, value in values.items() if value}
+    if not values:
+        return
+    values.setdefault("count", 0)
+    emptied = Q(count=-values["count"])
+    increments = {
+        name: (
+            float_counter(name, value, emptied)
+            if name in ("rating_sum", "rating_sum_sq")
+            else F(name) + value
+        )
+        for name, value in values.items()
+        if name != "count"
+    }
+    # `count` la última, por el orden de evaluación de MySQL.
+    increments["count"] = F("count") + values["count"]
+    stats = MovieRatingStats.objects.filter(movie_id=movie_id)
+    if stats.update(**increments):
+        return
+    if any(value < 0 for value in values.values()):
+        # Sin fila no hay nada que restar: se reconstruye desde las reseñas,
+        # que ya reflejan el cambio.
+        rebuild_rating_stats([movie_id])
+        return
+    try:
+        with transaction.atomic():
+            MovieRatingStats.objects.create(movie_id=movie_id, **values)
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT.
+        stats.update(**increments)
+
+
+def rebuild_rating_stats(movie_ids=None):
+    """
+    Reconstruye `MovieRatingStats` a partir de la tabla `Review` con una sola
+    consulta agregada.
+
+    :param movie_ids: Películas a reconstruir. Si es None, se reconstruyen todas.
+    :return: El número de películas con reseñas.
+    """
+    reviews = Review.objects.order_by()
+    stats = MovieRatingStats.objects.all()
+    if movie_ids is not None:
+        reviews = reviews.filter(movie_id__in=movie_ids)
+        stats = stats.filter(movie_id__in=movie_ids)
+
+    # Mismos límites que MovieRatingStats.bucket_for.
+    buckets = {}
+    for bucket in MovieRatingStats.BUCKETS:
+        condition = Q()
+        if bucket > MovieRatingStats.BUCKETS[0]:
+            condition &= Q(rating__gte=bucket - 0.5)
+        if bucket < MovieRatingStats.BUCKETS[-1]:
+            condition &= Q(rating__lt=bucket + 0.5)
+        buckets[f"bucket_{bucket}"] = Count("pk", filter=condition)
+    rows = reviews.values("movie_id").annotate(
+        count=Count("pk"),
+        rating_sum=Sum("rating"),
+        rating_sum_sq=Sum(F("rating") * F("rating")),
+        **buckets,
+    )
+    with transaction.atomic():
+        stats.delete()
+        created = MovieRatingStats.objects.bulk_create(
+            (MovieRatingStats(**row) for row in rows), batch_size=1000
+        )
+    return len(created)
+
+
+def director_stats_fields():
+    """
+    Expresiones que calculan los agregados de un director a partir de los
+    contadores de sus películas (sin leer las reseñas). La media y la mejor y
+    peor película solo consideran las películas con reseñas.
+    """
+    movies = Movie.objects.filter(director=OuterRef("pk")).order_by()
+    rated = movies.filter(rating_count__gt=0)
+    per_director = movies.values("director")
+    return {
+        "movie_count": Coalesce(
+            Subquery(per_director.annotate(total=Count("pk")).values("total")),
+            Value(0),
+        ),
+        "review_count": Coalesce(
+            Subquery(per_director.annotate(total=Sum("rating_count")).values("total")),
+            Value(0),
+        ),
+        "average_rating": Coalesce(
+            Subquery(
+                rated.values("director")
+                .annotate(mean=Round(Avg("average_rating"), 2))
+                .values("mean")
+            ),
+            Value(0.0),
+        ),
+        "best_movie": Subquery(
+            rated.order_by(*leaderboard.RANKING_ORDER).values("pk")[:1]
+        ),
+        "worst_movie": Subquery(
+            rated.order_by("average_rating", "-rating_count", "id").values("pk")[:1]
+        ),
+    }
+
+
+def refresh_director_stats(director_ids=None, movie_ids=None):
+    """
+    Recalcula con un solo UPDATE los agregados de los directores indicados, o
+    de los directores de las películas `movie_ids`. Sin argumentos, los de
+    todos los directores.
+
+    :return: El número de directores actualizados.
+    """
+    directors = Director.objects.all()
+    if director_ids is not None:
+        directors = directors.filter(pk__in=[pk for pk in director_ids if pk])
+    if movie_ids is not None:
+        directors = directors.filter(
+            pk__in=Movie.objects.filter(pk__in=movie_ids).values("director")
+        )
+    updated = directors.update(**director_stats_fields())
+    if updated:
+        bump_version(DIRECTORS)
+    return updated
+
+
+def schedule_director_refresh(movie_ids):
+    """
+    Programa el recálculo de los agregados de los directores de `movie_ids`
+    cuando se confirme la transacción actual.
+
+    Los de las escrituras de los siguientes `MOVIES_DIRECTOR_STATS_DELAY`
+    segundos se acumulan y se recalculan juntos con un solo UPDATE en un hilo
+    aparte, así que las reseñas de las películas de un director no esperan
+    ni compiten por su fila. Con 0 se recalculan al confirmar, en el mismo
+    hilo.
+    """
+    movie_ids = list(movie_ids)
+    transaction.on_commit(lambda: _directors_changed(movie_ids))
+
+
+def _directors_changed(movie_ids):
+    global _director_timer
+    delay = settings.MOVIES_DIRECTOR_STATS_DELAY
+    if not delay:
+        refresh_director_stats(movie_ids=movie_ids)
+        return
+    with _director_lock:
+        _stale_director_movies.update(movie_ids)
+        if _director_timer is not None:
+            return
+        _director_timer = threading.Timer(delay, _refresh_in_background)
+        _director_timer.daemon = True
+        _director_timer.start()
+
+
+def refresh_stale_directors():
+    """
+    Recalcula los agregados de los directores de las películas acumuladas por
+    `schedule_director_refresh`.
+
+    :return: El número de directores actualizados.
+    """
+    global _director_timer
+    with _director_lock:
+        movie_ids = list(_stale_director_movies)
+        _stale_director_movies.clear()
+        if _director_timer is not None:
+            _director_timer.cancel()
+            _director_timer = None
+    if not movie_ids:
+        return 0
+    return refresh_director_stats(movie_ids=movie_ids)
+
+
+def _refresh_in_background():
+    try:
+        refresh_stale_directors()
+    except Exception:
+        # Se corrigen con la próxima escritura de esas películas o con
+        # rebuild_movie_ratings.
+        logger.exception("Error al recalcular los agregados de los directores.")
+    finally:
+        connections.close_all()
+
+
+def lock_review(review_id):
+    """
+    Bloquea la fila de una reseña dentro de la transacción actual y devuelve
+    su película y calificación antes de ser modificada.
+    """
+    return (
+        Review.objects.select_for_update()
+        .values_list("movie_id", "rating")
+        .get(pk=review_id)
+    )
+
+
+def review_created(review):
+    """
+    Suma la calificación de una reseña recién creada a su película.
+    """
+    if settings.MOVIES_RATING_WRITE_MODE == "deferred":
+        jobs.enqueue([review.movie_id])
+        return
+    decayed_rating, weight = ranking.review_decay(review)
+    record_rating_deltas(
+        {review.movie_id: (review.rating, 1, decayed_rating, weight)},
+        {review.movie_id: ([review.rating], [])},
+    )
+
+
+def review_updated(review, old_movie_id, old_rating):
+    """
+    Ajusta los contadores tras editar una reseña. Si la reseña cambió de
+    película, se resta de la anterior y se suma a la nueva. El peso de la
+    reseña en el ranking "trending" depende de su fecha de creación, que no
+    cambia al editarla.
+    """
+    if settings.MOVIES_RATING_WRITE_MODE == "deferred":
+        jobs.enqueue([old_movie_id, review.movie_id])
+        return
+    weight = ranking.decay_weight(review.created_at)
+    if review.movie_id == old_movie_id:
+        if review.rating == old_rating:
+            return
+        rating_delta = review.rating - old_rating
+        record_rating_deltas(
+            {review.movie_id: (rating_delta, 0, rating_delta * weight, 0)},
+            {review.movie_id: ([review.rating], [old_rating])},
+        )
+    else:
+        record_rating_deltas(
+            {
+                old_movie_id: (-old_rating, -1, -old_rating * weight, -weight),
+                review.movie_id: (
+                    review.rating,
+                    1,
+                    review.rating * weight,
+                    weight,
+                ),
+            },
+            {old_movie_id: ([], [old_rating]), review.movie_id: ([review.rating], [])},
+        )
+
+
+def review_deleted(review):
+    """
+    Resta la calificación de una reseña eliminada de su película.
+    """
+    if settings.MOVIES_RATING_WRITE_MODE == "deferred":
+        jobs.enqueue([review.movie_id])
+        return
+    decayed_rating, weight = ranking.review_decay(review)
+    record_rating_deltas(
+        {review.movie_id: (-review.rating, -1, -decayed_rating, -weight)},
+        {review.movie_id: ([], [review.rating])},
+    )
+
+
+def rebuild_movie_ratings(movie_ids=None):
+    """
+    Reconstruye `rating_sum`, `rating_count`, `average_rating`, las
+    puntuaciones de ranking (ver `ranking.rebuild_scores`) y la distribución de
+    calificaciones a partir de la tabla `Review`. Sirve para corregir cualquier desviación de los
+    contadores. Los deltas pendientes en `MovieRatingShard` se descartan, ya que
+    las reseñas que representan quedan incluidas en la reconstrucción.
+
+    :param movie_ids: Películas a reconstruir. Si es None, se reconstruyen todas.
+    :return: El número de películas actualizadas.
+    """
+    movies = Movie.objects.all()
+    shards = MovieRatingShard.objects.all()
+    if movie_ids is not None:
+        movies = movies.filter(pk__in=movie_ids)
+        shards = shards.filter(movie_id__in=movie_ids)
+
+    with transaction.atomic():
+        shards.delete()
+        updated = ranking.rebuild_scores(movie_ids)
+        rebuild_rating_stats(movie_ids)
+        refresh_director_stats(movie_ids=movie_ids)
+        movies.update(updated_at=Now())
+        changes.ratings_changed(movie_ids)
+        if movie_ids is None:
+            transaction.on_commit(leaderboard.invalidate)
+        else:
+            movie_ids = list(movie_ids)
+            transaction.on_commit(lambda: leaderboard.ratings_changed(movie_ids))
+        bump_version(MOVIES)
+    return updated
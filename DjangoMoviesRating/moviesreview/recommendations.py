@@ -0,0 +1,315 @@
+"""
+Recomendaciones basadas en la similitud entre películas ("a quienes les gustó
+X también les gustó Y").
+
+La similitud de dos películas es el coseno entre sus columnas de la matriz
+dispersa usuario × película, con cada calificación centrada en la media de su
+usuario (coseno ajustado), amortiguado por el número `n` de usuarios que
+valoraron ambas: `coseno · n / (n + SHRINKAGE)`. De cada película solo se
+guardan sus `NEIGHBORS` vecinos con mayor similitud positiva, empaquetados en
+una fila de `MovieNeighbors`.
+
+La matriz se construye con `build_recommendations`, que recalcula solo las
+películas cuyas reseñas cambiaron desde la última ejecución (su `updated_at`
+es posterior al `built_at` de sus vecinos) y corrige en las listas del resto
+la similitud con ellas. La media de cada usuario también cambia con sus
+reseñas, así que conviene hacer de vez en cuando una reconstrucción completa
+(`build_recommendations --full`).
+"""
+
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from scipy import sparse
+from .models import Movie, MovieNeighbors, Review
+from .versions import RECOMMENDATIONS, bump_version
+
+ID_DTYPE = np.dtype("<i4")
+SCORE_DTYPE = np.dtype("<f4")
+
+
+def pack(neighbor_ids, scores):
+    return (
+        np.asarray(neighbor_ids, dtype=ID_DTYPE).tobytes(),
+        np.asarray(scores, dtype=SCORE_DTYPE).tobytes(),
+    )
+
+
+def unpack(neighbors):
+    """
+    Devuelve `(ids, similitudes)` de un `MovieNeighbors` como arrays de NumPy.
+    """
+    return (
+        np.frombuffer(bytes(neighbors.neighbor_ids), dtype=ID_DTYPE),
+        np.frombuffer(bytes(neighbors.scores), dtype=SCORE_DTYPE),
+    )
+
+
+class RatingMatrix:
+    """
+    Matriz dispersa usuario × película de calificaciones centradas en la media
+    de cada usuario. Si un usuario tiene varias reseñas de una película, cuenta
+    su media.
+    """
+
+    def __init__(self, movie_ids, ratings, rated):
+        # movie_ids: ID de la película de cada columna, en orden creciente.
+        self.movie_ids = movie_ids
+        self.ratings = ratings.tocsc()
+        # Indicadora de las celdas con reseña, para contar usuarios en común.
+        self.rated = rated.tocsc()
+        self.ratings_t = ratings.T.tocsr()
+        self.rated_t = rated.T.tocsr()
+        self.norms = np.sqrt(
+            np.asarray(self.ratings.multiply(self.ratings).sum(axis=0)).ravel()
+        )
+
+    @classmethod
+    def load(cls):
+        movie_ids = np.fromiter(
+            Movie.objects.order_by("pk").values_list("pk", flat=True), dtype=np.int64
+        )
+        rows = (
+            Review.objects.filter(user__isnull=False)
+            .order_by()
+            .values_list("user_id", "movie_id", "rating")
+            .iterator(chunk_size=10000)
+        )
+        users, movies, ratings = [], [], []
+        for user_id, movie_id, rating in rows:
+            users.append(user_id)
+            movies.append(movie_id)
+            ratings.append(rating)
+        return cls.from_arrays(
+            movie_ids,
+            np.array(users, dtype=np.int64),
+            np.array(movies, dtype=np.int64),
+            np.array(ratings, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_arrays(cls, movie_ids, users, movies, ratings):
+        known = np.isin(movies, movie_ids)
+        users, movies, ratings = users[known], movies[known], ratings[known]
+        user_ids, user_index = np.unique(users, return_inverse=True)
+        movie_index = np.searchsorted(movie_ids, movies)
+
+        # Una celda por par usuario-película, con la media de sus reseñas.
+        cells, cell_index = np.unique(
+            user_index * len(movie_ids) + movie_index, return_inverse=True
+        )
+        cell_ratings = np.bincount(cell_index, weights=ratings) / np.bincount(
+            cell_index
+        )
+        cell_users, cell_movies = np.divmod(cells, len(movie_ids))
+
+        user_means = np.bincount(cell_users, weights=cell_ratings) / np.bincount(
+            cell_users
+        )
+        centered = cell_ratings - user_means[cell_users]
+        shape = (len(user_ids), len(movie_ids))
+        return cls(
+            movie_ids,
+            sparse.csr_matrix(
+                (centered.astype(np.float32), (cell_users, cell_movies)), shape=shape
+            ),
+            sparse.csr_matrix(
+                (np.ones(len(cells), dtype=np.float32), (cell_users, cell_movies)),
+                shape=shape,
+            ),
+        )
+
+    def similarity_blocks(self, columns):
+        """
+        Genera `(columnas, similitudes)` por bloques de `BLOCK_SIZE` columnas,
+        donde `similitudes` es un array denso películas × bloque con la
+        similitud de cada película con las del bloque (0 consigo misma).
+        """
+        options = settings.MOVIES_RECOMMENDATIONS
+        block_size = options["BLOCK_SIZE"]
+        for start in range(0, len(columns), block_size):
+            block = columns[start : start + block_size]
+            dots = (self.ratings_t @ self.ratings[:, block]).toarray()
+            common = (self.rated_t @ self.rated[:, block]).toarray()
+            norms = self.norms[:, None] * self.norms[block][None, :]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarity = np.where(norms > 0, dots / norms, 0.0)
+            similarity *= common / (common + options["SHRINKAGE"])
+            similarity[common < options["MIN_COMMON"]] = 0.0
+            similarity[block, np.arange(len(block))] = 0.0
+            yield block, similarity
+
+
+def top_neighbors(similarity, number):
+    """
+    Índices y valores de las `number` similitudes positivas más altas de un
+    vector, de mayor a menor.
+    """
+    if len(similarity) > number:
+        candidates = np.argpartition(-similarity, number)[:number]
+    else:
+        candidates = np.arange(len(similarity))
+    candidates = candidates[similarity[candidates] > 0]
+    order = np.lexsort((candidates, -similarity[candidates]))
+    return candidates[order], similarity[candidates[order]]
+
+
+def stale_movie_ids():
+    """
+    Películas sin vecinos calculados o cuyas reseñas cambiaron después.
+    """
+    return list(
+        Movie.objects.filter(
+            Q(neighbors__isnull=True) | Q(updated_at__gt=F("neighbors__built_at"))
+        ).values_list("pk", flat=True)
+    )
+
+
+def build(movie_ids=None, batch_size=500):
+    """
+    Calcula los vecinos de `movie_ids` (None: de todas las películas) y
+    actualiza en las listas del resto de películas su similitud con ellas.
+
+    :return: El número de listas de vecinos guardadas.
+    """
+    number = settings.MOVIES_RECOMMENDATIONS["NEIGHBORS"]
+    built_at = timezone.now()
+    matrix = RatingMatrix.load()
+    ids = matrix.movie_ids
+    if movie_ids is None:
+        columns = np.arange(len(ids))
+    else:
+        columns = np.searchsorted(ids, np.intersect1d(movie_ids, ids))
+    if not len(columns):
+        return 0
+
+    lists = {}
+    # Similitudes con las películas recalculadas, por película afectada.
+    patches = defaultdict(dict)
+    for block, similarity in matrix.similarity_blocks(columns):
+        for position, column in enumerate(block):
+            neighbors, scores = top_neighbors(similarity[:, position], number)
+            lists[ids[column]] = (ids[neighbors], scores)
+            if movie_ids is not None:
+                for row in np.flatnonzero(similarity[:, position] > 0):
+                    patches[ids[row]][ids[column]] = similarity[row, position]
+
+    if movie_ids is not None:
+        changed = set(lists)
+        stored = MovieNeighbors.objects.exclude(movie_id__in=changed)
+        for neighbors in stored.iterator(chunk_size=1000):
+            neighbor_ids, scores = unpack(neighbors)
+            updates = patches.pop(neighbors.movie_id, {})
+            if not updates and not changed.intersection(neighbor_ids.tolist()):
+                continue
+            merged = {
+                neighbor_id: score
+                for neighbor_id, score in zip(neighbor_ids.tolist(), scores.tolist())
+                if neighbor_id not in changed
+            }
+            merged.update(updates)
+            lists[neighbors.movie_id] = best_of(merged, number)
+        # Películas con reseñas que aún no tenían lista (se calcula la suya).
+        for movie_id, updates in patches.items():
+            lists.setdefault(movie_id, best_of(updates, number))
+
+    objects = []
+    for movie_id, (neighbor_ids, scores) in lists.items():
+        packed_ids, packed_scores = pack(neighbor_ids, scores)
+        objects.append(
+            MovieNeighbors(
+                movie_id=int(movie_id),
+                neighbor_ids=packed_ids,
+                scores=packed_scores,
+                built_at=built_at,
+            )
+        )
+    with transaction.atomic():
+        MovieNeighbors.objects.bulk_create(
+            objects,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["movie"],
+            update_fields=["neighbor_ids", "scores", "built_at"],
+        )
+        bump_version(RECOMMENDATIONS)
+    return len(objects)
+
+
+def best_of(similarities, number):
+    """
+    Las `number` entradas de mayor similitud de un diccionario {id: similitud}.
+    """
+    ranked = sorted(similarities.items(), key=lambda item: (-item[1], item[0]))
+    ranked = ranked[:number]
+    return [movie_id for movie_id, _ in ranked], [score for _, score in ranked]
+
+
+def similar_movies(movie_id, number):
+    """
+    Devuelve hasta `number` películas similares a `movie_id`, de mayor a menor
+    similitud, con la similitud en el atributo `score`.
+    """
+    neighbors = MovieNeighbors.objects.filter(movie_id=movie_id).first()
+    if neighbors is None:
+        return []
+    neighbor_ids, scores = unpack(neighbors)
+    return scored_movies(neighbor_ids[:number].tolist(), scores[:number].tolist())
+
+
+def recommend(user_id, number):
+    """
+    Devuelve hasta `number` películas que el usuario no ha reseñado, ordenadas
+    por la calificación que se estima que les daría (atributo `score`): su
+    media más la media de sus desviaciones en las películas similares que sí
+    reseñó, ponderada por la similitud.
+    """
+    rows = Review.objects.filter(user_id=user_id).values_list("movie_id", "rating")
+    totals = defaultdict(lambda: [0.0, 0])
+    for movie_id, rating in rows:
+        totals[movie_id][0] += rating
+        totals[movie_id][1] += 1
+    if not totals:
+        return []
+    rated = {movie_id: total / count for movie_id, (total, count) in totals.items()}
+    user_mean = sum(rated.values()) / len(rated)
+
+    candidate_ids, similarities, deviations = [], [], []
+    for neighbors in MovieNeighbors.objects.filter(movie_id__in=rated):
+        neighbor_ids, scores = unpack(neighbors)
+        candidate_ids.append(neighbor_ids)
+        similarities.append(scores)
+        deviations.append(np.full(len(scores), rated[neighbors.movie_id] - user_mean))
+    if not candidate_ids:
+        return []
+
+    candidate_ids = np.concatenate(candidate_ids)
+    similarities = np.concatenate(similarities).astype(np.float64)
+    deviations = np.concatenate(deviations)
+    unique_ids, index = np.unique(candidate_ids, return_inverse=True)
+    weight = np.bincount(index, weights=similarities)
+    estimate = (
+        user_mean + np.bincount(index, weights=similarities * deviations) / weight
+    )
+
+    keep = ~np.isin(unique_ids, list(rated))
+    unique_ids, weight, estimate = unique_ids[keep], weight[keep], estimate[keep]
+    # A igual estimación, primero la que más similitud acumula.
+    order = np.lexsort((unique_ids, -weight, -estimate))[:number]
+    return scored_movies(
+        unique_ids[order].tolist(), np.round(estimate[order], 4).tolist()
+    )
+
+
+def scored_movies(movie_ids, scores):
+    movies = Movie.objects.in_bulk(movie_ids)
+    result = []
+    for movie_id, score in zip(movie_ids, scores):
+        movie = movies.get(movie_id)
+        if movie is not None:
+            movie.score = round(score, 4)
+            result.append(movie)
+    return result
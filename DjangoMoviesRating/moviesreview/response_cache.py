@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.response import Response
+from .routers import served_from_replica
+from .versions import get_version
+
+
+class LocalLRUCache:
+    """
+    Caché en memoria del proceso con política LRU y caducidad por entrada.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Caché de respuestas ya renderizadas en dos niveles: un LRU local y,
+    opcionalmente, una caché compartida de Django (`SHARED_ALIAS`).
+
+    Las claves incluyen la versión de los espacios de nombres de los que
+    depende la respuesta, así que una escritura que incrementa la versión deja
+    obsoletas todas sus entradas sin tener que buscarlas.
+    """
+
+    def __init__(self, options):
+        self.enabled = options["ENABLED"]
+        self.ttl = options["TTL"]
+        self.shared_alias = options["SHARED_ALIAS"]
+        self.local = LocalLRUCache(options["MAX_ENTRIES"], self.ttl)
+        # Los contadores se actualizan desde los hilos de las peticiones.
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, key):
+        entry = self.local.get(key)
+        shared_hit = False
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+                shared_hit = True
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.shared_hits += shared_hit
+        return entry
+
+    def set(self, key, entry):
+        self.local.set(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, self.ttl)
+
+    def clear(self):
+        self.local.clear()
+        with self._stats_lock:
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "entries": len(self.local),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.local.evictions,
+            }
+
+
+response_cache = ResponseCache(settings.MOVIES_RESPONSE_CACHE)
+
+
+def build_key(name, namespaces, request, version_func=None):
+    parts = [str(get_version(namespace)) for namespace in namespaces]
+    if version_func is not None:
+        parts.append(version_func(request))
+    parts.append(request.get_full_path())
+    parts.append(request.accepted_media_type)
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"moviesreview:response:{name}:{digest}"
+
+
+def cache_response(*namespaces, version_func=None):
+    """
+    Decorador para manejadores GET de DRF que guarda el cuerpo ya renderizado
+    de las respuestas 200 en JSON, indexado por vista, URL y versiones de
+    `namespaces` (más la de `version_func(request)`, como en `namespace_etag`).
+
+    Se aplica dentro de la vista, después de la autenticación, los permisos y
+    la negociación de contenido, por lo que esas comprobaciones se siguen
+    haciendo en cada petición. Las respuestas leídas de una réplica
+    (`read_from_replica`) se sirven pero no se guardan.
+    """
+
+    def decorator(handler):
+        name = f"{handler.__module__}.{handler.__qualname__}"
+
+        @wraps(handler)
+        def wrapper(request, *args, **kwargs):
+            renderer = request.accepted_renderer
+            if not response_cache.enabled or renderer.format != "json":
+                return handler(request, *args, **kwargs)
+
+            key = build_key(name, namespaces, request, version_func)
+            entry = response_cache.get(key)
+            if entry is None:
+                response = handler(request, *args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                content = renderer.render(
+                    response.data,
+                    request.accepted_media_type,
+                    {"request": request, "response": response},
+                )
+                entry = (content, request.accepted_media_type)
+                # Una réplica con retraso puede devolver datos anteriores a
+                # las versiones de la clave.
+                if not served_from_replica():
+                    response_cache.set(key, entry)
+
+            content, content_type = entry
+            return HttpResponse(content, content_type=content_type)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,128 @@
+"""
+Enrutado de lecturas a réplicas con consistencia "lee tus escrituras".
+
+Solo las vistas decoradas con `read_from_replica` leen de una réplica; el
+resto de lecturas y todas las escrituras van a "default". Cuando un usuario
+escribe una reseña, sus lecturas vuelven al primario durante `PIN_SECONDS`
+segundos (una marca en la caché compartida), para que vea sus cambios aunque
+la réplica vaya con retraso.
+
+Las versiones de los espacios de nombres se incrementan al confirmar en el
+primario, así que una respuesta leída de una réplica con retraso puede llevar
+datos anteriores a la versión vigente: esas respuestas no se guardan en la
+caché de respuestas ni se envían con ETag (ver `served_from_replica`).
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+class ReplicaRead:
+    """
+    Réplica elegida para la petición en curso (`alias` None: el primario) y si
+    alguna consulta llegó a leer de ella.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.used = False
+
+
+_replica_read = ContextVar("moviesreview_replica_read", default=None)
+
+
+def replica_aliases():
+    return settings.MOVIES_READ_REPLICAS["ALIASES"]
+
+
+def _pin_key(user_id):
+    return f"moviesreview:primary-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    """
+    Envía al primario las lecturas de `user` durante los próximos
+    `PIN_SECONDS` segundos.
+    """
+    if replica_aliases() and user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), True, settings.MOVIES_READ_REPLICAS["PIN_SECONDS"])
+
+
+def is_pinned(user):
+    return (
+        user is not None
+        and user.is_authenticated
+        and bool(cache.get(_pin_key(user.pk)))
+    )
+
+
+def choose_replica(user):
+    """
+    Devuelve el alias de una réplica para las lecturas de `user`, o None si
+    no hay réplicas o si el usuario escribió hace poco.
+    """
+    aliases = replica_aliases()
+    if not aliases or is_pinned(user):
+        return None
+    return random.choice(aliases)
+
+
+def served_from_replica():
+    """
+    Indica si alguna consulta de la petición en curso leyó de una réplica.
+    """
+    read = _replica_read.get()
+    return read is not None and read.used
+
+
+def read_from_replica(view):
+    """
+    Decorador de vistas de solo lectura: las consultas de la vista (incluidas
+    las de su ETag) se hacen en una réplica. Si la respuesta se construyó con
+    datos de la réplica se envía sin ETag, que se calcula con las versiones
+    del primario.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        read = ReplicaRead(choose_replica(getattr(request, "user", None)))
+        token = _replica_read.set(read)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _replica_read.reset(token)
+        if read.used and response.status_code == 200 and response.has_header("ETag"):
+            del response["ETag"]
+        return response
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        read = _replica_read.get()
+        if read is None or read.alias is None:
+            return None
+        read.used = True
+        return read.alias
+
+    def db_for_write(self, model, **hints):
+        # Explícito para que un objeto leído de una réplica se guarde en el
+        # primario.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación.
+        if db in replica_aliases():
+            return False
+        return None
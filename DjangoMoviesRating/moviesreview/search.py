@@ -0,0 +1,281 @@
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import Director, Movie, Review
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Documentos indexados por tipo: modelo, campos con su peso y si sus nombres
+# se ofrecen en el autocompletado.
+DOCUMENTS = {
+    "movies": (Movie, {"name": 3, "description": 1}, True),
+    "directors": (Director, {"name": 3, "last_name": 3}, True),
+    "reviews": (Review, {"comment": 1}, False),
+}
+
+
+def tokenize(text):
+    """
+    Divide un texto en términos en minúsculas y sin tildes.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_RE.findall(text.lower())
+
+
+class InMemorySearchIndex:
+    """
+    Índice invertido en memoria: término -> {(tipo, id): peso}.
+
+    Se construye desde la base de datos en la primera búsqueda y se mantiene
+    de forma incremental con las escrituras de este proceso. El vocabulario
+    ordenado permite resolver prefijos con búsqueda binaria. Se reconstruye
+    cada `MOVIES_SEARCH_INDEX_TTL` segundos para recoger los cambios de otros
+    procesos.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_at = None
+
+    def _reset(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def _ensure_loaded(self):
+        if (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= settings.MOVIES_SEARCH_INDEX_TTL
+        ):
+            self.load()
+
+    def load(self):
+        """
+        Reconstruye el índice completo desde la base de datos.
+        """
+        with self._lock:
+            self._reset()
+            for kind, (model, fields, _) in DOCUMENTS.items():
+                rows = model.objects.values_list("pk", *fields).iterator(
+                    chunk_size=5000
+                )
+                for pk, *values in rows:
+                    self._add(kind, pk, dict(zip(fields, values)))
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def update(self, kind, instance):
+        """
+        Reindexa un documento tras crearlo o modificarlo.
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            self._remove(kind, instance.pk)
+            fields = DOCUMENTS[kind][1]
+            self._add(
+                kind, instance.pk, {name: getattr(instance, name) for name in fields}
+            )
+
+    def remove(self, kind, pk):
+        with self._lock:
+            if self.loaded:
+                self._remove(kind, pk)
+
+    def _add(self, kind, pk, values):
+        weights = defaultdict(float)
+        for name, weight in DOCUMENTS[kind][1].items():
+            for token in tokenize(values[name]):
+                weights[token] += weight
+        key = (kind, pk)
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[token][key] = weight
+        # Solo se guardan los nombres que se muestran en el autocompletado.
+        stored = values if DOCUMENTS[kind][2] else None
+        self._documents[key] = (tuple(weights), stored)
+
+    def _remove(self, kind, pk):
+        entry = self._documents.pop((kind, pk), None)
+        if entry is None:
+            return
+        for token in entry[0]:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop((kind, pk), None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+
+    def _expand_prefix(self, prefix):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, query, kinds, limit, prefix=True):
+        """
+        Devuelve, por tipo, los IDs de los documentos que mejor coinciden con
+        `query`, ordenados por una puntuación TF-IDF. El último término se trata
+        como prefijo.
+        """
+        self._ensure_loaded()
+        tokens = tokenize(query)
+        results = {kind: [] for kind in kinds}
+        if not tokens:
+            return results
+
+        with self._lock:
+            total = max(len(self._documents), 1)
+            scores = defaultdict(float)
+            for position, token in enumerate(tokens):
+                if prefix and position == len(tokens) - 1:
+                    terms = list(self._expand_prefix(token))
+                else:
+                    terms = [token] if token in self._postings else []
+                for term in terms:
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for key, weight in postings.items():
+                        if key[0] in results:
+                            scores[key] += weight * idf
+
+        by_kind = defaultdict(list)
+        for (kind, pk), score in scores.items():
+            by_kind[kind].append((score, pk))
+        for kind, candidates in by_kind.items():
+            best = heapq.nsmallest(
+                limit, candidates, key=lambda item: (-item[0], item[1])
+            )
+            results[kind] = [(pk, round(score, 4)) for score, pk in best]
+        return results
+
+    def autocomplete(self, prefix, limit):
+        """
+        Devuelve películas y directores cuyo nombre contiene un término que
+        empieza por `prefix`.
+        """
+        self._ensure_loaded()
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        kinds = [kind for kind, (_, _, suggest) in DOCUMENTS.items() if suggest]
+        matches = self.search(" ".join(tokens), kinds, limit)
+        suggestions = []
+        with self._lock:
+            for kind in kinds:
+                for pk, score in matches[kind]:
+                    entry = self._documents.get((kind, pk))
+                    if entry is not None:
+                        name = _display_name(kind, entry[1])
+                        suggestions.append((score, kind, pk, name))
+        suggestions.sort(key=lambda item: (-item[0], item[3]))
+        return [
+            {"type": kind, "id": pk, "name": name}
+            for _, kind, pk, name in suggestions[:limit]
+        ]
+
+
+def _display_name(kind, values):
+    if kind == "directors":
+        return f"{values['name']} {values['last_name']}"
+    return values["name"]
+
+
+class MySQLFullTextSearch:
+    """
+    Búsqueda sobre los índices FULLTEXT de MySQL (ver la migración 0012), en
+    modo booleano y con el último término como prefijo. MySQL mantiene los
+    índices al escribir, así que no hace falta actualizarlos a mano.
+    """
+
+    @staticmethod
+    def _boolean_query(query, prefix=True):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        if prefix:
+            tokens[-1] += "*"
+        return " ".join(tokens)
+
+    def search(self, query, kinds, limit, prefix=True):
+        boolean_query = self._boolean_query(query, prefix)
+        results = {kind: [] for kind in kinds}
+        if boolean_query is None:
+            return results
+        for kind in kinds:
+            model, fields, _ = DOCUMENTS[kind]
+            columns = ", ".join(model._meta.get_field(name).column for name in fields)
+            score = RawSQL(
+                f"MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)", [boolean_query]
+            )
+            rows = (
+                model.objects.annotate(score=score)
+                .filter(score__gt=0)
+                .order_by("-score", "pk")
+                .values_list("pk", "score")[:limit]
+            )
+            results[kind] = [(pk, round(value, 4)) for pk, value in rows]
+        return results
+
+    def autocomplete(self, prefix, limit):
+        kinds = [kind for kind, (_, _, suggest) in DOCUMENTS.items() if suggest]
+        matches = self.search(prefix, kinds, limit)
+        suggestions = []
+        for kind in kinds:
+            model, fields, _ = DOCUMENTS[kind]
+            objects = model.objects.in_bulk([pk for pk, _ in matches[kind]])
+            for pk, score in matches[kind]:
+                if pk in objects:
+                    values = {name: getattr(objects[pk], name) for name in fields}
+                    suggestions.append((score, kind, pk, _display_name(kind, values)))
+        suggestions.sort(key=lambda item: (-item[0], item[3]))
+        return [
+            {"type": kind, "id": pk, "name": name}
+            for _, kind, pk, name in suggestions[:limit]
+        ]
+
+
+memory_index = InMemorySearchIndex()
+
+
+def get_backend():
+    """
+    Devuelve el motor de búsqueda configurado en `MOVIES_SEARCH_BACKEND`:
+    "mysql", "memory" o "auto" (FULLTEXT si la base de datos es MySQL).
+    """
+    backend = settings.MOVIES_SEARCH_BACKEND
+    if backend == "auto":
+        backend = "mysql" if connection.vendor == "mysql" else "memory"
+    return MySQLFullTextSearch() if backend == "mysql" else memory_index
+
+
+def document_changed(kind, instance):
+    memory_index.update(kind, instance)
+
+
+def document_deleted(kind, pk):
+    memory_index.remove(kind, pk)
@@ -1,17 +1,429 @@
-from rest_framework import serializers
-from .models import Movie, Director, Review
+from datetime import date, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .models import Movie, Director, Review, MovieRatingStats, ChangeEvent
 
-class MovieSerializer(serializers.ModelSerializer):
+class EditableFieldsMixin:
+    """
+    Al editar guarda solo los campos recibidos (y los `auto_now`): un `save()`
+    completo escribiría los contadores y agregados leídos al cargar el objeto
+    y desharía los incrementos que otras transacciones hayan confirmado desde
+    entonces.
+    """
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data) + [
+            field.name for field in instance._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+        instance.save(update_fields=update_fields)
+        return instance
+
+class MovieSerializer(EditableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Movie
-        fields = '__all__'
+        exclude = ('decayed_sum', 'decayed_weight')
+        read_only_fields = (
+            'average_rating', 'rating_sum', 'rating_count', 'bayesian_rating',
+            'trending_rating',
+        )
+
+class UserRatedMovieSerializer(MovieSerializer):
+    user_avg_rating = serializers.FloatField(read_only=True)
+
+class MovieRatingStatsSerializer(serializers.ModelSerializer):
+    mean = serializers.FloatField(read_only=True)
+    variance = serializers.FloatField(read_only=True)
+    stddev = serializers.FloatField(read_only=True)
+    median = serializers.IntegerField(read_only=True)
+    histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = MovieRatingStats
+        fields = ('movie', 'count', 'mean', 'variance', 'stddev', 'median', 'histogram')
 
-class DirectorSerializer(serializers.ModelSerializer):
+class DirectorSerializer(EditableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Director
         fields = '__all__'
+        read_only_fields = (
+            'movie_count', 'review_count', 'average_rating', 'best_movie', 'worst_movie',
+        )
+
+class FilmographyMovieSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Movie
+        fields = (
+            'id', 'name', 'release_date', 'average_rating', 'rating_count',
+            'bayesian_rating',
+        )
+
+class ScoredMovieSerializer(FilmographyMovieSerializer):
+    """
+    Película recomendada: `score` es la similitud con la película consultada o
+    la calificación estimada para el usuario.
+    """
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(FilmographyMovieSerializer.Meta):
+        fields = FilmographyMovieSerializer.Meta.fields + ('score',)
+
+class DirectorDetailSerializer(DirectorSerializer):
+    """
+    Director con su filmografía (por fecha de estreno) y sus películas mejor y
+    peor calificadas.
+    """
+    best_movie = FilmographyMovieSerializer(read_only=True)
+    worst_movie = FilmographyMovieSerializer(read_only=True)
+    filmography = FilmographyMovieSerializer(source='movie_set', many=True, read_only=True)
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    movie = serializers.IntegerField(source='movie_id', read_only=True)
+
+    class Meta:
+        model = ChangeEvent
+        fields = ('id', 'sequence', 'kind', 'action', 'object_id', 'movie', 'average_rating', 'created_at')
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def validate(self, attrs):
+        """
+        Si `MOVIES_ONE_REVIEW_PER_USER` está activo, impide que un usuario
+        reseñe dos veces la misma película (las reseñas duplicadas inflan los
+        agregados de calificación).
+        """
+        attrs = super().validate(attrs)
+        if settings.MOVIES_ONE_REVIEW_PER_USER:
+            request = self.context.get('request')
+            user = request.user if request is not None else attrs.get('user')
+            self.check_unique(user, attrs)
+        return attrs
+
+    def save(self, **kwargs):
+        """
+        Con `MOVIES_ONE_REVIEW_PER_USER`, repite la comprobación de `validate`
+        en la transacción del guardado con la fila del usuario bloqueada: dos
+        peticiones simultáneas del mismo usuario pasarían ambas la validación
+        antes de que ninguna insertara su reseña.
+        """
+        if not settings.MOVIES_ONE_REVIEW_PER_USER:
+            return super().save(**kwargs)
+        user = kwargs.get('user', self.validated_data.get('user'))
+        if self.instance is not None:
+            user = self.instance.user
+        with transaction.atomic():
+            lock_reviewers([getattr(user, 'pk', None)])
+            self.check_unique(user, self.validated_data)
+            return super().save(**kwargs)
+
+    def check_unique(self, user, attrs):
+        if self.instance is not None:
+            user = self.instance.user
+            movie = attrs.get('movie', self.instance.movie)
+        else:
+            movie = attrs.get('movie')
+        if user is None or movie is None:
+            return
+
+        reviews = Review.objects.filter(user=user, movie=movie)
+        if self.instance is not None:
+            reviews = reviews.exclude(pk=self.instance.pk)
+        if reviews.exists():
+            raise serializers.ValidationError('Ya has reseñado esta película.')
+
+def lock_reviewers(user_ids):
+    """
+    Bloquea hasta el final de la transacción las filas de los usuarios
+    indicados, en orden de ID, para comprobar sin carreras que no tienen ya
+    una reseña de la película. Se bloquea el usuario y no la película para no
+    serializar las reseñas de los demás usuarios sobre una película popular.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if user_ids:
+        list(
+            User.objects.select_for_update().filter(pk__in=user_ids)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Igual que `PrimaryKeyRelatedField`, pero resuelve las claves con los objetos
+    precargados en `context["prefetched"][field_name]` en lugar de hacer una
+    consulta por fila.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return prefetched[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class ReviewBulkListSerializer(serializers.ListSerializer):
+    """
+    Valida un lote de reseñas conservando las filas válidas aunque otras fallen.
+    Los errores quedan en `row_errors`, indexados por la posición en el lote.
+    """
+
+    def to_internal_value(self, data):
+        self.row_errors = {}
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.run_child_validation(item))
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+        return validated
+
+class ReviewBulkSerializer(ReviewSerializer):
+    movie = PrefetchedPrimaryKeyRelatedField(queryset=Movie.objects.all())
+    user = PrefetchedPrimaryKeyRelatedField(
+        queryset=User.objects.all(), allow_null=True, required=False
+    )
+
+    class Meta(ReviewSerializer.Meta):
+        list_serializer_class = ReviewBulkListSerializer
+
+    def validate(self, attrs):
+        # La unicidad (usuario, película) se comprueba por lote en
+        # `ingest.import_reviews` para no hacer una consulta por fila.
+        return serializers.ModelSerializer.validate(self, attrs)
+
+class ReviewValuesSerializer:
+    """
+    Serializador de solo lectura para listados de reseñas que trabaja sobre
+    diccionarios de `QuerySet.values()` en lugar de instancias del modelo.
+
+    Produce la misma salida que `ReviewSerializer`, y con `expand` sustituye
+    las claves `movie`, `user` y `movie.director` por resúmenes anidados que se
+    obtienen con JOIN en la misma consulta.
+    """
+
+    EXPANDABLE = ('movie', 'user', 'director')
+    BASE_FIELDS = ('id', 'rating', 'comment', 'created_at', 'updated_at', 'movie', 'user')
+    MOVIE_FIELDS = ('id', 'name', 'average_rating', 'director')
+    DIRECTOR_FIELDS = ('id', 'name', 'last_name')
+    USER_FIELDS = ('id', 'username')
+
+    def __init__(self, expand=()):
+        self.expand = {name for name in expand if name in self.EXPANDABLE}
+        if 'director' in self.expand:
+            self.expand.add('movie')
+        self._timezone = None
+
+    @classmethod
+    def parse_expand(cls, request):
+        value = request.query_params.get('expand', '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def value_paths(self):
+        paths = list(self.BASE_FIELDS)
+        if 'movie' in self.expand:
+            paths += [f'movie__{name}' for name in self.MOVIE_FIELDS[1:]]
+        if 'director' in self.expand:
+            paths += [f'movie__director__{name}' for name in self.DIRECTOR_FIELDS[1:]]
+        if 'user' in self.expand:
+            paths += [f'user__{name}' for name in self.USER_FIELDS[1:]]
+        return paths
+
+    def prepare(self, queryset):
+        """
+        Convierte el queryset en uno de diccionarios con solo las columnas
+        necesarias, incluidas las de las relaciones expandidas.
+        """
+        return queryset.values(*self.value_paths())
+
+    def to_representation(self, row):
+        data = {
+            'id': row['id'],
+            'rating': row['rating'],
+            'comment': row['comment'],
+            'created_at': iso_datetime(row['created_at'], self._timezone),
+            'updated_at': iso_datetime(row['updated_at'], self._timezone),
+            'movie': row['movie'],
+            'user': row['user'],
+        }
+        if 'movie' in self.expand:
+            movie = {
+                'id': row['movie'],
+                'name': row['movie__name'],
+                'average_rating': row['movie__average_rating'],
+                'director': row['movie__director'],
+            }
+            if 'director' in self.expand and movie['director'] is not None:
+                movie['director'] = {
+                    'id': row['movie__director'],
+                    'name': row['movie__director__name'],
+                    'last_name': row['movie__director__last_name'],
+                }
+            data['movie'] = movie
+        if 'user' in self.expand and row['user'] is not None:
+            data['user'] = {'id': row['user'], 'username': row['user__username']}
+        return data
+
+    def serialize(self, rows):
+        self._timezone = output_timezone()
+        return [self.to_representation(row) for row in rows]
+
+_DATETIME_FIELD = serializers.DateTimeField()
+
+def output_timezone():
+    """
+    Zona horaria en la que `DateTimeField` representa las fechas en la
+    petición en curso. UTC se sustituye por `datetime.timezone.utc`, la de los
+    valores que devuelve la base de datos, para no convertir cada valor.
+    """
+    if not settings.USE_TZ:
+        return None
+    current = timezone.get_current_timezone()
+    if getattr(current, 'key', None) == 'UTC':
+        return dt_timezone.utc
+    return current
+
+def iso_datetime(value, tz):
+    """
+    Igual que `DateTimeField().to_representation(value)` cuando `tz` es
+    `output_timezone()`, sin conversión de zona horaria si el valor ya está en
+    ella (el caso habitual), que es lo que domina el coste en los listados.
+    """
+    if value is None or tz is None or value.tzinfo is not tz:
+        return _DATETIME_FIELD.to_representation(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+class ValuesSerializer:
+    """
+    Ruta rápida de solo lectura que produce la misma salida que un
+    `ModelSerializer` a partir de las tuplas de `QuerySet.values_list()`, sin
+    instancias del modelo ni recorrer los campos en cada fila: las columnas
+    cuya representación es el propio valor pasan al diccionario de salida con
+    `dict(zip())`, y solo las demás se convierten, con funciones elegidas una
+    sola vez por campo (`to_representation` únicamente para los campos sin
+    equivalente directo: decimales, fechas con formato propio...).
+
+    Solo admite campos del modelo (también de relaciones, con `source`
+    separado por puntos) y claves primarias de relaciones.
+    """
+    # Campos cuya representación es el propio valor leído de la base de datos.
+    IDENTITY_FIELDS = (
+        serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+        serializers.PrimaryKeyRelatedField,
+    )
+    _compiled = {}
+
+    def __init__(self, serializer_class):
+        self.names = []
+        self.paths = []
+        # (posición, nombre, conversión) de las columnas que no se copian tal
+        # cual. Las fechas con hora se convierten con `iso_datetime`, que
+        # depende de la zona horaria de la petición.
+        self.conversions = []
+        self._row_functions = {}
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField,
+                                  serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} no admite la ruta rápida.'
+                )
+            position = len(self.paths)
+            self.names.append(name)
+            self.paths.append(field.source.replace('.', '__'))
+            if not isinstance(field, self.IDENTITY_FIELDS):
+                self.conversions.append((position, name, self.conversion(field)))
+
+    @classmethod
+    def conversion(cls, field):
+        if type(field) is serializers.FloatField:
+            return float
+        if (type(field) is serializers.DateTimeField
+                and cls.is_iso(field, api_settings.DATETIME_FORMAT)):
+            return iso_datetime
+        if (type(field) is serializers.DateField
+                and cls.is_iso(field, api_settings.DATE_FORMAT)):
+            return date.isoformat
+        return field.to_representation
+
+    def row_function(self, tz):
+        """
+        Función que convierte una fila en el diccionario de salida, con las
+        claves en el orden de los campos del serializador. Se construye una
+        vez por zona horaria.
+        """
+        function = self._row_functions.get(tz)
+        if function is not None:
+            return function
+
+        names = tuple(self.names)
+        conversions = tuple(
+            (
+                position,
+                name,
+                (lambda value: iso_datetime(value, tz))
+                if convert is iso_datetime else convert,
+            )
+            for position, name, convert in self.conversions
+        )
+        if conversions:
+            def function(row):
+                data = dict(zip(names, row))
+                for position, name, convert in conversions:
+                    value = row[position]
+                    # Como `Serializer.to_representation`, los nulos no se
+                    # convierten.
+                    if value is not None:
+                        data[name] = convert(value)
+                return data
+        else:
+            def function(row):
+                return dict(zip(names, row))
+        self._row_functions[tz] = function
+        return function
+
+    def to_representation(self, row, tz):
+        return self.row_function(tz)(row)
+
+    @staticmethod
+    def is_iso(field, default_format):
+        output_format = getattr(field, 'format', default_format)
+        return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        """
+        Devuelve (y guarda) el serializador compilado de `serializer_class`.
+        """
+        compiled = cls._compiled.get(serializer_class)
+        if compiled is None:
+            compiled = cls._compiled[serializer_class] = cls(serializer_class)
+        return compiled
+
+    def prepare(self, queryset):
+        """
+        Convierte el queryset en uno de tuplas con nombre (la paginación lee
+        de ellas las columnas del cursor) con solo las columnas de la salida.
+        """
+        return queryset.values_list(*self.paths, named=True)
+
+    def serialize(self, rows):
+        to_representation = self.row_function(output_timezone())
+        return [to_representation(row) for row in rows]
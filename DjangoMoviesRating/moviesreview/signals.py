@@ -0,0 +1,146 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import ChangeEvent, Director, Movie, Review
+from . import changes, ratings, search
+from .authentication import revoke_user_tokens
+from .versions import AUTHORIZATION, DIRECTORS, MOVIES, REVIEWS, bump_version
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_changed(sender, **kwargs):
+    bump_version(MOVIES)
+
+
+@receiver(pre_save, sender=Movie)
+def movie_saving(sender, instance, **kwargs):
+    # Director anterior de la película, para actualizar sus agregados si cambia.
+    instance._previous_director_id = (
+        None
+        if instance._state.adding
+        else Movie.objects.filter(pk=instance.pk)
+        .values_list("director_id", flat=True)
+        .first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_director_stats(sender, instance, **kwargs):
+    director_ids = {
+        instance.director_id,
+        getattr(instance, "_previous_director_id", None),
+    } - {None}
+    if director_ids:
+        transaction.on_commit(
+            lambda: ratings.refresh_director_stats(director_ids=director_ids)
+        )
+
+
+@receiver([post_save, post_delete], sender=Director)
+def director_changed(sender, **kwargs):
+    # Eliminar un director deja en NULL el director de sus películas.
+    bump_version(DIRECTORS, MOVIES)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, **kwargs):
+    bump_version(REVIEWS)
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Permission)
+def authorization_changed(sender, **kwargs):
+    bump_version(AUTHORIZATION)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def authorization_membership_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_version(AUTHORIZATION)
+
+
+# Indicadores del usuario que llevan los claims de sus tokens.
+TOKEN_FLAGS = ("is_active", "is_staff", "is_superuser")
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Indicadores anteriores, salvo que el guardado no pueda cambiarlos (p. ej.
+    # last_login al iniciar sesión).
+    instance._previous_token_flags = None
+    if instance._state.adding or (
+        update_fields is not None and not set(TOKEN_FLAGS) & set(update_fields)
+    ):
+        return
+    instance._previous_token_flags = (
+        User.objects.filter(pk=instance.pk).values_list(*TOKEN_FLAGS).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # Los tokens sin estado no consultan el usuario: al desactivarlo, o al
+    # cambiar sus indicadores de staff o superusuario, hay que revocar los que
+    # ya tiene. Se revocan al confirmar, para que un token emitido antes del
+    # commit con los indicadores anteriores también quede revocado.
+    previous = getattr(instance, "_previous_token_flags", None)
+    current = tuple(getattr(instance, flag) for flag in TOKEN_FLAGS)
+    if not instance.is_active or (previous is not None and previous != current):
+        user_id = instance.pk
+        transaction.on_commit(lambda: revoke_user_tokens(user_id))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+def search_index_receivers(kind):
+    """
+    Receptores que reindexan un documento de búsqueda cuando se confirma la
+    transacción que lo guarda o lo elimina.
+    """
+
+    def saved(sender, instance, **kwargs):
+        transaction.on_commit(lambda: search.document_changed(kind, instance))
+
+    def deleted(sender, instance, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: search.document_deleted(kind, pk))
+
+    return saved, deleted
+
+
+for kind, (model, _, _) in search.DOCUMENTS.items():
+    saved, deleted = search_index_receivers(kind)
+    post_save.connect(saved, sender=model, weak=False)
+    post_delete.connect(deleted, sender=model, weak=False)
+
+
+def change_log_receivers(kind):
+    """
+    Receptores que registran en `ChangeEvent`, dentro de la transacción que
+    guarda o elimina el objeto, su alta, edición o baja.
+    """
+
+    def saved(sender, instance, created, **kwargs):
+        action = ChangeEvent.CREATED if created else ChangeEvent.UPDATED
+        changes.object_changed(kind, instance, action)
+
+    def deleted(sender, instance, **kwargs):
+        changes.object_changed(kind, instance, ChangeEvent.DELETED)
+
+    return saved, deleted
+
+
+for kind, model in (
+    (ChangeEvent.REVIEW, Review),
+    (ChangeEvent.MOVIE, Movie),
+    (ChangeEvent.DIRECTOR, Director),
+):
+    saved, deleted = change_log_receivers(kind)
+    post_save.connect(saved, sender=model, weak=False)
+    post_delete.connect(deleted, sender=model, weak=False)
@@ -1,3 +1,1856 @@
-from django.test import TestCase
+"""
+Pruebas de moviesreview. Sin servidor MySQL se ejecutan con SQLite:
 
-# Create your tests here.
+    MOVIES_DB_ENGINE=sqlite python manage.py test moviesreview
+"""
+
+import io
+import json
+import math
+import random
+import threading
+from base64 import urlsafe_b64encode
+from functools import partial
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    APITestCase,
+    APITransactionTestCase,
+)
+from . import (
+    changes,
+    export,
+    ingest,
+    jobs,
+    leaderboard,
+    ranking,
+    ratings,
+    recommendations,
+    search,
+)
+from .authentication import stateless_enabled
+from .benchmarks import SEED_DATE, seed_dataset
+from .management.commands import bench_api
+from .models import (
+    ChangeEvent,
+    ChangeSequence,
+    Director,
+    Movie,
+    MovieRatingShard,
+    MovieRatingStats,
+    RatingJob,
+    Review,
+)
+from .permissions import (
+    ADMINISTRATORS_GROUP,
+    AuthorizationCache,
+    authorization_cache,
+)
+from .query_budget import QueryBudgetMiddleware
+from .response_cache import ResponseCache, response_cache
+from .routers import pin_to_primary
+from .serializers import (
+    ChangeEventSerializer,
+    DirectorDetailSerializer,
+    DirectorSerializer,
+    MovieSerializer,
+    ReviewSerializer,
+    ValuesSerializer,
+)
+from .versions import MOVIES, bump_version
+
+
+@override_settings(
+    MOVIES_READ_REPLICAS={"ALIASES": [], "PIN_SECONDS": 10},
+    MOVIES_RATING_WRITE_MODE="direct",
+    MOVIES_DIRECTOR_STATS_DELAY=0,
+    MOVIES_CHANGES={**settings.MOVIES_CHANGES, "SEQUENCE_DELAY": 0},
+)
+class MoviesTestCase(APITestCase):
+    """
+    Base de las pruebas: un crítico administrador con todos los permisos de la
+    aplicación, un director y dos películas, y las cachés del proceso vacías.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("critic", password="secret")
+        cls.user.user_permissions.set(
+            Permission.objects.filter(content_type__app_label="moviesreview")
+        )
+        cls.user.groups.add(Group.objects.create(name=ADMINISTRATORS_GROUP))
+        cls.director = Director.objects.create(
+            name="Agnès", last_name="Varda", birth_date="1928-05-30"
+        )
+        cls.movie = Movie.objects.create(
+            name="Cléo de 5 à 7", director=cls.director, release_date="1962-04-11"
+        )
+        cls.other_movie = Movie.objects.create(
+            name="Sans toit ni loi", director=cls.director, release_date="1985-12-04"
+        )
+
+    def setUp(self):
+        cache.clear()
+        response_cache.clear()
+        authorization_cache.clear()
+        leaderboard.invalidate()
+        self.client.force_authenticate(self.user)
+        # Los permisos se cargan una vez y no cuentan en las consultas de cada
+        # petición.
+        authorization_cache.get(self.user)
+
+    def create_review(self, movie=None, rating=4.0, user=None):
+        """
+        Crea una reseña por la API y ejecuta lo que queda pendiente del commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/reviews/",
+                {"movie": (movie or self.movie).pk, "rating": rating, "comment": "-"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return Review.objects.get(pk=response.json()["id"])
+
+    def assertMovieCounters(self, movie):
+        """
+        Comprueba que los contadores y la distribución de la película coinciden
+        con los de sus reseñas.
+        """
+        movie.refresh_from_db()
+        reviews = list(
+            Review.objects.filter(movie=movie).values_list("rating", flat=True)
+        )
+        self.assertEqual(movie.rating_count, len(reviews))
+        self.assertAlmostEqual(movie.rating_sum, sum(reviews))
+        self.assertEqual(
+            movie.average_rating,
+            round(sum(reviews) / len(reviews), 2) if reviews else 0,
+        )
+        stats = MovieRatingStats.objects.filter(movie=movie).first()
+        self.assertEqual(stats.count if stats else 0, len(reviews))
+        if stats:
+            self.assertAlmostEqual(stats.rating_sum, sum(reviews))
+
+
+class ReviewWriteTests(MoviesTestCase):
+    """
+    Ruta de escritura de reseñas en modo "direct": contadores incrementales y
+    número de sentencias por escritura.
+    """
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        review = self.create_review(rating=4.0)
+        self.create_review(rating=2.5)
+        self.assertMovieCounters(self.movie)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/reviews/{review.pk}/",
+                {"movie": self.other_movie.pk, "rating": 5.0},
+                format="json",
+            )
+        self.assertMovieCounters(self.movie)
+        self.assertMovieCounters(self.other_movie)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/reviews/{review.pk}/")
+        self.assertMovieCounters(self.other_movie)
+
+    def test_create_queries(self):
+        self.create_review()
+        # Película (validación), reseña, evento de la reseña, contadores,
+        # evento "rated" y distribución, más el savepoint de la transacción.
+        with self.assertNumQueries(8):
+            self.client.post(
+                "/api/reviews/",
+                {"movie": self.movie.pk, "rating": 4.0, "comment": "-"},
+                format="json",
+            )
+
+    def test_update_queries(self):
+        review = self.create_review()
+        with self.assertNumQueries(9):
+            self.client.patch(
+                f"/api/reviews/{review.pk}/", {"rating": 3.0}, format="json"
+            )
+
+    def test_cross_movie_update_queries(self):
+        review = self.create_review()
+        self.create_review(self.other_movie)
+        # Los eventos "rated" de las dos películas van en un solo INSERT.
+        with self.assertNumQueries(12):
+            self.client.patch(
+                f"/api/reviews/{review.pk}/",
+                {"movie": self.other_movie.pk},
+                format="json",
+            )
+
+    def test_delete_queries(self):
+        review = self.create_review()
+        # Incluye el bloqueo de la reseña antes de borrarla.
+        with self.assertNumQueries(9):
+            self.client.delete(f"/api/reviews/{review.pk}/")
+
+    def test_delete_subtracts_the_locked_rating(self):
+        self.create_review(rating=2.0)
+        get_object = GenericAPIView.get_object
+
+        def edited_after_load(view):
+            review = get_object(view)
+            # Una edición confirmada entre get_object() y el borrado.
+            edited = Review.objects.get(pk=review.pk)
+            edited.rating = 1.0
+            edited.save()
+            ratings.review_updated(edited, review.movie_id, review.rating)
+            return review
+
+        for route in ("/api/reviews/{}/", "/api/reviews/critic/delete/{}/"):
+            review = self.create_review(rating=4.0)
+            with self.subTest(route=route):
+                with mock.patch.object(GenericAPIView, "get_object", edited_after_load):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        response = self.client.delete(route.format(review.pk))
+                self.assertEqual(response.status_code, 204, response.content)
+                self.assertMovieCounters(self.movie)
+
+    def test_edits_keep_counters_committed_after_load(self):
+        self.create_review(rating=4.0)
+        get_object = GenericAPIView.get_object
+
+        def rated_after_load(view):
+            obj = get_object(view)
+            # Una reseña confirmada entre get_object() y el guardado.
+            ratings.apply_rating_delta(self.movie.pk, 2.0, 1)
+            ratings.refresh_director_stats(movie_ids=[self.movie.pk])
+            return obj
+
+        for path, data in (
+            (f"/api/movies/update/{self.movie.pk}/", {"name": "Cléo"}),
+            (f"/api/directors/update/{self.director.pk}/", {"name": "Agnès"}),
+        ):
+            with self.subTest(path=path):
+                with mock.patch.object(GenericAPIView, "get_object", rated_after_load):
+                    response = self.client.patch(path, data, format="json")
+                self.assertEqual(response.status_code, 200, response.content)
+        movie = Movie.objects.get(pk=self.movie.pk)
+        self.assertEqual(
+            (movie.name, movie.rating_count, movie.rating_sum), ("Cléo", 3, 8.0)
+        )
+        self.director.refresh_from_db()
+        self.assertEqual(self.director.review_count, 3)
+
+    def test_rated_events_carry_the_new_average(self):
+        self.create_review(rating=4.0)
+        self.create_review(rating=3.0)
+        event = ChangeEvent.objects.filter(action=ChangeEvent.RATED).latest("pk")
+        self.assertEqual(
+            (event.object_id, event.movie_id, event.average_rating),
+            (self.movie.pk, self.movie.pk, 3.5),
+        )
+
+    def test_director_refresh_is_coalesced(self):
+        with self.settings(MOVIES_DIRECTOR_STATS_DELAY=60):
+            self.create_review(self.movie, 4.0)
+            self.create_review(self.other_movie, 2.0)
+            self.director.refresh_from_db()
+            self.assertEqual(self.director.review_count, 0)
+            # Un solo UPDATE para las escrituras acumuladas.
+            with self.assertNumQueries(1):
+                self.assertEqual(ratings.refresh_stale_directors(), 1)
+        self.director.refresh_from_db()
+        self.assertEqual(
+            (
+                self.director.review_count,
+                self.director.average_rating,
+                self.director.best_movie_id,
+            ),
+            (2, 3.0, self.movie.pk),
+        )
+
+
+@override_settings(MOVIES_RATING_WRITE_MODE="sharded", MOVIES_RATING_SHARDS=4)
+class ShardedWriteTests(MoviesTestCase):
+    """
+    Modo "sharded": ninguna escritura de reseñas toca la fila de la película
+    hasta que se consolidan sus deltas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Consolida ya la primera escritura y retrasa las siguientes.
+        self.review = self.create_review(rating=4.0)
+        self.assertMovieCounters(self.movie)
+
+    def patch_review(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/reviews/{self.review.pk}/", data, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_same_movie_update_goes_through_shards(self):
+        self.patch_review({"rating": 2.0})
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_sum, 4.0)
+
+        self.assertEqual(ratings.flush_all_rating_shards(), 1)
+        self.assertMovieCounters(self.movie)
+
+    def test_cross_movie_update_goes_through_shards(self):
+        self.patch_review({"movie": self.other_movie.pk})
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 1)
+        # Primera escritura de la otra película en el plazo: se consolida al
+        # confirmar.
+        self.assertMovieCounters(self.other_movie)
+
+        self.assertEqual(ratings.flush_all_rating_shards(), 1)
+        self.assertMovieCounters(self.movie)
+
+    def test_stats_go_through_shards(self):
+        with CaptureQueriesContext(connection) as queries:
+            review = self.create_review(rating=2.0)
+            self.patch_review({"rating": 5.0})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f"/api/reviews/{review.pk}/")
+        stats_table = MovieRatingStats._meta.db_table
+        self.assertFalse([q["sql"] for q in queries if stats_table in q["sql"]])
+        self.assertEqual(MovieRatingStats.objects.get(movie=self.movie).bucket_4, 1)
+
+        self.assertEqual(ratings.flush_all_rating_shards(), 1)
+        self.assertMovieCounters(self.movie)
+        stats = MovieRatingStats.objects.values().get(movie=self.movie)
+        ratings.rebuild_rating_stats([self.movie.pk])
+        self.assertEqual(stats, MovieRatingStats.objects.values().get(movie=self.movie))
+
+    def test_flush_applies_decayed_only_deltas(self):
+        self.movie.refresh_from_db()
+        decayed_sum, decayed_weight = self.movie.decayed_sum, self.movie.decayed_weight
+        ratings.add_to_shard(self.movie.pk, 0, 0, 1.5, 0.5)
+
+        self.assertEqual(ratings.flush_all_rating_shards(), 1)
+        self.movie.refresh_from_db()
+        self.assertAlmostEqual(self.movie.decayed_sum, decayed_sum + 1.5)
+        self.assertAlmostEqual(self.movie.decayed_weight, decayed_weight + 0.5)
+        self.assertFalse(
+            MovieRatingShard.objects.exclude(**ratings.EMPTY_SHARD).exists()
+        )
+
+
+class CriticReviewListTests(MoviesTestCase):
+    def test_deleting_an_older_review_invalidates_the_list(self):
+        older = self.create_review(rating=2.0)
+        self.create_review(rating=4.0)
+        first = self.client.get("/api/reviews/critic/")
+        self.assertNotIn("Last-Modified", first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/reviews/critic/delete/{older.pk}/")
+        # La fecha de la última edición no cambió: solo el ETag lo detecta.
+        response = self.client.get(
+            "/api/reviews/critic/", HTTP_IF_MODIFIED_SINCE=http_date()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_unchanged_list_is_not_modified(self):
+        self.create_review()
+        first = self.client.get(f"/api/reviews/critic/{self.movie.pk}/")
+        response = self.client.get(
+            f"/api/reviews/critic/{self.movie.pk}/", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class TopMoviesTests(MoviesTestCase):
+    def top_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [movie["id"] for movie in response.json()]
+
+    def test_reloaded_leaderboard_is_not_served_from_cache(self):
+        Movie.objects.filter(pk=self.movie.pk).update(average_rating=4, rating_count=1)
+        Movie.objects.filter(pk=self.other_movie.pk).update(
+            average_rating=3, rating_count=1
+        )
+        first = self.client.get("/api/movies/top/2/")
+        self.assertEqual(self.top_ids(first), [self.movie.pk, self.other_movie.pk])
+
+        # Otro proceso cambia una calificación: la versión de MOVIES cambia,
+        # el ranking en memoria de este proceso no hasta que se recarga.
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(pk=self.other_movie.pk).update(average_rating=5)
+            bump_version(MOVIES)
+        stale = self.client.get("/api/movies/top/2/")
+        self.assertEqual(self.top_ids(stale), [self.movie.pk, self.other_movie.pk])
+
+        leaderboard.invalidate()
+        response = self.client.get(
+            "/api/movies/top/2/", HTTP_IF_NONE_MATCH=stale["ETag"]
+        )
+        self.assertEqual(self.top_ids(response), [self.other_movie.pk, self.movie.pk])
+        self.assertNotEqual(response["ETag"], stale["ETag"])
+
+    def test_unchanged_leaderboard_is_cached(self):
+        first = self.client.get("/api/movies/top/2/")
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/movies/top/2/", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranking_parameter_chooses_the_order(self):
+        # Una sola reseña de 5 encabeza la media simple, pero no la amortiguada.
+        self.create_review(self.movie, 5.0)
+        for _ in range(5):
+            self.create_review(self.other_movie, 4.5)
+        expected = {
+            "average": [self.movie.pk, self.other_movie.pk],
+            "bayesian": [self.other_movie.pk, self.movie.pk],
+            "trending": [self.other_movie.pk, self.movie.pk],
+        }
+        for ranking_name, order in expected.items():
+            with self.subTest(ranking=ranking_name):
+                response = self.client.get(f"/api/movies/top/2/?ranking={ranking_name}")
+                self.assertEqual(self.top_ids(response), order)
+
+        response = self.client.get("/api/movies/top/2/?ranking=popular")
+        self.assertEqual(response.status_code, 400)
+
+    def test_incremental_scores_match_rebuild(self):
+        reviews = [
+            self.create_review(movie, rating)
+            for movie, rating in (
+                (self.movie, 2.0),
+                (self.movie, 4.5),
+                (self.movie, 5.0),
+                (self.other_movie, 3.0),
+                (self.other_movie, 1.5),
+            )
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            responses = [
+                self.client.patch(
+                    f"/api/reviews/{reviews[0].pk}/", {"rating": 3.5}, format="json"
+                ),
+                self.client.patch(
+                    f"/api/reviews/{reviews[1].pk}/",
+                    {"movie": self.other_movie.pk},
+                    format="json",
+                ),
+                self.client.delete(f"/api/reviews/{reviews[3].pk}/"),
+            ]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 204])
+
+        fields = [
+            "rating_sum",
+            "rating_count",
+            "average_rating",
+            "bayesian_rating",
+            "trending_rating",
+            "decayed_sum",
+            "decayed_weight",
+        ]
+        movies = Movie.objects.order_by("pk")
+        incremental = list(movies.values_list(*fields))
+        # Bloques de 2 reseñas: la acumulación cruza bloques y películas.
+        self.assertEqual(ranking.rebuild_scores(chunk_size=2), movies.count())
+        for before, after in zip(incremental, movies.values_list(*fields)):
+            for field, expected, rebuilt in zip(fields, before, after):
+                with self.subTest(field=field):
+                    # `trending_rating` depende del instante del cálculo.
+                    self.assertAlmostEqual(expected, rebuilt, places=3)
+
+
+class LeaderboardTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_review(self.movie, 4.0)
+        self.create_review(self.other_movie, 3.0)
+        self.board = leaderboard.leaderboard
+        self.assertEqual(self.board.top(2), [self.movie.pk, self.other_movie.pk])
+
+    def top(self):
+        # Sin consultas: el ranking ya cargado se actualiza en memoria.
+        with self.assertNumQueries(0):
+            return self.board.top(10)
+
+    def test_order_follows_ratings_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                "/api/reviews/",
+                {"movie": self.other_movie.pk, "rating": 5.0, "comment": "-"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.top(), [self.movie.pk, self.other_movie.pk])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.top(), [self.other_movie.pk, self.movie.pk])
+
+        # Una edición también reubica la película.
+        review = Review.objects.get(movie=self.other_movie, rating=5.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/reviews/{review.pk}/", {"rating": 1.0}, format="json"
+            )
+        self.assertEqual(self.top(), [self.movie.pk, self.other_movie.pk])
+
+    def test_deleted_movie_is_discarded(self):
+        for board in leaderboard.leaderboards.values():
+            board.top(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/movies/delete/{self.movie.pk}/")
+        self.assertEqual(response.status_code, 204)
+        for name, board in leaderboard.leaderboards.items():
+            with self.subTest(ranking=name), self.assertNumQueries(0):
+                self.assertEqual(board.top(10), [self.other_movie.pk])
+
+    def test_rolled_back_writes_leave_the_board_unchanged(self):
+        revision = self.board.revision
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.client.post(
+                    "/api/reviews/",
+                    {"movie": self.other_movie.pk, "rating": 5.0, "comment": "-"},
+                    format="json",
+                )
+                self.client.delete(f"/api/movies/delete/{self.movie.pk}/")
+                transaction.set_rollback(True)
+        self.assertEqual(self.top(), [self.movie.pk, self.other_movie.pk])
+        self.assertEqual(self.board.revision, revision)
+
+
+class BulkImportTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_review(self.movie, 2.0)
+
+    def import_reviews(self, records, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ingest.import_reviews(records, user=self.user, **kwargs)
+
+    def test_invalid_item_is_reported_and_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/reviews/bulk/",
+                [
+                    {"movie": self.movie.pk, "rating": 4.0, "comment": "-"},
+                    {"movie": self.movie.pk, "rating": "cuatro", "comment": "-"},
+                    {"movie": 0, "rating": 3.0, "comment": "-"},
+                    {"movie": self.other_movie.pk, "rating": 5.0, "comment": "-"},
+                ],
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report["created"], report["invalid"]), (2, 2))
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3])
+        self.assertIn("rating", report["errors"][0]["errors"])
+        self.assertIn("movie", report["errors"][1]["errors"])
+        self.assertEqual(Review.objects.filter(comment="-").count(), 3)
+        self.assertMovieCounters(self.movie)
+        self.assertMovieCounters(self.other_movie)
+
+    def test_counters_after_import(self):
+        records = [
+            {"movie": movie.pk, "rating": rating, "comment": "importada"}
+            for movie, rating in (
+                (self.movie, 5.0),
+                (self.other_movie, 1.0),
+                (self.movie, 3.5),
+                (self.other_movie, 4.0),
+                (self.movie, 1.0),
+            )
+        ]
+        report = self.import_reviews(records, chunk_size=2)
+        self.assertEqual((report["created"], report["movies"]), (5, 2))
+        for movie in (self.movie, self.other_movie):
+            with self.subTest(movie=movie.name):
+                self.assertMovieCounters(movie)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 4)
+        self.assertEqual(self.movie.average_rating, 2.88)
+
+    def test_failed_chunk_still_rebuilds_committed_chunks(self):
+        # El tercer registro no es JSON: el primer lote ya está confirmado.
+        stream = io.StringIO(
+            f'{{"movie": {self.other_movie.pk}, "rating": 5.0, "comment": "-"}}\n'
+            f'{{"movie": {self.other_movie.pk}, "rating": 4.0, "comment": "-"}}\n'
+            "{roto\n"
+            f'{{"movie": {self.other_movie.pk}, "rating": 1.0, "comment": "-"}}\n'
+        )
+        with self.assertRaises(ValueError):
+            self.import_reviews(ingest.iter_records(stream, "jsonl"), chunk_size=2)
+        self.assertEqual(Review.objects.filter(movie=self.other_movie).count(), 2)
+        self.assertMovieCounters(self.other_movie)
+
+        # También si falla la inserción de un lote posterior.
+        bulk_create = Review.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(reviews, **kwargs):
+            calls.append(reviews)
+            if len(calls) > 1:
+                raise RuntimeError("Conexión perdida.")
+            return bulk_create(reviews, **kwargs)
+
+        records = [{"movie": self.movie.pk, "rating": 5.0, "comment": "-"}] * 4
+        with mock.patch.object(Review.objects, "bulk_create", failing_bulk_create):
+            with self.assertRaises(RuntimeError):
+                self.import_reviews(records, chunk_size=2)
+        self.assertEqual(Review.objects.filter(movie=self.movie).count(), 3)
+        self.assertMovieCounters(self.movie)
+
+
+@override_settings(MOVIES_SEARCH_BACKEND="memory")
+class SearchTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        # El índice es del proceso: se reconstruye con los datos de la prueba.
+        search.memory_index.invalidate()
+        self.addCleanup(search.memory_index.invalidate)
+        Movie.objects.filter(pk=self.movie.pk).update(
+            description="Una cantante espera los resultados de una biopsia."
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review = Review.objects.create(
+                user=self.user, movie=self.movie, comment="Una obra maestra.", rating=5
+            )
+
+    def search(self, query, **params):
+        response = self.client.get("/api/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return {
+            kind: [row["id"] for row in rows] for kind, rows in response.json().items()
+        }
+
+    def indexed(self, query, kind="movies"):
+        # Sin consultas: el índice ya cargado se actualiza al confirmar.
+        with self.assertNumQueries(0):
+            return [pk for pk, _ in search.memory_index.search(query, [kind], 10)[kind]]
+
+    def test_search(self):
+        self.assertEqual(
+            self.search("cleo"),
+            {"movies": [self.movie.pk], "directors": [], "reviews": []},
+        )
+        # Sin tildes ni mayúsculas, y el último término como prefijo.
+        self.assertEqual(self.search("AGNES var")["directors"], [self.director.pk])
+        self.assertEqual(self.search("sans to")["movies"], [self.other_movie.pk])
+        self.assertEqual(self.search("maestra")["reviews"], [self.review.pk])
+        # El nombre pesa más que la descripción.
+        Movie.objects.filter(pk=self.other_movie.pk).update(name="Biopsia")
+        search.memory_index.invalidate()
+        self.assertEqual(
+            self.search("biopsia")["movies"], [self.other_movie.pk, self.movie.pk]
+        )
+
+        self.assertEqual(
+            self.search("cleo", type="movies,peliculas"), {"movies": [self.movie.pk]}
+        )
+        response = self.client.get("/api/search/", {"q": " "})
+        self.assertEqual(response.status_code, 400)
+
+    def test_autocomplete(self):
+        response = self.client.get("/api/search/autocomplete/", {"q": "Vard"})
+        self.assertEqual(
+            response.json(),
+            [{"type": "directors", "id": self.director.pk, "name": "Agnès Varda"}],
+        )
+        response = self.client.get("/api/search/autocomplete/", {"q": "s"})
+        self.assertEqual(
+            [suggestion["id"] for suggestion in response.json()],
+            [self.other_movie.pk],
+        )
+        # Los comentarios no se sugieren.
+        response = self.client.get("/api/search/autocomplete/", {"q": "maes"})
+        self.assertEqual(response.json(), [])
+        response = self.client.get("/api/search/autocomplete/", {"q": ""})
+        self.assertEqual(response.json(), [])
+
+    def test_index_follows_writes(self):
+        search.memory_index.load()
+        self.assertEqual(self.indexed("glaneuse"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/movies/create/",
+                {
+                    "name": "Les Glaneurs et la Glaneuse",
+                    "director": self.director.pk,
+                    "release_date": "2000-07-05",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        movie_id = response.json()["id"]
+        self.assertEqual(self.indexed("glaneuse"), [movie_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/movies/update/{movie_id}/", {"name": "Visages"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.indexed("glaneuse"), [])
+        self.assertEqual(self.indexed("visages"), [movie_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/reviews/{self.review.pk}/",
+                {"comment": "Imprescindible."},
+                format="json",
+            )
+        self.assertEqual(self.indexed("maestra", "reviews"), [])
+        self.assertEqual(self.indexed("imprescindible", "reviews"), [self.review.pk])
+
+        # Una escritura deshecha no cambia el índice.
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                response = self.client.patch(
+                    f"/api/movies/update/{movie_id}/", {"name": "Daguerréotypes"}
+                )
+                transaction.set_rollback(True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.indexed("daguerreotypes"), [])
+        self.assertEqual(self.indexed("visages"), [movie_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/movies/delete/{movie_id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.indexed("visages"), [])
+
+
+class ExportTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        for rating in (1.0, 2.0, 3.0, 4.0, 5.0):
+            self.create_review(rating=rating)
+        # Varias reseñas con el mismo updated_at: el desempate es el id.
+        Review.objects.filter(rating__gte=3).update(updated_at=timezone.now())
+
+    def test_rows_are_read_in_keyset_chunks(self):
+        expected = list(
+            Review.objects.order_by("updated_at", "id").values_list("id", flat=True)
+        )
+        # Tres bloques de 2 filas (el último incompleto).
+        with self.assertNumQueries(3):
+            rows = list(export.export_rows("reviews", chunk_size=2))
+        self.assertEqual([row[0] for row in rows], expected)
+
+    def test_incremental_ndjson_export(self):
+        since = Review.objects.get(rating=3.0).updated_at
+        response = self.client.get("/api/reviews/export/", {"since": since.isoformat()})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["rating"] for line in lines), [3.0, 4.0, 5.0]
+        )
+
+
+class ReviewListTests(MoviesTestCase):
+    """
+    Listados de reseñas: una consulta por página sea cual sea su tamaño, y
+    ETag que cambia con los datos expandidos.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for movie in (self.movie, self.other_movie):
+            for rating in (2.0, 4.0):
+                self.create_review(movie, rating)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for page_size in (1, 4):
+            with self.subTest(page_size=page_size), self.assertNumQueries(1):
+                response = self.client.get(
+                    "/api/reviews/",
+                    {"page_size": page_size, "expand": "movie,director,user"},
+                )
+            self.assertEqual(len(response.json()["results"]), page_size)
+
+    def test_critic_list_queries(self):
+        # Actividad del crítico (ETag) y página.
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/api/reviews/critic/{self.movie.pk}/", {"expand": "movie"}
+            )
+        results = response.json()["results"]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["movie"]["name"], self.movie.name)
+
+    def test_expanded_summaries(self):
+        response = self.client.get(
+            "/api/reviews/", {"expand": "director,user", "order": "id"}
+        )
+        review = response.json()["results"][0]
+        self.assertEqual(review["movie"]["id"], self.movie.pk)
+        self.assertEqual(review["movie"]["director"]["last_name"], "Varda")
+        self.assertEqual(review["user"]["username"], "critic")
+
+    def test_expanded_etag_follows_movies_and_directors(self):
+        for url in ("/api/reviews/", "/api/reviews/critic/"):
+            for expand, model, obj in (
+                ("movie", Movie, self.movie),
+                ("director", Director, self.director),
+            ):
+                with self.subTest(url=url, expand=expand):
+                    first = self.client.get(url, {"expand": expand})
+                    with self.captureOnCommitCallbacks(execute=True):
+                        model.objects.get(pk=obj.pk).save()
+                    response = self.client.get(
+                        url, {"expand": expand}, HTTP_IF_NONE_MATCH=first["ETag"]
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_plain_etag_ignores_movies(self):
+        first = self.client.get("/api/reviews/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.get(pk=self.movie.pk).save()
+        response = self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+def cursor_token(payload):
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+class KeysetPaginationTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        for rating in (3.0, 3.0, 4.0, 3.0, 4.0, 3.0, 5.0):
+            self.create_review(self.movie, rating)
+        # Todas con el mismo updated_at: el orden lo decide el id.
+        Review.objects.update(updated_at=timezone.now())
+
+    def walk(self, url, params, link="next"):
+        """
+        Recorre las páginas siguiendo `link` y devuelve los IDs de cada una.
+        """
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            pages.append([row["id"] for row in data["results"]])
+            if not data[link]:
+                return pages, data
+            response = self.client.get(data[link])
+
+    def test_pages_have_no_duplicates_or_gaps_on_ties(self):
+        expected = list(
+            Review.objects.order_by("-updated_at", "-id").values_list("pk", flat=True)
+        )
+        pages, last = self.walk("/api/reviews/", {"order": "updated", "page_size": 2})
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+        # Hacia atrás desde la última página se obtienen las mismas páginas.
+        back, first = self.walk(last["previous"], {}, link="previous")
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(first["previous"])
+
+    def test_movie_ordering_ties(self):
+        for index in range(5):
+            Movie.objects.create(
+                name=f"Empate {index}",
+                director=self.director,
+                release_date="2000-01-01",
+                average_rating=4.0,
+                rating_count=2,
+            )
+        expected = list(
+            Movie.objects.order_by(
+                "-average_rating", "-rating_count", "id"
+            ).values_list("pk", flat=True)
+        )
+        pages, _ = self.walk("/api/movies/", {"order": "rating", "page_size": 3})
+        self.assertEqual(sum(pages, []), expected)
+
+    @override_settings(MOVIES_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        for page_size, expected in (("100", 3), ("0", 1), ("-5", 1), ("x", 3)):
+            with self.subTest(page_size=page_size):
+                response = self.client.get("/api/reviews/", {"page_size": page_size})
+                self.assertEqual(len(response.json()["results"]), expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        now = timezone.now().isoformat()
+        cursors = {
+            "no es base64": "%%%",
+            "no es JSON": urlsafe_b64encode(b"\xff\xfe").decode(),
+            "no es un objeto": cursor_token([1, 2]),
+            "sin claves": cursor_token({"r": False}),
+            "claves de menos": cursor_token({"k": [now], "r": False}),
+            "fecha inválida": cursor_token({"k": ["ayer", 1], "r": False}),
+            "id inválido": cursor_token({"k": [now, "uno"], "r": False}),
+            "clave nula": cursor_token({"k": [None, 1], "r": False}),
+            "id nulo": cursor_token({"k": [now, None], "r": False}),
+            "id fuera de rango": cursor_token({"k": [now, 10**30], "r": False}),
+        }
+        for name, token in cursors.items():
+            with self.subTest(cursor=name):
+                response = self.client.get(
+                    "/api/reviews/", {"order": "updated", "cursor": token}
+                )
+                self.assertIn(response.status_code, (400, 404))
+
+
+@override_settings(MOVIES_ONE_REVIEW_PER_USER=True)
+class OneReviewPerUserTests(MoviesTestCase):
+    def test_second_review_is_rejected(self):
+        self.create_review()
+        response = self.client.post(
+            "/api/reviews/",
+            {"movie": self.movie.pk, "rating": 1.0, "comment": "-"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_review_created_after_validation_is_detected_on_save(self):
+        request = APIRequestFactory().post("/api/reviews/")
+        request.user = self.user
+        serializer = ReviewSerializer(
+            data={"movie": self.movie.pk, "rating": 1.0, "comment": "-"},
+            context={"request": request},
+        )
+        self.assertTrue(serializer.is_valid())
+        # Otra petición del mismo usuario guarda su reseña entre la validación
+        # y el guardado.
+        Review.objects.create(user=self.user, movie=self.movie, comment="-")
+
+        with self.assertRaises(ValidationError):
+            serializer.save(user=self.user)
+        self.assertEqual(Review.objects.filter(user=self.user).count(), 1)
+
+    def test_moving_a_review_onto_a_reviewed_movie_is_rejected(self):
+        self.create_review(self.movie)
+        review = self.create_review(self.other_movie)
+        response = self.client.patch(
+            f"/api/reviews/{review.pk}/", {"movie": self.movie.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_import_drops_duplicates(self):
+        self.create_review()
+        response = self.client.post(
+            "/api/reviews/bulk/",
+            [
+                {"movie": self.movie.pk, "rating": 2.0, "comment": "-"},
+                {"movie": self.other_movie.pk, "rating": 3.0, "comment": "-"},
+                {"movie": self.other_movie.pk, "rating": 4.0, "comment": "-"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(Review.objects.filter(user=self.user).count(), 2)
+
+
+class AsyncViewTests(MoviesTestCase):
+    """
+    Las vistas de /api/async/ devuelven lo mismo que sus equivalentes
+    síncronas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_review(self.movie, 4.0)
+        self.create_review(self.other_movie, 2.0)
+
+    def test_same_responses_as_sync_views(self):
+        for path in (
+            "movies/",
+            "directors/",
+            "movies/top/2/",
+            "movies/user/2/",
+            "reviews/critic/",
+            f"reviews/critic/{self.movie.pk}/",
+        ):
+            with self.subTest(path=path):
+                expected = self.client.get(f"/api/{path}")
+                response = self.client.get(f"/api/async/{path}")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+    def test_only_get_is_allowed(self):
+        response = self.client.post("/api/async/movies/", {}, format="json")
+        self.assertEqual(response.status_code, 405)
+
+    def test_authentication_is_required(self):
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/async/movies/")
+        self.assertEqual(response.status_code, 403)
+
+
+class DirectorStatsTests(MoviesTestCase):
+    """
+    Agregados de los directores, mantenidos al escribir reseñas y películas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_review(self.movie, 4.0)
+        self.create_review(self.movie, 5.0)
+        self.create_review(self.other_movie, 2.0)
+
+    def assertDirectorStats(self, director, movie_count, review_count, average):
+        director.refresh_from_db()
+        self.assertEqual(
+            (director.movie_count, director.review_count, director.average_rating),
+            (movie_count, review_count, average),
+        )
+
+    def test_detail_with_filmography(self):
+        response = self.client.get(f"/api/directors/{self.director.pk}/")
+        data = response.json()
+        self.assertEqual(
+            [movie["id"] for movie in data["filmography"]],
+            [self.movie.pk, self.other_movie.pk],
+        )
+        self.assertEqual(data["best_movie"]["id"], self.movie.pk)
+        self.assertEqual(data["worst_movie"]["id"], self.other_movie.pk)
+        self.assertEqual(data["review_count"], 3)
+        # Media de las medias de sus películas, no de las reseñas.
+        self.assertEqual(data["average_rating"], 3.25)
+
+    def test_moving_a_movie_updates_both_directors(self):
+        other = Director.objects.create(
+            name="Jacques", last_name="Demy", birth_date="1931-06-05"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/movies/update/{self.other_movie.pk}/",
+                {"director": other.pk},
+                format="json",
+            )
+        self.assertDirectorStats(self.director, 1, 2, 4.5)
+        self.assertDirectorStats(other, 1, 1, 2.0)
+
+    def test_deleting_movies_and_directors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/movies/delete/{self.movie.pk}/")
+        self.assertDirectorStats(self.director, 1, 1, 2.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/directors/delete/{self.director.pk}/")
+        self.other_movie.refresh_from_db()
+        self.assertIsNone(self.other_movie.director_id)
+
+    def test_top_directors_does_not_read_reviews(self):
+        Director.objects.create(
+            name="Sin", last_name="Reseñas", birth_date="1950-01-01"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/directors/top/5/")
+        self.assertEqual([d["id"] for d in response.json()], [self.director.pk])
+        review_table = Review._meta.db_table
+        self.assertFalse(any(review_table in q["sql"] for q in queries))
+
+
+class RecommendationTests(MoviesTestCase):
+    """
+    Vecinos precalculados por `recommendations.build` y las vistas que los
+    sirven.
+    """
+
+    # Calificaciones de cada usuario: película, otra película, tercera.
+    RATINGS = {
+        "ana": (5.0, 4.0, 1.0),
+        "bruno": (4.0, 5.0, 2.0),
+        "carla": (1.0, 2.0, 5.0),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.third_movie = Movie.objects.create(
+            name="Le Bonheur", director=self.director, release_date="1965-02-03"
+        )
+        self.movies = [self.movie, self.other_movie, self.third_movie]
+        with self.captureOnCommitCallbacks(execute=True):
+            for username, ratings in self.RATINGS.items():
+                user = User.objects.create_user(username)
+                for movie, rating in zip(self.movies, ratings):
+                    Review.objects.create(
+                        user=user, movie=movie, rating=rating, comment="-"
+                    )
+
+    def expected_similarity(self, first, second):
+        """
+        Coseno ajustado amortiguado, calculado sin matrices dispersas.
+        """
+        options = settings.MOVIES_RECOMMENDATIONS
+        columns = {movie.pk: [] for movie in (first, second)}
+        common = 0
+        for user in User.objects.filter(review__isnull=False).distinct():
+            rated = dict(
+                Review.objects.filter(user=user).values_list("movie_id", "rating")
+            )
+            mean = sum(rated.values()) / len(rated)
+            for movie_id, column in columns.items():
+                column.append(rated[movie_id] - mean if movie_id in rated else 0.0)
+            common += first.pk in rated and second.pk in rated
+        a, b = columns[first.pk], columns[second.pk]
+        cosine = sum(x * y for x, y in zip(a, b)) / (
+            math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        )
+        if common < options["MIN_COMMON"]:
+            return 0.0
+        return cosine * common / (common + options["SHRINKAGE"])
+
+    def test_similar_movies(self):
+        self.assertEqual(recommendations.build(), 3)
+        response = self.client.get(f"/api/movies/{self.movie.pk}/similar/")
+        results = response.json()
+        # Solo vecinos con similitud positiva.
+        self.assertEqual([movie["id"] for movie in results], [self.other_movie.pk])
+        self.assertAlmostEqual(
+            results[0]["score"],
+            self.expected_similarity(self.movie, self.other_movie),
+            places=4,
+        )
+
+    def test_incremental_build_patches_other_lists(self):
+        recommendations.build()
+        self.assertEqual(recommendations.stale_movie_ids(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_review(self.other_movie, 5.0)
+            self.create_review(self.third_movie, 1.0)
+        stale = recommendations.stale_movie_ids()
+        self.assertEqual(sorted(stale), [self.other_movie.pk, self.third_movie.pk])
+
+        recommendations.build(stale)
+        [similar] = recommendations.similar_movies(self.movie.pk, 5)
+        self.assertEqual(similar.pk, self.other_movie.pk)
+        self.assertAlmostEqual(
+            similar.score, self.expected_similarity(self.movie, self.other_movie), 4
+        )
+
+    def test_recommended_movies(self):
+        recommendations.build()
+        self.create_review(self.other_movie, 5.0)
+        response = self.client.get("/api/movies/recommended/")
+        self.assertEqual([movie["id"] for movie in response.json()], [self.movie.pk])
+
+    def test_recommended_without_neighbors_falls_back_to_ranking(self):
+        self.create_review(self.third_movie, 5.0)
+        response = self.client.get("/api/movies/recommended/")
+        results = response.json()
+        self.assertEqual(
+            {movie["id"] for movie in results}, {self.movie.pk, self.other_movie.pk}
+        )
+        self.assertIsNone(results[0]["score"])
+
+
+class QueryBudgetMiddlewareTests(MoviesTestCase):
+    def get_response(self, request):
+        Movie.objects.count()
+        return HttpResponse()
+
+    async def aget_response(self, request):
+        await Movie.objects.acount()
+        return HttpResponse()
+
+    def test_sync_requests_are_measured(self):
+        middleware = QueryBudgetMiddleware(self.get_response)
+        self.assertFalse(iscoroutinefunction(middleware))
+        response = middleware(RequestFactory().get("/"))
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_async_requests_are_measured(self):
+        middleware = QueryBudgetMiddleware(self.aget_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+
+class ResponseCacheStatsTests(SimpleTestCase):
+    THREADS = 8
+    LOOKUPS = 5000
+
+    def test_counters_are_exact_under_concurrent_lookups(self):
+        cache = ResponseCache(
+            {**settings.MOVIES_RESPONSE_CACHE, "ENABLED": True, "SHARED_ALIAS": None}
+        )
+        cache.set("hit", b"-")
+        barrier = threading.Barrier(self.THREADS)
+
+        def lookups():
+            barrier.wait()
+            for index in range(self.LOOKUPS):
+                cache.get("hit" if index % 2 else "miss")
+
+        threads = [threading.Thread(target=lookups) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        total = self.THREADS * self.LOOKUPS
+        self.assertEqual((stats["hits"], stats["misses"]), (total // 2, total // 2))
+
+        cache.clear()
+        self.assertEqual(
+            cache.stats(),
+            {"entries": 0, "hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0},
+        )
+
+
+class AuthorizationCacheTests(MoviesTestCase):
+    """
+    Permisos y grupos en caché: sin consultas mientras no cambian, y
+    invalidados al cambiar grupos, permisos, pertenencias o el usuario.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create_user("reader")
+        self.view_movie = Permission.objects.get(codename="view_movie")
+        self.group = Group.objects.create(name="Readers")
+        self.group.permissions.add(self.view_movie)
+
+    def fresh_reader(self):
+        # Una instancia nueva, sin la caché de permisos de Django.
+        return User.objects.get(pk=self.reader.pk)
+
+    def can_view_movies(self):
+        return authorization_cache.has_perms(
+            self.fresh_reader(), ["moviesreview.view_movie"]
+        )
+
+    def test_warm_cache_does_not_query(self):
+        authorization_cache.get(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                authorization_cache.has_perms(self.user, ["moviesreview.add_review"])
+            )
+            self.assertTrue(
+                authorization_cache.in_group(self.user, ADMINISTRATORS_GROUP)
+            )
+        # La comprobación de permisos de una petición tampoco consulta.
+        with self.assertNumQueries(1):
+            self.client.get("/api/movies/")
+
+    def test_group_membership_invalidates(self):
+        self.assertFalse(self.can_view_movies())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.groups.add(self.group)
+        self.assertTrue(self.can_view_movies())
+        self.assertTrue(authorization_cache.in_group(self.fresh_reader(), "Readers"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.groups.remove(self.group)
+        self.assertFalse(self.can_view_movies())
+
+    def test_group_permissions_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.groups.add(self.group)
+        self.assertTrue(self.can_view_movies())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.clear()
+        self.assertFalse(self.can_view_movies())
+
+    def test_user_permissions_invalidate(self):
+        self.assertFalse(self.can_view_movies())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.user_permissions.add(self.view_movie)
+        self.assertTrue(self.can_view_movies())
+
+    def test_superuser_and_active_flags(self):
+        self.assertFalse(self.can_view_movies())
+        User.objects.filter(pk=self.reader.pk).update(is_superuser=True)
+        self.assertTrue(self.can_view_movies())
+        User.objects.filter(pk=self.reader.pk).update(is_active=False)
+        self.assertFalse(self.can_view_movies())
+
+    def test_shared_cache_between_processes(self):
+        options = {**settings.MOVIES_PERMISSION_CACHE, "SHARED_ALIAS": "default"}
+        AuthorizationCache(options).get(self.fresh_reader())
+        other_process = AuthorizationCache(options)
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            other_process.get(reader)
+
+
+@override_settings(MOVIES_JWT_STATELESS=True)
+class StatelessTokenTests(MoviesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            "/api/token/", {"username": "critic", "password": "secret"}
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}"
+        )
+
+    def test_user_is_built_from_claims(self):
+        # Solo la página: ni el usuario ni sus permisos se leen.
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/movies/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_changing_token_flags_revokes_tokens(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_superuser = True
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        response = self.client.get("/api/movies/")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["detail"], "Token revocado.")
+
+    def test_other_changes_keep_tokens(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Agnès"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        # Guardar last_login no lee los indicadores anteriores.
+        with self.assertNumQueries(1):
+            user.save(update_fields=["last_login"])
+        self.assertEqual(self.client.get("/api/movies/").status_code, 200)
+
+    def test_stateless_default_depends_on_the_cache(self):
+        with self.settings(MOVIES_JWT_STATELESS=None):
+            self.assertFalse(stateless_enabled())
+            shared = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://localhost:6379",
+                }
+            }
+            with self.settings(CACHES=shared):
+                self.assertTrue(stateless_enabled())
+
+
+class RatingStatsTests(MoviesTestCase):
+    """
+    Acumulados en coma flotante de la película y de su distribución.
+    """
+
+    def test_removing_every_review_resets_float_counters(self):
+        reviews = [self.create_review(rating=rating) for rating in (0.1, 0.2, 0.7, 3.3)]
+        for review in reviews:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f"/api/reviews/{review.pk}/")
+        movie = Movie.objects.get(pk=self.movie.pk)
+        self.assertEqual(
+            (
+                movie.rating_count,
+                movie.rating_sum,
+                movie.decayed_sum,
+                movie.decayed_weight,
+            ),
+            (0, 0.0, 0.0, 0.0),
+        )
+        stats = MovieRatingStats.objects.get(movie=self.movie)
+        self.assertEqual(
+            (stats.count, stats.rating_sum, stats.rating_sum_sq), (0, 0.0, 0.0)
+        )
+        response = self.client.get(f"/api/movies/{self.movie.pk}/stats/")
+        self.assertIsNone(response.json()["mean"])
+
+
+@override_settings(
+    MOVIES_READ_REPLICAS={"ALIASES": [], "PIN_SECONDS": 10},
+    MOVIES_RATING_WRITE_MODE="direct",
+    MOVIES_DIRECTOR_STATS_DELAY=0,
+    MOVIES_CHANGES={**settings.MOVIES_CHANGES, "SEQUENCE_DELAY": 0},
+)
+class ConcurrentReviewWriteTests(APITransactionTestCase):
+    """
+    Reseñas escritas a la vez desde varios hilos, cada uno con su conexión:
+    los contadores de las películas y su distribución acaban iguales a los
+    que se calculan desde las reseñas.
+    """
+
+    THREADS = 4
+    WRITES = 12
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("Los hilos necesitan una base de datos en fichero.")
+        cache.clear()
+        response_cache.clear()
+        authorization_cache.clear()
+        leaderboard.invalidate()
+        permissions = Permission.objects.filter(content_type__app_label="moviesreview")
+        self.users = []
+        for number in range(self.THREADS):
+            user = User.objects.create_user(f"critic{number}")
+            user.user_permissions.set(permissions)
+            self.users.append(user)
+        director = Director.objects.create(
+            name="Agnès", last_name="Varda", birth_date="1928-05-30"
+        )
+        self.movies = [
+            Movie.objects.create(name=name, director=director, release_date=date)
+            for name, date in (
+                ("Cléo de 5 à 7", "1962-04-11"),
+                ("Sans toit ni loi", "1985-12-04"),
+            )
+        ]
+
+    def write_reviews(self, user, seed):
+        generator = random.Random(seed)
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            for _ in range(self.WRITES):
+                movie = generator.choice(self.movies)
+                review = client.post(
+                    "/api/reviews/",
+                    {
+                        "movie": movie.pk,
+                        "rating": generator.choice([0.5, 1.3, 2.7, 4.1, 5.0]),
+                        "comment": "-",
+                    },
+                    format="json",
+                ).json()
+                action = generator.choice(["keep", "move", "delete"])
+                if action == "move":
+                    other = self.movies[1 - self.movies.index(movie)]
+                    client.patch(
+                        f"/api/reviews/{review['id']}/",
+                        {"movie": other.pk, "rating": 3.9},
+                        format="json",
+                    )
+                elif action == "delete":
+                    client.delete(f"/api/reviews/{review['id']}/")
+        finally:
+            connection.close()
+
+    def test_counters_match_reviews(self):
+        threads = [
+            threading.Thread(target=self.write_reviews, args=(user, number))
+            for number, user in enumerate(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for movie in Movie.objects.all():
+            reviews = list(
+                Review.objects.filter(movie=movie).values_list("rating", flat=True)
+            )
+            stats = MovieRatingStats.objects.get(movie=movie)
+            with self.subTest(movie=movie.name):
+                self.assertEqual(movie.rating_count, len(reviews))
+                self.assertAlmostEqual(movie.rating_sum, sum(reviews))
+                self.assertEqual(
+                    movie.average_rating, round(sum(reviews) / len(reviews), 2)
+                )
+                self.assertEqual(stats.count, len(reviews))
+                self.assertAlmostEqual(stats.rating_sum, sum(reviews))
+                self.assertAlmostEqual(
+                    stats.rating_sum_sq, sum(rating * rating for rating in reviews)
+                )
+                self.assertEqual(sum(stats.histogram.values()), len(reviews))
+
+
+@skipUnless(
+    {
+        settings.DATABASES.get(alias, {}).get("ENGINE")
+        for alias in ("default", "replica")
+    }
+    == {"django.db.backends.sqlite3"},
+    "Necesita un primario y una réplica SQLite (MOVIES_DB_ENGINE=sqlite).",
+)
+@override_settings(
+    MOVIES_READ_REPLICAS={"ALIASES": ["replica"], "PIN_SECONDS": 10},
+    MOVIES_RATING_WRITE_MODE="direct",
+    MOVIES_DIRECTOR_STATS_DELAY=0,
+    MOVIES_CHANGES={**settings.MOVIES_CHANGES, "SEQUENCE_DELAY": 0},
+)
+class ReplicaReadTests(APITransactionTestCase):
+    """
+    Lecturas desde una réplica con retraso: la réplica es otro archivo SQLite
+    que solo se pone al día con `sync_sqlite_replica`.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        response_cache.clear()
+        authorization_cache.clear()
+        leaderboard.invalidate()
+        self.user = User.objects.create_user("critic")
+        self.user.user_permissions.set(
+            Permission.objects.filter(content_type__app_label="moviesreview")
+        )
+        self.director = Director.objects.create(
+            name="Agnès", last_name="Varda", birth_date="1928-05-30"
+        )
+        Movie.objects.create(
+            name="Cléo de 5 à 7", director=self.director, release_date="1962-04-11"
+        )
+        self.sync_replica()
+        self.client.force_authenticate(self.user)
+        # La réplica no tiene los permisos hasta la sincronización: se cargan
+        # antes de las peticiones.
+        authorization_cache.get(self.user)
+        # La segunda película solo está en el primario.
+        Movie.objects.create(
+            name="Sans toit ni loi", director=self.director, release_date="1985-12-04"
+        )
+
+    def sync_replica(self):
+        call_command("sync_sqlite_replica", stdout=io.StringIO())
+
+    def movie_names(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [movie["name"] for movie in response.json()["results"]]
+
+    def test_lagging_replica_is_not_cached_nor_tagged(self):
+        response = self.client.get("/api/movies/")
+        self.assertEqual(self.movie_names(response), ["Cléo de 5 à 7"])
+        # El ETag lleva la versión del primario, posterior a estos datos.
+        self.assertNotIn("ETag", response)
+
+        self.sync_replica()
+        response = self.client.get("/api/movies/")
+        self.assertEqual(
+            self.movie_names(response), ["Cléo de 5 à 7", "Sans toit ni loi"]
+        )
+
+    def test_primary_reads_are_cached(self):
+        pin_to_primary(self.user)
+        first = self.client.get("/api/movies/")
+        self.assertEqual(len(self.movie_names(first)), 2)
+        self.assertIn("ETag", first)
+        # Con la entrada en caché, otro usuario que lee de la réplica recibe
+        # los datos del primario.
+        cache.delete(f"moviesreview:primary-pin:{self.user.pk}")
+        response = self.client.get("/api/movies/")
+        self.assertEqual(len(self.movie_names(response)), 2)
+
+    def test_leaderboard_loads_from_the_primary(self):
+        Movie.objects.update(average_rating=4, rating_count=1)
+        response = self.client.get("/api/movies/top/5/")
+        self.assertEqual(response.status_code, 200)
+        # El ranking del proceso, que comparten todas las peticiones, incluye
+        # la película que la réplica aún no tiene.
+        self.assertEqual(
+            leaderboard.leaderboard.top(5),
+            list(Movie.objects.values_list("pk", flat=True)),
+        )
+
+
+class FormattedMovieSerializer(MovieSerializer):
+    release_date = serializers.DateField(format="%d/%m/%Y")
+    updated_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
+
+
+class ValuesSerializerTests(MoviesTestCase):
+    """
+    `ValuesSerializer` devuelve lo mismo que el `ModelSerializer` del que se
+    construye.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_review()
+        Movie.objects.create(name="Sin director", release_date="1970-01-01")
+
+    def assertSameOutput(self, serializer_class, queryset):
+        reader = ValuesSerializer(serializer_class)
+        self.assertEqual(
+            reader.serialize(reader.prepare(queryset)),
+            serializer_class(queryset, many=True).data,
+        )
+
+    def test_same_output_as_model_serializers(self):
+        for serializer_class, queryset in (
+            (MovieSerializer, Movie.objects.order_by("pk")),
+            (DirectorSerializer, Director.objects.order_by("pk")),
+            (ChangeEventSerializer, ChangeEvent.objects.order_by("pk")),
+        ):
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertSameOutput(serializer_class, queryset)
+
+    def test_other_timezones_and_formats(self):
+        with timezone.override("America/Mexico_City"):
+            self.assertSameOutput(MovieSerializer, Movie.objects.order_by("pk"))
+            self.assertSameOutput(
+                FormattedMovieSerializer, Movie.objects.order_by("pk")
+            )
+
+    def test_nested_fields_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(DirectorDetailSerializer)
+
+
+@override_settings(
+    MOVIES_RATING_WRITE_MODE="deferred",
+    MOVIES_RATING_JOBS={"WORKERS": 0, "BATCH_SIZE": 100},
+)
+class DeferredWriteTests(MoviesTestCase):
+    """
+    Modo "deferred" sin hilos trabajadores: la cola solo se procesa con
+    `jobs.drain()`.
+    """
+
+    def test_writes_are_applied_by_drain(self):
+        self.create_review(self.movie, 4.0)
+        self.create_review(self.movie, 3.0)
+        self.create_review(self.other_movie, 2.0)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 0)
+
+        # Una película por lote; las dos reseñas de la primera, en un solo
+        # recálculo.
+        self.assertEqual(jobs.drain(batch_size=1), 2)
+        self.assertFalse(RatingJob.objects.exists())
+        self.assertMovieCounters(self.movie)
+        self.assertMovieCounters(self.other_movie)
+
+    def test_drain_waits_for_jobs_claimed_elsewhere(self):
+        self.create_review(self.movie, 4.0)
+        process = jobs.process
+        calls = []
+
+        def claimed_elsewhere_first(*args, **kwargs):
+            # En la primera pasada otro trabajador tiene los trabajos.
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else process(*args, **kwargs)
+
+        with mock.patch.object(jobs, "process", claimed_elsewhere_first):
+            self.assertEqual(jobs.drain(), 1)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(calls[1]["skip_locked"])
+        self.assertMovieCounters(self.movie)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_movies_are_locked_before_reading_reviews(self):
+        self.create_review(self.movie, 4.0)
+        with CaptureQueriesContext(connection) as queries:
+            jobs.process()
+        statements = [query["sql"] for query in queries]
+        movie_table, review_table = Movie._meta.db_table, Review._meta.db_table
+        lock = next(
+            index
+            for index, sql in enumerate(statements)
+            if "FOR UPDATE" in sql and movie_table in sql.split("WHERE")[0]
+        )
+        read = next(
+            index for index, sql in enumerate(statements) if review_table in sql
+        )
+        self.assertLess(lock, read)
+
+
+@override_settings(
+    MOVIES_CHANGES={
+        **settings.MOVIES_CHANGES,
+        "POLL_INTERVAL": 0.01,
+        "STREAM_SECONDS": 0.05,
+        "SEQUENCE_DELAY": 0,
+    }
+)
+class ChangeFeedTests(MoviesTestCase):
+    """
+    El cursor del feed de cambios sigue el orden de confirmación de los
+    eventos, no el de sus `id`.
+    """
+
+    def feed(self, cursor=0, **params):
+        response = self.client.get("/api/changes/", {"cursor": cursor, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_is_the_last_sequence(self):
+        self.create_review(self.movie, 4.0)
+        body = self.feed()
+        sequences = [event["sequence"] for event in body["events"]]
+        self.assertEqual(sequences, sorted(sequences))
+        self.assertEqual(body["cursor"], sequences[-1])
+        self.assertIn(
+            ("review", "created"),
+            [(event["kind"], event["action"]) for event in body["events"]],
+        )
+        self.assertEqual(
+            self.feed(body["cursor"]), {"cursor": body["cursor"], "events": []}
+        )
+
+    def test_event_committed_late_is_delivered(self):
+        # Una transacción larga reserva el id antes que la reseña, pero su
+        # evento solo se ve cuando el consumidor ya ha pasado los de la reseña.
+        reserved = ChangeEvent.objects.create(
+            kind=ChangeEvent.DIRECTOR, action=ChangeEvent.UPDATED, object_id=1
+        )
+        reserved_id = reserved.pk
+        reserved.delete()
+        self.create_review(self.movie, 4.0)
+        cursor = self.feed()["cursor"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChangeEvent.objects.create(
+                pk=reserved_id,
+                kind=ChangeEvent.DIRECTOR,
+                action=ChangeEvent.UPDATED,
+                object_id=self.director.pk,
+            )
+            changes.schedule_sequencing()
+        body = self.feed(cursor)
+        self.assertEqual([event["id"] for event in body["events"]], [reserved_id])
+        self.assertGreater(body["cursor"], cursor)
+
+    def test_polling_only_reads(self):
+        self.create_review(self.movie, 4.0)
+        self.assertFalse(ChangeEvent.objects.filter(sequence__isnull=True).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.feed()
+        statements = [query["sql"].split()[0].upper() for query in queries]
+        self.assertEqual(set(statements), {"SELECT"}, statements)
+
+    def test_imported_reviews_are_in_the_feed(self):
+        for returns_ids in (True, False):
+            with self.subTest(returns_ids=returns_ids):
+                cursor = self.feed()["cursor"]
+                with mock.patch.object(
+                    type(connection.features),
+                    "can_return_rows_from_bulk_insert",
+                    mock.PropertyMock(return_value=returns_ids),
+                ):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        response = self.client.post(
+                            "/api/reviews/bulk/",
+                            [
+                                {"movie": self.movie.pk, "rating": 2.0, "comment": "-"},
+                                {
+                                    "movie": self.other_movie.pk,
+                                    "rating": 3.0,
+                                    "comment": "-",
+                                },
+                            ],
+                            format="json",
+                        )
+                self.assertEqual(response.json()["created"], 2, response.content)
+                events = self.feed(cursor, kinds="review")["events"]
+                imported = Review.objects.order_by("-pk")[:2]
+                self.assertEqual(
+                    sorted(
+                        (event["action"], event["object_id"], event["movie"])
+                        for event in events
+                    ),
+                    sorted(
+                        ("created", review.pk, review.movie_id) for review in imported
+                    ),
+                )
+
+    def test_stream_ids_are_sequences(self):
+        self.create_review(self.movie, 4.0)
+        events = self.feed()["events"]
+        response = self.client.get(
+            "/api/changes/stream/", headers={"Last-Event-ID": events[0]["sequence"]}
+        )
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        content = async_to_sync(read)().decode()
+        ids = [
+            int(line[4:]) for line in content.splitlines() if line.startswith("id: ")
+        ]
+        self.assertEqual(ids, [event["sequence"] for event in events[1:]])
+
+    def test_sequences_continue_after_compaction(self):
+        for rating in (1.0, 2.0, 3.0):
+            self.create_review(self.movie, rating)
+        changes.assign_sequences()
+        last = ChangeEvent.objects.order_by("-sequence").first().sequence
+        self.assertGreater(changes.compact(retention=-1), 0)
+        # Sin la fila del contador se sigue desde el mayor número asignado.
+        ChangeSequence.objects.all().delete()
+
+        # Al confirmar la escritura, por lotes de uno.
+        with mock.patch.object(
+            changes, "assign_sequences", partial(changes.assign_sequences, batch_size=1)
+        ):
+            self.create_review(self.other_movie, 4.0)
+        new = ChangeEvent.objects.filter(sequence__gt=last).order_by("pk")
+        self.assertEqual(
+            list(new.values_list("sequence", flat=True)),
+            list(range(last + 1, last + 1 + new.count())),
+        )
+        self.assertFalse(ChangeEvent.objects.filter(sequence__isnull=True).exists())
+
+
+class BenchmarkTests(MoviesTestCase):
+    # bench_api captura las consultas de todas las conexiones.
+    databases = {"default", "replica"}
+
+    def seeded_rows(self, seed):
+        directors = Director.objects.filter(last_name=f"seed{seed}")
+        movies = Movie.objects.filter(director__in=directors)
+        reviews = Review.objects.filter(movie__in=movies)
+        return (
+            list(directors.order_by("name").values_list("name", "birth_date")),
+            list(
+                movies.order_by("name").values_list(
+                    "name",
+                    "director__name",
+                    "release_date",
+                    "description",
+                    "rating_count",
+                    "average_rating",
+                )
+            ),
+            list(
+                reviews.order_by("pk").values_list(
+                    "movie__name", "user__username", "rating", "created_at"
+                )
+            ),
+        )
+
+    def test_seed_dataset_is_deterministic(self):
+        datasets = []
+        for _ in range(2):
+            # Cada generación se deshace: los nombres de usuario se repetirían.
+            with transaction.atomic():
+                seed_dataset(40, 300, 20, seed=3, batch_size=100)
+                datasets.append(self.seeded_rows(3))
+                transaction.set_rollback(True)
+        self.assertEqual(datasets[0], datasets[1])
+        reviews = datasets[0][2]
+        self.assertEqual(len(reviews), 300)
+        self.assertLessEqual(max(review[3] for review in reviews), SEED_DATE)
+
+    # Las peticiones de escritura en lote superan el presupuesto de consultas.
+    @override_settings(
+        MOVIES_QUERY_BUDGET={**settings.MOVIES_QUERY_BUDGET, "ENABLED": False}
+    )
+    def test_api_scenarios_run(self):
+        self.assertEqual(
+            bench_api.covered_routes()
+            - {scenario["route"] for scenario in bench_api.SCENARIOS.values()},
+            set(),
+        )
+        seed_dataset(40, 300, 20, seed=1)
+        recommendations.build()
+        command = bench_api.Command(stdout=io.StringIO(), stderr=io.StringIO())
+        context = command.setup_context(seed=1)
+        for name, scenario in bench_api.SCENARIOS.items():
+            with self.subTest(scenario=name):
+                result = command.run(context, scenario, {"warmup": 0, "requests": 2})
+                self.assertEqual(result["errors"], 0)
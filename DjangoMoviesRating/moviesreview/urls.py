@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ReviewViewSet,
     CriticReviewListView,
@@ -10,12 +11,23 @@ from .views import (
     MovieCreateView,
     MovieUpdateView,
     MovieDeleteView,
+    MovieStatsView,
     DirectorListView,
     DirectorCreateView,
     DirectorUpdateView,
     DirectorDeleteView,
+    DirectorDetailView,
+    ReviewExportView,
+    MovieExportView,
     top_movies,
     top_movies_by_user,
+    top_directors,
+    movie_similar,
+    recommended_movies,
+    search_view,
+    search_autocomplete,
+    query_stats_view,
+    logout,
 )
 
 defaultRouter = DefaultRouter()
@@ -38,11 +50,18 @@ urlpatterns = [
         CriticReviewDeleteView.as_view(),
         name="reviews-delete",
     ),
+    path("reviews/export/", ReviewExportView.as_view(), name="reviews-export"),
     path("movies/", MovieListView.as_view(), name="movies-list"),
     path("movies/create/", MovieCreateView.as_view(), name="movies-create"),
     path("movies/update/<int:pk>/", MovieUpdateView.as_view(), name="movies-update"),
     path("movies/delete/<int:pk>/", MovieDeleteView.as_view(), name="movies-delete"),
+    path("movies/export/", MovieExportView.as_view(), name="movies-export"),
+    path("movies/<int:pk>/stats/", MovieStatsView.as_view(), name="movies-stats"),
+    path("movies/<int:pk>/similar/", movie_similar, name="movies-similar"),
+    path("movies/recommended/", recommended_movies, name="movies-recommended"),
     path("directors/", DirectorListView.as_view(), name="directors-list"),
+    path("directors/<int:pk>/", DirectorDetailView.as_view(), name="directors-detail"),
+    path("directors/top/<int:top_number>/", top_directors, name="top-directors"),
     path("directors/create/", DirectorCreateView.as_view(), name="directors-create"),
     path(
         "directors/update/<int:pk>/",
@@ -58,6 +77,34 @@ urlpatterns = [
     path(
         "movies/user/<int:top_number>/", top_movies_by_user, name="top-movies-by-user"
     ),
+    path("search/", search_view, name="search"),
+    path("search/autocomplete/", search_autocomplete, name="search-autocomplete"),
+    path("token/logout/", logout, name="token-logout"),
+    path("stats/queries/", query_stats_view, name="query-stats"),
+    path("async/movies/", async_views.movie_list, name="async-movies-list"),
+    path(
+        "async/movies/top/<int:top_number>/",
+        async_views.top_movies,
+        name="async-top-movies",
+    ),
+    path(
+        "async/movies/user/<int:top_number>/",
+        async_views.top_movies_by_user,
+        name="async-top-movies-by-user",
+    ),
+    path("async/directors/", async_views.director_list, name="async-directors-list"),
+    path(
+        "async/reviews/critic/",
+        async_views.critic_reviews,
+        name="async-reviews-list",
+    ),
+    path(
+        "async/reviews/critic/<int:movie_id>/",
+        async_views.critic_movie_reviews,
+        name="async-reviews-list",
+    ),
+    path("changes/", async_views.changes, name="changes"),
+    path("changes/stream/", async_views.change_stream, name="changes-stream"),
 ]
 
 urlpatterns += defaultRouter.urls
@@ -0,0 +1,76 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+# Espacios de nombres versionados: cada escritura sobre los datos que cubren
+# incrementa su versión, lo que invalida ETags y respuestas en caché.
+MOVIES = "movies"
+DIRECTORS = "directors"
+REVIEWS = "reviews"
+# Vecinos precalculados de las películas (build_recommendations).
+RECOMMENDATIONS = "recommendations"
+# Grupos, permisos y pertenencia de los usuarios a ellos.
+AUTHORIZATION = "authorization"
+
+
+def _cache_key(namespace):
+    return f"moviesreview:version:{namespace}"
+
+
+def _initial_version():
+    # Si la entrada se pierde de la caché, la nueva versión nunca coincide con
+    # una anterior, así que no se reutilizan ETags obsoletos.
+    return time.time_ns()
+
+
+def get_version(namespace):
+    """
+    Devuelve la versión actual de un espacio de nombres.
+    """
+    key = _cache_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*namespaces):
+    """
+    Incrementa la versión de los espacios de nombres indicados una vez que la
+    transacción actual se confirma.
+    """
+
+    def bump():
+        for namespace in namespaces:
+            key = _cache_key(namespace)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _initial_version(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def namespace_etag(*namespaces, per_user=False, version_func=None):
+    """
+    Construye una función de ETag para `django.views.decorators.http.condition`
+    a partir de las versiones de `namespaces`, la URL completa (filtros y
+    cursor de paginación) y el formato de respuesta negociado.
+
+    `version_func(request)` añade la versión de un estado que no cubren los
+    espacios de nombres (p. ej. el ranking en memoria del proceso).
+    """
+
+    def etag(request, *args, **kwargs):
+        parts = [str(get_version(namespace)) for namespace in namespaces]
+        if version_func is not None:
+            parts.append(version_func(request))
+        parts.append(request.get_full_path())
+        parts.append(getattr(request, "accepted_media_type", "") or "")
+        if per_user:
+            parts.append(str(request.user.pk))
+        return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+    return etag
@@ -1,21 +1,172 @@
-from django.db.models import Avg
+import hashlib
+from django.conf import settings
+from django.db import connections, transaction
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
-from .models import Movie, Director, Review
-from .serializers import MovieSerializer, DirectorSerializer, ReviewSerializer
+from rest_framework.decorators import action, api_view, permission_classes
+from .models import Movie, Director, MovieRatingStats, Review
+from .serializers import (
+    MovieSerializer,
+    MovieRatingStatsSerializer,
+    DirectorSerializer,
+    DirectorDetailSerializer,
+    ScoredMovieSerializer,
+    ReviewSerializer,
+    ReviewValuesSerializer,
+    ValuesSerializer,
+    UserRatedMovieSerializer,
+)
+from .pagination import (
+    CriticReviewKeysetPagination,
+    MovieKeysetPagination,
+    ReviewKeysetPagination,
+)
+from . import export, ingest, leaderboard, ratings, search
+from .authentication import revoke_token
+from .permissions import (
+    ADMINISTRATORS_GROUP,
+    CachedDjangoModelPermissions,
+    authorization_cache,
+)
+from .query_budget import query_stats
+from .ranking import DEFAULT_RANKING, DIRECTOR_RANKING_ORDER, RANKINGS
+from .recommendations import recommend, similar_movies
+from .response_cache import cache_response, response_cache
+from .routers import pin_to_primary, read_from_replica
+from .versions import (
+    DIRECTORS,
+    MOVIES,
+    RECOMMENDATIONS,
+    REVIEWS,
+    get_version,
+    namespace_etag,
+)
+
+
+class PinWritesMixin:
+    """
+    Tras una escritura con éxito, envía al primario las lecturas del usuario
+    durante unos segundos para que vea sus cambios aunque las réplicas vayan
+    con retraso (ver routers.py).
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class AtomicSaveMixin:
+    """
+    Guarda el objeto en una transacción junto con lo que escriben sus señales
+    (el registro de cambios). `Model.delete()` ya es atómico.
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+
+class ReviewDeleteMixin:
+    """
+    Elimina la reseña y resta de su película la calificación que tiene al
+    bloquear la fila, no la leída en `get_object()`: una edición confirmada
+    entre medias la habría cambiado.
+    """
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            try:
+                instance.movie_id, instance.rating = ratings.lock_review(instance.pk)
+            except Review.DoesNotExist:
+                return
+            deleted, _ = instance.delete()
+            if deleted:
+                ratings.review_deleted(instance)
+
+
+class ReviewListMixin:
+    """
+    Ruta de lectura optimizada para listados de reseñas: una sola consulta con
+    `values()` (más los JOIN de `?expand=movie,user,director`) por página y
+    serialización sin instancias de modelo ni `ModelSerializer`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = ReviewValuesSerializer(ReviewValuesSerializer.parse_expand(request))
+        queryset = reader.prepare(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.serialize(page))
+        return Response(reader.serialize(queryset))
+
+
+class ValuesListMixin:
+    """
+    Ruta de lectura optimizada para listados de modelos sin relaciones
+    anidadas: con `MOVIES_FAST_SERIALIZERS` activo, la página se lee con
+    `values_list()` y se serializa con `ValuesSerializer`, con la misma salida
+    que `serializer_class`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.MOVIES_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        reader = ValuesSerializer.for_serializer(self.get_serializer_class())
+        queryset = reader.prepare(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.serialize(page))
+        return Response(reader.serialize(queryset))
+
+
+def expanded_namespaces(request):
+    """
+    Espacios de nombres de los datos que `?expand=` añade a un listado de
+    reseñas: el nombre y la calificación de la película y el director.
+    """
+    expand = ReviewValuesSerializer(ReviewValuesSerializer.parse_expand(request)).expand
+    namespaces = []
+    if "movie" in expand:
+        namespaces.append(MOVIES)
+    if "director" in expand:
+        namespaces.append(DIRECTORS)
+    return namespaces
+
+
+def review_list_etag(request, *args, **kwargs):
+    etag = namespace_etag(REVIEWS, *expanded_namespaces(request))
+    return etag(request, *args, **kwargs)
 
 
-class ReviewViewSet(ModelViewSet):
-    permission_classes = [DjangoModelPermissions]
+@method_decorator(condition(etag_func=review_list_etag), name="list")
+@method_decorator(condition(etag_func=namespace_etag(REVIEWS)), name="retrieve")
+class ReviewViewSet(PinWritesMixin, ReviewDeleteMixin, ReviewListMixin, ModelViewSet):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewKeysetPagination
 
     def perform_create(self, serializer):
-        review = serializer.save(user=self.request.user)
-        self.update_movie_rating(review.movie)
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user)
+            ratings.review_created(review)
 
     def _check_group(self, request):
         """
@@ -33,7 +184,7 @@ class ReviewViewSet(ModelViewSet):
         caso contrario.
         """
 
-        if request.user.groups.filter(name="Movies Administrators").exists():
+        if authorization_cache.in_group(request.user, ADMINISTRATORS_GROUP):
             return True
 
         return Response(
@@ -43,11 +194,12 @@ class ReviewViewSet(ModelViewSet):
 
     def perform_update(self, serializer):
         """
-        Actualiza la reseña y recalcula el promedio de calificación de la película.
+        Actualiza la reseña y ajusta los contadores de calificación de la película.
         """
-        review = self.get_object()
-        serializer.save()
-        self.update_movie_rating(review.movie)
+        with transaction.atomic():
+            old_movie_id, old_rating = ratings.lock_review(serializer.instance.pk)
+            review = serializer.save()
+            ratings.review_updated(review, old_movie_id, old_rating)
 
     def update(self, request, *args, **kwargs):
         """
@@ -92,14 +244,6 @@ class ReviewViewSet(ModelViewSet):
 
         return super().partial_update(request, *args, **kwargs)
 
-    def perform_destroy(self, instance):
-        """
-        Elimina la reseña y recalcula el promedio de calificación de la película.
-        """
-        movie = instance.movie
-        instance.delete()
-        self.update_movie_rating(movie)
-
     def destroy(self, request, *args, **kwargs):
         permission_check = self._check_group(request)
 
@@ -108,23 +252,99 @@ class ReviewViewSet(ModelViewSet):
 
         return super().destroy(request, *args, **kwargs)
 
-    def update_movie_rating(self, movie):
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
         """
-        Calcula y actualiza el `average_rating` de una película basada en sus reseñas.
+        Importa reseñas en bloque a nombre del usuario autenticado.
+
+        Acepta una lista JSON (`application/json`), un cuerpo JSONL
+        (`application/x-ndjson`) o CSV (`text/csv`), o un archivo `.jsonl`/`.csv`
+        enviado como `multipart/form-data` en el campo `file`. Las filas inválidas
+        se omiten y se detallan en el informe.
+
+        :param request: La solicitud HTTP con las reseñas a importar.
+        :return: Una respuesta HTTP con el informe de la importación.
         """
-        avg_rating = (
-            Review.objects.filter(movie=movie).aggregate(Avg("rating"))["rating__avg"]
-            or 0
-        )
-        movie.average_rating = round(avg_rating, 2)  # Redondear a 2 decimales
-        movie.save()
+        content_type = request.content_type.split(";")[0].strip()
+        if content_type in ("application/x-ndjson", "application/jsonl"):
+            records = ingest.iter_records(request.stream, "jsonl")
+        elif content_type == "text/csv":
+            records = ingest.iter_records(request.stream, "csv")
+        elif "file" in request.FILES:
+            upload = request.FILES["file"]
+            fmt = upload.name.rsplit(".", 1)[-1].lower()
+            if fmt not in ingest.FORMATS:
+                return Response(
+                    {"detail": "El archivo debe tener extensión .jsonl o .csv."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            records = ingest.iter_records(upload, fmt)
+        elif isinstance(request.data, list):
+            records = request.data
+        else:
+            return Response(
+                {"detail": "Se esperaba una lista de reseñas, JSONL o CSV."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            report = ingest.import_reviews(records, user=request.user)
+        except (ValueError, UnicodeDecodeError):
+            return Response(
+                {"detail": "El contenido no es JSONL o CSV válido."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(report, status=status.HTTP_201_CREATED)
 
 
 # region Reviews
 
 
-class CriticReviewListView(generics.ListAPIView):
-    permission_classes = [DjangoModelPermissions]
+def critic_reviews_activity(request, movie_id=None):
+    """
+    Devuelve la fecha de la última modificación y el número de reseñas del
+    usuario autenticado (opcionalmente, de una sola película). Se calcula una
+    vez por petición y sirve como validador para el ETag.
+    """
+    if not hasattr(request, "_critic_reviews_activity"):
+        reviews = Review.objects.filter(user=request.user)
+        if movie_id is not None:
+            reviews = reviews.filter(movie_id=movie_id)
+        request._critic_reviews_activity = reviews.aggregate(
+            latest=Max("updated_at"), total=Count("pk")
+        )
+    return request._critic_reviews_activity
+
+
+def critic_reviews_etag(request, movie_id=None, **kwargs):
+    activity = critic_reviews_activity(request, movie_id)
+    latest = activity["latest"].timestamp() if activity["latest"] else 0
+    versions = [
+        str(get_version(namespace)) for namespace in expanded_namespaces(request)
+    ]
+    return hashlib.md5(
+        "|".join(
+            [
+                str(latest),
+                str(activity["total"]),
+                *versions,
+                request.get_full_path(),
+                request.accepted_media_type,
+            ]
+        ).encode()
+    ).hexdigest()
+
+
+# Sin Last-Modified: al eliminar una reseña que no es la última editada, la
+# fecha máxima no cambia y un If-Modified-Since devolvería un 304 obsoleto. El
+# ETag sí cambia, porque incluye el número de reseñas.
+critic_reviews_condition = condition(etag_func=critic_reviews_etag)
+
+
+@method_decorator([read_from_replica, critic_reviews_condition], name="get")
+class CriticReviewListView(ReviewListMixin, generics.ListAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
+    pagination_class = CriticReviewKeysetPagination
 
     def get_queryset(self):
         return Review.objects.filter(user=self.request.user)
@@ -133,21 +353,23 @@ class CriticReviewListView(generics.ListAPIView):
     serializer_class = ReviewSerializer
 
 
-class CriticReviewMovieListView(generics.ListAPIView):
-    permission_classes = [DjangoModelPermissions]
+@method_decorator([read_from_replica, critic_reviews_condition], name="get")
+class CriticReviewMovieListView(ReviewListMixin, generics.ListAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
+    pagination_class = CriticReviewKeysetPagination
 
     def get_queryset(self):
         movie_id = self.kwargs.get("movie_id")
         return Review.objects.filter(
             user=self.request.user, movie_id=movie_id
-        ).order_by("-updated_at")
+        ).order_by("-updated_at", "-id")
 
     queryset = get_queryset
     serializer_class = ReviewSerializer
 
 
-class CriticReviewUpdateView(generics.UpdateAPIView):
-    permission_classes = [DjangoModelPermissions]
+class CriticReviewUpdateView(PinWritesMixin, generics.UpdateAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
 
     def get_queryset(self):
         return Review.objects.filter(user=self.request.user)
@@ -157,26 +379,18 @@ class CriticReviewUpdateView(generics.UpdateAPIView):
 
     def perform_update(self, serializer):
         """
-        Actualiza la reseña y recalcula el promedio de calificación de la película.
+        Actualiza la reseña y ajusta los contadores de calificación de la película.
         """
-        review = self.get_object()
-        serializer.save()
-        self.update_movie_rating(review.movie)
+        with transaction.atomic():
+            old_movie_id, old_rating = ratings.lock_review(serializer.instance.pk)
+            review = serializer.save()
+            ratings.review_updated(review, old_movie_id, old_rating)
 
-    def update_movie_rating(self, movie):
-        """
-        Calcula y actualiza el `average_rating` de una película basada en sus reseñas.
-        """
-        avg_rating = (
-            Review.objects.filter(movie=movie).aggregate(Avg("rating"))["rating__avg"]
-            or 0
-        )
-        movie.average_rating = round(avg_rating, 2)  # Redondear a 2 decimales
-        movie.save()
 
-
-class CriticReviewDeleteView(generics.DestroyAPIView):
-    permission_classes = [DjangoModelPermissions]
+class CriticReviewDeleteView(
+    PinWritesMixin, ReviewDeleteMixin, generics.DestroyAPIView
+):
+    permission_classes = [CachedDjangoModelPermissions]
 
     def get_queryset(self):
         return Review.objects.filter(user=self.request.user)
@@ -189,64 +403,283 @@ class CriticReviewDeleteView(generics.DestroyAPIView):
 
 
 # region Movies
-class MovieListView(generics.ListAPIView):
-    permission_classes = [DjangoModelPermissions]
+@method_decorator(
+    [
+        read_from_replica,
+        condition(etag_func=namespace_etag(MOVIES)),
+        cache_response(MOVIES),
+    ],
+    name="get",
+)
+class MovieListView(ValuesListMixin, generics.ListAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
+    pagination_class = MovieKeysetPagination
 
 
 class MovieCreateView(generics.CreateAPIView):
-    permission_classes = [DjangoModelPermissions]
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            movie = serializer.save()
+            transaction.on_commit(lambda: leaderboard.rating_changed(movie.pk))
+
 
-class MovieUpdateView(generics.UpdateAPIView):
-    permission_classes = [DjangoModelPermissions]
+class MovieUpdateView(AtomicSaveMixin, generics.UpdateAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
 
 
 class MovieDeleteView(generics.DestroyAPIView):
-    permission_classes = [DjangoModelPermissions]
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
 
+    def perform_destroy(self, instance):
+        movie_id = instance.pk
+        with transaction.atomic():
+            instance.delete()
+            # Si la transacción se deshace, la película sigue en el ranking.
+            transaction.on_commit(lambda: leaderboard.discard(movie_id))
+
+
+@method_decorator(condition(etag_func=namespace_etag(MOVIES, REVIEWS)), name="get")
+class MovieStatsView(generics.RetrieveAPIView):
+    """
+    Distribución de las calificaciones de una película: número de reseñas,
+    media, varianza, desviación típica, mediana e histograma por estrellas.
+    Se lee de `MovieRatingStats`, sin recorrer las reseñas.
+    """
+
+    permission_classes = [CachedDjangoModelPermissions]
+    queryset = Movie.objects.all()
+    serializer_class = MovieRatingStatsSerializer
+
+    def get_object(self):
+        movie_id = self.kwargs["pk"]
+        stats = MovieRatingStats.objects.filter(movie_id=movie_id).first()
+        if stats is None:
+            if not Movie.objects.filter(pk=movie_id).exists():
+                raise Http404
+            stats = MovieRatingStats(movie_id=movie_id)
+        return stats
+
+
+def recommendation_limit(request):
+    """
+    Número de películas pedido en `?limit=` (por defecto `NEIGHBORS`, como
+    máximo `MOVIES_TOP_MAX`).
+    """
+    default = settings.MOVIES_RECOMMENDATIONS["NEIGHBORS"]
+    try:
+        limit = int(request.query_params.get("limit", default))
+    except ValueError:
+        raise ValidationError({"limit": "Debe ser un número entero."})
+    return max(1, min(limit, settings.MOVIES_TOP_MAX))
+
+
+@api_view(["GET"])
+@condition(etag_func=namespace_etag(RECOMMENDATIONS, MOVIES))
+def movie_similar(request, pk):
+    """
+    Películas más similares a una película según las valoraciones de quienes
+    la reseñaron, leídas de los vecinos precalculados por
+    `build_recommendations`.
+    """
+    if not Movie.objects.filter(pk=pk).exists():
+        raise Http404
+    movies = similar_movies(pk, recommendation_limit(request))
+    return Response(ScoredMovieSerializer(movies, many=True).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@condition(etag_func=namespace_etag(RECOMMENDATIONS, REVIEWS, per_user=True))
+def recommended_movies(request):
+    """
+    Películas recomendadas al usuario autenticado a partir de las similares a
+    las que ha reseñado, con la calificación estimada en `score`. Si aún no
+    hay recomendaciones para el usuario, devuelve las mejor clasificadas del
+    ranking bayesiano que no ha reseñado, sin `score`.
+    """
+    limit = recommendation_limit(request)
+    movies = recommend(request.user.pk, limit)
+    if not movies:
+        reviewed = set(
+            Review.objects.filter(user=request.user).values_list("movie_id", flat=True)
+        )
+        candidates = leaderboard.top_movies(limit + len(reviewed), "bayesian")
+        movies = [movie for movie in candidates if movie.pk not in reviewed][:limit]
+        for movie in movies:
+            movie.score = None
+    return Response(ScoredMovieSerializer(movies, many=True).data)
+
 
 # endregion Movies
 
 
 # region Directors
-class DirectorListView(generics.ListAPIView):
-    permission_classes = [DjangoModelPermissions]
+@method_decorator(
+    [
+        read_from_replica,
+        condition(etag_func=namespace_etag(DIRECTORS)),
+        cache_response(DIRECTORS),
+    ],
+    name="get",
+)
+class DirectorListView(ValuesListMixin, generics.ListAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Director.objects.all()
     serializer_class = DirectorSerializer
 
 
-class DirectorCreateView(generics.CreateAPIView):
-    permission_classes = [DjangoModelPermissions]
+@method_decorator(condition(etag_func=namespace_etag(DIRECTORS, MOVIES)), name="get")
+class DirectorDetailView(generics.RetrieveAPIView):
+    """
+    Director con su filmografía y los agregados de calificación de sus
+    películas, que se mantienen al escribir (no se leen las reseñas).
+    """
+
+    permission_classes = [CachedDjangoModelPermissions]
+    queryset = Director.objects.select_related(
+        "best_movie", "worst_movie"
+    ).prefetch_related(
+        Prefetch("movie_set", queryset=Movie.objects.order_by("release_date", "id"))
+    )
+    serializer_class = DirectorDetailSerializer
+
+
+class DirectorCreateView(AtomicSaveMixin, generics.CreateAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Director.objects.all()
     serializer_class = DirectorSerializer
 
 
-class DirectorUpdateView(generics.UpdateAPIView):
-    permission_classes = [DjangoModelPermissions]
+class DirectorUpdateView(AtomicSaveMixin, generics.UpdateAPIView):
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Director.objects.all()
     serializer_class = DirectorSerializer
 
 
 class DirectorDeleteView(generics.DestroyAPIView):
-    permission_classes = [DjangoModelPermissions]
+    permission_classes = [CachedDjangoModelPermissions]
     queryset = Director.objects.all()
     serializer_class = DirectorSerializer
 
 
 @api_view(["GET"])
+@condition(etag_func=namespace_etag(DIRECTORS))
+@cache_response(DIRECTORS)
+def top_directors(request, top_number):
+    """
+    Devuelve los n directores (como máximo `MOVIES_TOP_MAX`) con mejor media
+    de calificación de sus películas, desempatando por número de reseñas. Solo
+    se consideran directores con alguna reseña.
+    """
+    top_number = min(top_number, settings.MOVIES_TOP_MAX)
+    directors = Director.objects.filter(review_count__gt=0).order_by(
+        *DIRECTOR_RANKING_ORDER
+    )[:top_number]
+    serializer = DirectorSerializer(directors, many=True)
+    if not serializer.data:
+        return Response(
+            {"detail": "No hay directores con reseñas en este momento."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    return Response(serializer.data)
+
+
+# endregion Directors
+
+
+# region Export
+class ExportView(APIView):
+    """
+    Exportación completa o incremental de una tabla, generada en streaming.
+
+    Parámetros:
+    - `output`: "ndjson" (por defecto) o "csv".
+    - `since`: fecha ISO 8601; solo se exportan las filas con `updated_at`
+      igual o posterior.
+    """
+
+    permission_classes = [CachedDjangoModelPermissions]
+    export_name = None
+
+    def get(self, request):
+        fmt = request.query_params.get("output", "ndjson")
+        if fmt not in export.FORMATS:
+            return Response(
+                {"detail": "El formato debe ser ndjson o csv."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        since = request.query_params.get("since")
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {"detail": "El parámetro since debe ser una fecha ISO 8601."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        response = StreamingHttpResponse(
+            export.export_lines(self.export_name, fmt, since=since),
+            content_type=export.FORMATS[fmt],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.export_name}.{fmt}"'
+        )
+        return response
+
+
+class ReviewExportView(ExportView):
+    queryset = Review.objects.all()
+    export_name = "reviews"
+
+
+class MovieExportView(ExportView):
+    queryset = Movie.objects.all()
+    export_name = "movies"
+
+
+# endregion Export
+
+
+def leaderboard_version(request):
+    return leaderboard.version(request.query_params.get("ranking", DEFAULT_RANKING))
+
+
+@api_view(["GET"])
+@read_from_replica
+@condition(etag_func=namespace_etag(MOVIES, version_func=leaderboard_version))
+@cache_response(MOVIES, version_func=leaderboard_version)
 def top_movies(request, top_number):
     """
-    Devuelve las n películas mejor calificadas.
+    Devuelve las n películas mejor calificadas (como máximo `MOVIES_TOP_MAX`),
+    desempatando por número de reseñas.
+
+    El parámetro `ranking` elige la puntuación: "average" (media simple, por
+    defecto), "bayesian" (media amortiguada) o "trending" (media amortiguada
+    que da más peso a las reseñas recientes).
+
+    El orden sale del ranking en memoria de cada proceso, que puede ir por
+    detrás de la base de datos hasta `MOVIES_LEADERBOARD_TTL` segundos, así
+    que el ETag y la clave de caché incluyen también su versión.
     """
-    top_movies = Movie.objects.order_by("-average_rating")[:top_number]
+    ranking_name = request.query_params.get("ranking", DEFAULT_RANKING)
+    if ranking_name not in RANKINGS:
+        return Response(
+            {"detail": f"Ranking no válido. Opciones: {', '.join(RANKINGS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    top_number = min(top_number, settings.MOVIES_TOP_MAX)
+    top_movies = leaderboard.top_movies(top_number, ranking_name)
     if not top_movies:
         return Response(
             {"detail": "No hay películas disponibles en este momento."},
@@ -260,28 +693,169 @@ def top_movies(request, top_number):
 @permission_classes([IsAuthenticated])  # Solo usuarios autenticados pueden acceder
 def top_movies_by_user(request, top_number):
     """
-    Devuelve las N películas mejor calificadas por el usuario autenticado.
+    Devuelve las N películas mejor calificadas por el usuario autenticado, en
+    orden y con el promedio del usuario en `user_avg_rating`.
     """
     user = request.user  # Obtener el usuario autenticado
+    top_number = min(top_number, settings.MOVIES_TOP_MAX)
 
-    # Filtrar las reseñas del usuario y calcular el promedio de calificación por película
-    movies_rated_by_user = (
-        Review.objects.filter(user=user)
-        .values("movie")
-        .annotate(user_avg_rating=Avg("rating"))
-        .order_by("-user_avg_rating")[:top_number]
+    activity = Review.objects.filter(user=user).aggregate(
+        latest=Max("updated_at"), total=Count("pk")
     )
-
-    if not movies_rated_by_user:
+    if not activity["total"]:
         return Response(
             {"detail": "No has calificado ninguna película."},
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    # Obtener las películas correspondientes
-    movie_ids = [entry["movie"] for entry in movies_rated_by_user]
-    movies = Movie.objects.filter(id__in=movie_ids)
+    cache_key = user_top_cache_key(user, top_number, activity)
+    data = cache.get(cache_key)
+    if data is None:
+        movies = user_top_movies_queryset(user, top_number)
+        data = UserRatedMovieSerializer(movies, many=True).data
+        cache.set(cache_key, data, settings.MOVIES_USER_TOP_CACHE_TTL)
+    return Response(data)
 
-    # Serializar y devolver los datos
-    serializer = MovieSerializer(movies, many=True)
-    return Response(serializer.data)
+
+def user_top_cache_key(user, top_number, activity):
+    """
+    Clave de caché del top de un usuario. Cambia en cuanto el usuario crea,
+    edita o elimina una reseña.
+    """
+    latest = activity["latest"].timestamp()
+    return (
+        f"moviesreview:top-by-user:{user.pk}:{top_number}:{latest}:{activity['total']}"
+    )
+
+
+def user_top_movies_queryset(user, top_number):
+    """
+    Una sola consulta: películas calificadas por el usuario con su promedio,
+    ya ordenadas por ese promedio.
+    """
+    return (
+        Movie.objects.filter(review__user=user)
+        .annotate(user_avg_rating=Avg("review__rating"))
+        .order_by("-user_avg_rating", "id")[:top_number]
+    )
+
+
+# region Search
+SEARCH_SUMMARIES = {
+    "movies": (Movie, ("id", "name", "average_rating")),
+    "directors": (Director, ("id", "name", "last_name")),
+    "reviews": (Review, ("id", "movie", "rating", "comment")),
+}
+
+
+def _search_limit(request):
+    try:
+        limit = int(request.query_params.get("limit", 10))
+    except ValueError:
+        limit = 10
+    return max(1, min(limit, settings.MOVIES_TOP_MAX))
+
+
+@api_view(["GET"])
+def search_view(request):
+    """
+    Busca el texto de `q` en películas (nombre y descripción), directores
+    (nombre y apellido) y comentarios de reseñas, con el último término como
+    prefijo.
+
+    Parámetros opcionales: `type` (lista separada por comas de "movies",
+    "directors" y "reviews") y `limit` (resultados por tipo).
+    """
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response(
+            {"detail": "El parámetro q es obligatorio."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    kinds = [
+        kind
+        for kind in request.query_params.get("type", ",".join(SEARCH_SUMMARIES)).split(
+            ","
+        )
+        if kind in SEARCH_SUMMARIES
+    ]
+    matches = search.get_backend().search(query, kinds, _search_limit(request))
+
+    data = {}
+    for kind, ranked in matches.items():
+        model, fields = SEARCH_SUMMARIES[kind]
+        rows = {
+            row["id"]: row
+            for row in model.objects.filter(pk__in=[pk for pk, _ in ranked]).values(
+                *fields
+            )
+        }
+        data[kind] = [
+            {**rows[pk], "score": score} for pk, score in ranked if pk in rows
+        ]
+    return Response(data)
+
+
+@api_view(["GET"])
+def search_autocomplete(request):
+    """
+    Sugiere películas y directores cuyo nombre tiene un término que empieza
+    por el texto de `q`.
+    """
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response([])
+    return Response(search.get_backend().autocomplete(query, _search_limit(request)))
+
+
+# endregion Search
+
+
+# region Auth
+@api_view(["POST"])
+def logout(request):
+    """
+    Revoca el JWT de acceso con el que se hace la petición.
+    """
+    if request.auth is None or not hasattr(request.auth, "payload"):
+        return Response(
+            {"detail": "La petición no usa un JWT."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    revoke_token(request.auth)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# endregion Auth
+
+
+# region Stats
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def query_stats_view(request):
+    """
+    Métricas de este proceso: consultas y tiempo en la base de datos por
+    endpoint, aciertos de la caché de respuestas y configuración de las
+    conexiones. DELETE reinicia los contadores.
+    """
+    if request.method == "DELETE":
+        query_stats.clear()
+        response_cache.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(
+        {
+            "endpoints": query_stats.snapshot(),
+            "response_cache": response_cache.stats(),
+            "connections": {
+                connection.alias: {
+                    "vendor": connection.vendor,
+                    "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+                    "health_checks": connection.settings_dict["CONN_HEALTH_CHECKS"],
+                }
+                for connection in connections.all()
+            },
+        }
+    )
+
+
+# endregion Stats